@@ -1 +1,7 @@
 """Framework for build NLP information extraction systems using regular expressions."""
+from importlib.metadata import PackageNotFoundError, version
+
+try:
+    __version__ = version('konsepy')
+except PackageNotFoundError:  # pragma: no cover - not installed
+    __version__ = 'unknown'
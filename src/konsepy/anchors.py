@@ -0,0 +1,248 @@
+"""
+Literal-anchor candidate index for concept regexes.
+
+Most patterns contain a literal keyword which must appear in every match (an "anchor"). All anchors across
+a package's concepts are found in a single scan of each note (Aho-Corasick, if `pyahocorasick` is installed),
+after which a regex is only run if one of its anchors occurs in the search region, and (when the regex's
+maximum match width is bounded) scanning starts just before the first occurrence. Results are identical to
+running every regex over every region.
+
+Anchors are extracted from the parsed pattern, or can be declared with `rx_compile(..., anchors=[...])`: the
+declared literals are trusted, so at least one of them must appear in every possible match.
+"""
+import re
+import sys
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from re import _constants as sre_constants, _parser as sre_parse
+
+from loguru import logger
+
+from konsepy.notecache import note_memo
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - optional dependency
+    ahocorasick = None
+
+MIN_ANCHOR_LENGTH = 3
+
+_active_index = None
+_casefold_table = None
+
+
+class Anchor:
+    """Literals of which at least one occurs in every match of a regex."""
+
+    def __init__(self, literals, max_width=None):
+        self.literals = tuple(literals)  # (literal, ignorecase)
+        self.max_width = max_width  # None if unbounded
+
+    def earliest_start(self, hits, start, end):
+        """Return first possible match start in text[start:end], or None if no anchor occurs in the region."""
+        earliest = None
+        for literal, ignorecase in self.literals:
+            positions = hits.get((literal, ignorecase), ())
+            index = bisect_left(positions, start)
+            # later occurrences only end later, so only the first at/after `start` must be checked
+            if index == len(positions) or positions[index] + len(literal) > end:
+                continue
+            if self.max_width is None:
+                return start
+            candidate = positions[index] - (self.max_width - len(literal))
+            if earliest is None or candidate < earliest:
+                earliest = candidate
+        return None if earliest is None else max(start, earliest)
+
+    def __repr__(self):
+        return f'Anchor({self.literals!r}, max_width={self.max_width!r})'
+
+
+class AnchorIndex:
+
+    def __init__(self, regexes):
+        self._anchors = {}  # id(regex) -> Anchor
+        self._regexes = []  # keep regexes alive so ids remain valid
+        literals = set()
+        total = 0
+        for regex in regexes:
+            if regex is None:
+                continue
+            total += 1
+            if (anchor := get_anchor(regex)) is not None:
+                self._anchors[id(regex)] = anchor
+                self._regexes.append(regex)
+                literals.update(anchor.literals)
+        self._literals = {
+            ignorecase: sorted({literal for literal, ic in literals if ic == ignorecase})
+            for ignorecase in (False, True)
+        }
+        self._automata = {
+            ignorecase: _build_automaton(self._literals[ignorecase]) for ignorecase in (False, True)
+        }
+        self.skipped = 0
+        self.searched = 0
+        logger.info(f'Anchored {len(self._anchors):,} of {total:,} regexes with {len(literals):,} literals'
+                    f' ({"aho-corasick" if ahocorasick else "str.find"}).')
+
+    @classmethod
+    def from_concepts(cls, concepts):
+        return cls(regex for concept in concepts for regex, *_ in concept.regexes)
+
+    def lookup(self, regex):
+        return self._anchors.get(id(regex))
+
+    def scan(self, text):
+        """Return {(literal, ignorecase): [start, ...]} for all anchor occurrences in `text` (once per note)."""
+        memo = note_memo(text)
+        key = ('anchor_hits', id(self))
+        if key not in memo:
+            hits = defaultdict(list)
+            for ignorecase in (False, True):
+                if not self._literals[ignorecase]:
+                    continue
+                search_text = text.translate(_get_casefold_table()) if ignorecase else text
+                _find_literals(search_text, self._literals[ignorecase], self._automata[ignorecase],
+                               ignorecase, hits)
+            memo[key] = hits
+        return memo[key]
+
+    def log_summary(self):
+        logger.info(f'Anchor index: skipped {self.skipped:,} of {self.skipped + self.searched:,}'
+                    f' anchored regex searches.')
+
+
+@contextmanager
+def use_anchor_index(index):
+    """Make `index` available to regex searches (see `rxsearch`) while in this context."""
+    global _active_index
+    previous = _active_index
+    _active_index = index
+    try:
+        yield index
+    finally:
+        _active_index = previous
+
+
+def get_anchor_index():
+    return _active_index
+
+
+def get_anchor(regex):
+    """Return declared or extracted `Anchor` for a compiled regex (or `KonsepyRegex`), else None."""
+    pattern = getattr(regex, 'pattern', None)
+    flags = getattr(regex, 'flags', 0)
+    if not isinstance(pattern, str):
+        return None
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except (re.error, TypeError):
+        return None
+    max_width = _get_max_width(parsed)
+    ignorecase = bool(parsed.state.flags & re.IGNORECASE)
+    if declared := getattr(regex, 'anchors', None):
+        literals = {_normalize_literal(literal, ignorecase) for literal in declared}
+        if None in literals:
+            return None
+        return Anchor(sorted(literals), max_width=max_width)
+    best = _best_anchor(_required_literals(parsed, ignorecase))
+    if best is None:
+        return None
+    return Anchor(sorted(best), max_width=max_width)
+
+
+def _get_max_width(parsed):
+    _, max_width = parsed.getwidth()
+    return None if max_width >= sre_constants.MAXREPEAT else max_width
+
+
+def _normalize_literal(literal, ignorecase):
+    if ignorecase:
+        if not literal.isascii():
+            return None  # non-ascii case-insensitive matching is too varied to look up safely
+        return literal.lower(), True
+    return literal, False
+
+
+def _required_literals(subpattern, ignorecase):
+    """Return list of anchors (sets of (literal, ignorecase)), each of which must occur in every match."""
+    anchors = []
+    run = []
+
+    def flush():
+        if run:
+            if (literal := _normalize_literal(''.join(run), ignorecase)) is not None:
+                anchors.append(frozenset({literal}))
+            run.clear()
+
+    for op, av in subpattern:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, p = av
+            sub_ignorecase = bool((ignorecase or add_flags & re.IGNORECASE) and not del_flags & re.IGNORECASE)
+            anchors.extend(_required_literals(p, sub_ignorecase))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, sre_constants.POSSESSIVE_REPEAT):
+            min_repeat, _, p = av
+            if min_repeat >= 1:
+                anchors.extend(_required_literals(p, ignorecase))
+        elif op is sre_constants.ATOMIC_GROUP:
+            anchors.extend(_required_literals(av, ignorecase))
+        elif op is sre_constants.BRANCH:
+            branches = [_best_anchor(_required_literals(p, ignorecase)) for p in av[1]]
+            if all(branch is not None for branch in branches):
+                anchors.append(frozenset().union(*branches))
+    flush()
+    return anchors
+
+
+def _best_anchor(anchors):
+    """Prefer anchors whose shortest literal is longest (i.e., rarest), then fewest alternatives."""
+    candidates = [
+        anchor for anchor in anchors
+        if anchor and min(len(literal) for literal, _ in anchor) >= MIN_ANCHOR_LENGTH
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda a: (min(len(literal) for literal, _ in a), -len(a)))
+
+
+def _get_casefold_table():
+    """Map text so that case-insensitive matches of lowercased ascii literals are found as substrings."""
+    global _casefold_table
+    if _casefold_table is None:
+        table = {ord(ch): ch.lower() for ch in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'}
+        # a few non-ascii characters match ascii letters when ignoring case (e.g., KELVIN SIGN and 'k')
+        letter_rx = re.compile('[a-z]', re.IGNORECASE)
+        for m in letter_rx.finditer(''.join(map(chr, range(128, sys.maxunicode + 1)))):
+            for letter in 'abcdefghijklmnopqrstuvwxyz':
+                if re.fullmatch(letter, m.group(), re.IGNORECASE):
+                    table[ord(m.group())] = letter
+                    break
+        _casefold_table = table
+    return _casefold_table
+
+
+def _build_automaton(literals):
+    if ahocorasick is None or not literals:
+        return None
+    automaton = ahocorasick.Automaton()
+    for literal in literals:
+        automaton.add_word(literal, literal)
+    automaton.make_automaton()
+    return automaton
+
+
+def _find_literals(text, literals, automaton, ignorecase, hits):
+    if automaton is not None:
+        for end_index, literal in automaton.iter(text):
+            hits[(literal, ignorecase)].append(end_index - len(literal) + 1)
+        return
+    for literal in literals:
+        index = text.find(literal)
+        while index != -1:
+            hits[(literal, ignorecase)].append(index)
+            index = text.find(literal, index + 1)
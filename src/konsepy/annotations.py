@@ -0,0 +1,231 @@
+"""
+Shared note-level annotations (e.g., dates, numbers with units, scores).
+
+Annotators are run at most once per note, however many concepts use them, and only when first requested.
+When annotators are active (e.g., `ProcessingEngine(annotators=True)`), postprocessors receive the note's
+`NoteAnnotations` as `annotations`:
+
+    def check_recent(m, annotations, **kwargs):
+        date = annotations.nearest('date', m.start(), m.end(), max_distance=50)
+        ...
+
+An annotator is a function(text) yielding `Annotation`s (or (start, end, value) tuples).
+"""
+import datetime
+import re
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+
+from konsepy.notecache import note_memo
+
+_active_annotators = None
+
+
+class Annotation:
+
+    def __init__(self, name, start, end, value=None, text=None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.value = value
+        self.text = text
+
+    def span(self):
+        return self.start, self.end
+
+    def distance(self, start, end):
+        """Number of characters between this annotation and text[start:end] (0 if they overlap)."""
+        return max(0, start - self.end, self.start - end)
+
+    def __eq__(self, other):
+        if not isinstance(other, Annotation):
+            return NotImplemented
+        return (self.name, self.start, self.end, self.value) == (other.name, other.start, other.end, other.value)
+
+    def __repr__(self):
+        return f'Annotation({self.name!r}, {self.start}, {self.end}, {self.value!r})'
+
+
+class NoteAnnotations:
+    """Lazily-computed annotations for a single note, sorted by start offset."""
+
+    def __init__(self, text, annotators):
+        self.text = text
+        self.annotators = annotators
+        self._annotations = {}  # name -> (starts, annotations)
+
+    def _get(self, name):
+        if name not in self._annotations:
+            if name not in self.annotators:
+                raise KeyError(f'No annotator named {name!r}; expected one of {sorted(self.annotators)}.')
+            annotations = sorted(
+                (_as_annotation(name, self.text, a) for a in self.annotators[name](self.text)),
+                key=lambda a: (a.start, a.end),
+            )
+            self._annotations[name] = ([a.start for a in annotations], annotations)
+        return self._annotations[name]
+
+    def get(self, name):
+        """Return all annotations of `name` in the note."""
+        return self._get(name)[1]
+
+    def within(self, name, start, end):
+        """Return annotations lying entirely within text[start:end]."""
+        starts, annotations = self._get(name)
+        return [a for a in annotations[bisect_left(starts, start):bisect_left(starts, end)] if a.end <= end]
+
+    def before(self, name, pos):
+        """Return the nearest annotation ending at or before `pos`, else None."""
+        starts, annotations = self._get(name)
+        best = None
+        for a in annotations[:bisect_right(starts, pos)]:
+            if a.end <= pos and (best is None or a.end >= best.end):
+                best = a
+        return best
+
+    def after(self, name, pos):
+        """Return the nearest annotation starting at or after `pos`, else None."""
+        starts, annotations = self._get(name)
+        index = bisect_left(starts, pos)
+        return annotations[index] if index < len(annotations) else None
+
+    def nearest(self, name, start, end, max_distance=None):
+        """Return the annotation nearest to text[start:end] (preferring earlier on ties), else None."""
+        starts, annotations = self._get(name)
+        candidates = [a for a in annotations[:bisect_left(starts, end)] if a.end > start]  # overlapping
+        candidates += [a for a in (self.before(name, start), self.after(name, end)) if a is not None]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda a: (a.distance(start, end), a.start))
+        if max_distance is not None and best.distance(start, end) > max_distance:
+            return None
+        return best
+
+
+def get_note_annotations(text, annotators=None):
+    """Return (cached) `NoteAnnotations` for `text` using `annotators` (default: the active annotators)."""
+    annotators = _active_annotators if annotators is None else annotators
+    if annotators is None:
+        return None
+    memo = note_memo(text)
+    key = ('annotations', id(annotators))
+    if key not in memo:
+        memo[key] = NoteAnnotations(text, annotators)
+    return memo[key]
+
+
+@contextmanager
+def use_annotators(annotators):
+    """Provide `annotators` (dict of name -> function) to postprocessors (see `rxsearch`) while in this context."""
+    global _active_annotators
+    previous = _active_annotators
+    _active_annotators = annotators
+    try:
+        yield annotators
+    finally:
+        _active_annotators = previous
+
+
+def get_active_annotators():
+    return _active_annotators
+
+
+def resolve_annotators(annotators):
+    """
+    annotators: True (all built-in annotators), an iterable of built-in annotator names, or a dict of
+        name -> function(text)
+    """
+    if not annotators:
+        return None
+    if annotators is True:
+        return dict(DEFAULT_ANNOTATORS)
+    if isinstance(annotators, dict):
+        return annotators
+    unknown = set(annotators) - set(DEFAULT_ANNOTATORS)
+    if unknown:
+        raise ValueError(f'Unknown annotators: {sorted(unknown)}; expected any of {sorted(DEFAULT_ANNOTATORS)}.')
+    return {name: DEFAULT_ANNOTATORS[name] for name in annotators}
+
+
+def _as_annotation(name, text, annotation):
+    if isinstance(annotation, Annotation):
+        return annotation
+    start, end, value = annotation
+    return Annotation(name, start, end, value, text[start:end])
+
+
+_MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+           'november', 'december']
+_MONTH = r'(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?' \
+         r'|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?'
+DATE_RX = re.compile(
+    rf'\b(?:'
+    rf'(?P<iso_year>\d{{4}})-(?P<iso_month>\d{{1,2}})-(?P<iso_day>\d{{1,2}})'
+    rf'|(?P<month>\d{{1,2}})[/-](?P<day>\d{{1,2}})[/-](?P<year>\d{{4}}|\d{{2}})'
+    rf'|(?P<name_month>{_MONTH})\s+(?P<name_day>\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s*(?P<name_year>\d{{4}}))?'
+    rf'|(?P<day_first>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month_second>{_MONTH}),?\s*(?P<year_last>\d{{4}})'
+    rf')(?!\w)',
+    re.I,
+)
+NUMBER_RX = re.compile(
+    r'(?<![\w.])(?P<value>\d+(?:\.\d+)?)\s*'
+    r'(?P<unit>mg|mcg|g|kg|lbs?|ml|l|cm|mm|m|in|ft|%|mmhg|bpm|units?|hours?|hrs?|days?|weeks?|months?|years?)'
+    r'(?!\w)',
+    re.I,
+)
+SCORE_RX = re.compile(
+    r'\b(?P<name>(?:[a-z][\w-]*\s+){0,2}?)score\s*(?::|of|=|was|is)?\s*(?P<value>\d+(?:\.\d+)?)'
+    r'(?:\s*/\s*(?P<total>\d+))?',
+    re.I,
+)
+
+
+def find_dates(text):
+    """Yield dates; value is a `datetime.date`, or None if the year is missing or the date is invalid."""
+    for m in DATE_RX.finditer(text):
+        yield m.start(), m.end(), _parse_date(m)
+
+
+def _parse_date(m):
+    if m.group('iso_year'):
+        year, month, day = m.group('iso_year'), m.group('iso_month'), m.group('iso_day')
+    elif m.group('year'):
+        year, month, day = m.group('year'), m.group('month'), m.group('day')
+        if len(year) == 2:
+            year = f'20{year}'
+    elif m.group('name_month'):
+        year, month, day = m.group('name_year'), _month_number(m.group('name_month')), m.group('name_day')
+    else:
+        year, month, day = m.group('year_last'), _month_number(m.group('month_second')), m.group('day_first')
+    if year is None:
+        return None
+    try:
+        return datetime.date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def _month_number(name):
+    name = name.lower().rstrip('.')
+    return next(i for i, month in enumerate(_MONTHS, start=1) if month.startswith(name[:3]))
+
+
+def find_numbers(text):
+    """Yield numbers with units; value is (number, lowercased unit)."""
+    for m in NUMBER_RX.finditer(text):
+        yield m.start(), m.end(), (float(m.group('value')), m.group('unit').lower())
+
+
+def find_scores(text):
+    """Yield scores (e.g., 'pain score: 7', 'score of 3/10'); value is (name, score, total or None)."""
+    for m in SCORE_RX.finditer(text):
+        name = ' '.join(m.group('name').lower().split()) or None
+        total = float(m.group('total')) if m.group('total') else None
+        yield m.start(), m.end(), (name, float(m.group('value')), total)
+
+
+DEFAULT_ANNOTATORS = {
+    'date': find_dates,
+    'number': find_numbers,
+    'score': find_scores,
+}
@@ -11,33 +11,21 @@ import csv
 import json
 from pathlib import Path
 
-try:
-    import spacy
-except ImportError:
-    spacy = None
-
-from konsepy.cli import add_outdir_and_infiles
+from konsepy.cli import add_outdir_and_infiles, add_sentence_args, parse_and_clean_args
 from konsepy.constants import NOTETEXT_LABEL, NOTEDATE_LABEL, NOTEID_LABEL, ID_LABEL
 from konsepy.importer import get_all_concepts
+from konsepy.results import get_result_label
+from konsepy.sentences import iter_sentences
 from konsepy.textio import iterate_csv_file
 from konsepy.types import RegexDict
 
 
-def format_for_spacy(row_iter):
-    for count, studyid, note_id, note_date, text in row_iter:
-        yield text, (count, studyid, note_id, note_date)
-
-
-def get_pipeline(sentence_model, spacy_model='en_core_web_sm'):
-    if sentence_model == 'senter':
-        nlp = spacy.load(spacy_model,
-                         disable=('tok2vec', 'tagger', 'attribute_ruler', 'lemmatizer', 'ner', 'parser'))
-        nlp.enable_pipe('senter')
-    elif sentence_model == 'parser':
-        nlp = spacy.load(spacy_model, disable=('tagger', 'attribute_ruler', 'lemmatizer', 'ner'))
-    else:
-        raise ValueError(f'Unrecognized `sentence_model`: {sentence_model}.')
-    return nlp
+def format_for_spacy(row_iter, limit_noteids=None):
+    """Yield (text, context) pairs, skipping notes not in `limit_noteids` before any sentence splitting."""
+    for count, studyid, note_id, note_date, text, metadata in row_iter:
+        if limit_noteids and note_id not in limit_noteids:
+            continue
+        yield text, (count, studyid, note_id, note_date, metadata)
 
 
 def build_regex_dict(package_name):
@@ -47,18 +35,20 @@ def build_regex_dict(package_name):
 
 
 def get_bio_tags_sentence(input_files, outdir: Path, *, package_name: str = None, regexes: RegexDict = None,
-                          sentence_model='senter',
+                          sentence_model='senter', batch_size=256, n_process=1,
                           id_label=ID_LABEL, noteid_label=NOTEID_LABEL,
                           notedate_label=NOTEDATE_LABEL, notetext_label=NOTETEXT_LABEL,
-                          noteorder_label=None, metadata_labels=None, limit_noteids=None):
+                          noteorder_label=None, metadata_labels=None, encoding='latin1',
+                          limit_noteids=None):
     """
+    Run regexes over each sentence of each note, writing one csv row per match and one jsonl line per sentence.
 
+    sentence_model: 'senter' or 'parser' (spaCy), or 'rules' (no spaCy model required)
+    batch_size: number of notes sent to the sentence splitter at a time
+    n_process: number of processes used to split sentences
     """
     outdir.mkdir(exist_ok=True)
 
-    # prepare sentence splitter
-    nlp = get_pipeline(sentence_model)
-
     if not package_name and not regexes:
         raise ValueError(f'Either `regexes` or `package_name` must be specified.')
     regexes = regexes or build_regex_dict(package_name)
@@ -74,21 +64,24 @@ def get_bio_tags_sentence(input_files, outdir: Path, *, package_name: str = None
         )
         writer.writeheader()
         i = 0
-        for doc, (count, studyid, note_id, note_date, metadata) in nlp.pipe(format_for_spacy(
-                iterate_csv_file(
-                    input_files, id_label=id_label, noteid_label=noteid_label, notedate_label=notedate_label,
-                    notetext_label=notetext_label, noteorder_label=noteorder_label, metadata_labels=metadata_labels,
-                )
-        ), as_tuples=True):
-            if limit_noteids and note_id not in limit_noteids:
-                continue
+        for sentences, (count, studyid, note_id, note_date, metadata) in iter_sentences(
+                format_for_spacy(
+                    iterate_csv_file(
+                        input_files, encoding=encoding, id_label=id_label, noteid_label=noteid_label,
+                        notedate_label=notedate_label, notetext_label=notetext_label,
+                        noteorder_label=noteorder_label, metadata_labels=metadata_labels,
+                    ),
+                    limit_noteids=limit_noteids,
+                ),
+                sentence_model, batch_size=batch_size, n_process=n_process,
+        ):
             constant_meta = {
                 'studyid': studyid,
                 'note_id': note_id,
             }
-            for sent_id, sentence in enumerate(doc.sents):
+            for sent_id, sentence in enumerate(sentences):
                 start_char = sentence.start_char
-                sentence = str(sentence)
+                sentence = sentence.text
                 curr_note = {  # records for this text note
                     'results': [],
                     'text': sentence,
@@ -102,7 +95,7 @@ def get_bio_tags_sentence(input_files, outdir: Path, *, package_name: str = None
                             data = {
                                 'index': i,
                                 'domain': domain,
-                                'category': category,
+                                'category': str(get_result_label(category)),
                                 'capture': m.group(),
                                 'start': m.start(),
                                 'end': m.end(),
@@ -116,4 +109,7 @@ def get_bio_tags_sentence(input_files, outdir: Path, *, package_name: str = None
 
 
 if __name__ == '__main__':
-    get_bio_tags_sentence(**vars(add_outdir_and_infiles().parse_args()))
+    _parser = add_outdir_and_infiles()
+    _parser.add_argument('--package-name', required=True, help='Name of package.')
+    add_sentence_args(_parser)
+    get_bio_tags_sentence(**parse_and_clean_args(_parser))
@@ -0,0 +1,197 @@
+"""
+Persistent, content-addressed cache of concept results.
+
+Clinical corpora contain many verbatim copies of the same note (templates, copy-forward), so results are keyed on
+the concept's source hash, the note text hash, and the metadata the concept actually receives. A hit lets
+`ProcessingEngine` skip `RUN_REGEXES_FUNC` and rebuild the matches against the current note.
+"""
+import hashlib
+import inspect
+import json
+import sqlite3
+from enum import Enum
+from pathlib import Path
+
+from loguru import logger
+
+from konsepy.results import ExtractionResult
+from konsepy.rxutils import FrozenMatch
+
+_PRIMITIVES = (str, int, float, bool, type(None))
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode('utf8', 'surrogatepass')).hexdigest()
+
+
+def get_cache_key(concept, text_hash, metadata=None, options=''):
+    """
+    Build a cache key from concept source, note text, and the metadata visible to the concept.
+
+    options: fingerprint of engine options which change concept results (see `fingerprint_options`)
+    """
+    metadata = concept.relevant_metadata(metadata or {})
+    metadata_repr = repr(sorted(metadata.items()))
+    return hashlib.sha256(
+        f'{concept.name}\0{concept.source_hash}\0{text_hash}\0{metadata_repr}\0{options}'.encode(
+            'utf8', 'surrogatepass')
+    ).hexdigest()
+
+
+def fingerprint_options(options):
+    """Hash a dict of engine options, including the source of any functions, so changing them invalidates keys."""
+    if not options:
+        return ''
+    return hashlib.sha256(_describe_option(options).encode('utf8', 'surrogatepass')).hexdigest()
+
+
+def _describe_option(value):
+    if isinstance(value, dict):
+        return '{' + ','.join(f'{key!r}:{_describe_option(v)}' for key, v in sorted(value.items(), key=repr)) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(_describe_option(v) for v in value) + ']'
+    if isinstance(value, (set, frozenset)):
+        return '{' + ','.join(sorted(_describe_option(v) for v in value)) + '}'
+    if callable(value):
+        name = f'{getattr(value, "__module__", "")}.{getattr(value, "__qualname__", repr(value))}'
+        try:
+            source = inspect.getsource(value)
+        except (OSError, TypeError):
+            source = ''
+        return f'{name}:{hashlib.sha256(source.encode("utf8", "surrogatepass")).hexdigest()}'
+    return repr(value)
+
+
+class ResultCache:
+    """
+    Sqlite-backed result cache with least-recently-used eviction.
+
+    max_entries: maximum number of cached (concept, note) results to retain
+    """
+
+    def __init__(self, path, max_entries=1_000_000, commit_every=10_000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' last_used INTEGER NOT NULL'
+            ')'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+        self._clock, self._size = self._connection.execute(
+            'SELECT COALESCE(MAX(last_used), 0), COUNT(*) FROM results'
+        ).fetchone()
+
+    def get(self, key):
+        row = self._connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._clock += 1
+        self._connection.execute('UPDATE results SET last_used = ? WHERE key = ?', (self._clock, key))
+        self._mark_dirty()
+        return row[0]
+
+    def put(self, key, value):
+        self._clock += 1
+        cursor = self._connection.execute(
+            'INSERT OR IGNORE INTO results (key, value, last_used) VALUES (?, ?, ?)', (key, value, self._clock)
+        )
+        self._size += cursor.rowcount
+        if self._size > self.max_entries:
+            self._evict()
+        self._mark_dirty()
+
+    def _evict(self):
+        # evict in batches to amortize the cost of the delete
+        excess = self._size - self.max_entries + self.max_entries // 100
+        cursor = self._connection.execute(
+            'DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used LIMIT ?)', (excess,)
+        )
+        self._size -= cursor.rowcount
+
+    def _mark_dirty(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self._connection.commit()
+            self._pending = 0
+
+    @property
+    def lookups(self):
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def log_summary(self):
+        logger.info(f'Result cache: {self.hits:,} hits of {self.lookups:,} lookups'
+                    f' ({self.hit_rate:.1%} hit rate; {self._size:,} entries in {self.path}).')
+
+    def close(self):
+        self._connection.commit()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def encode_results(categories, matches, text, concept):
+    """Serialize results compactly; return None if they cannot be faithfully cached."""
+    enums = {category_enum.__name__: category_enum for category_enum in concept.category_enums}
+    try:
+        encoded_categories = [_encode_category(category, enums) for category in categories]
+    except TypeError:
+        return None
+    encoded_matches = None
+    if matches is not None:
+        encoded_matches = []
+        for m in matches:
+            if m.string is not text and m.string != text:
+                return None  # match is not on the note (e.g., a postprocessor returned a match on a context)
+            encoded_matches.append(FrozenMatch.from_match(m, string=text).to_data())
+    return json.dumps({'categories': encoded_categories, 'matches': encoded_matches}, separators=(',', ':'))
+
+
+def decode_results(value, text, concept):
+    """Rebuild (categories, matches) from a cached value, binding matches to `text`."""
+    data = json.loads(value)
+    enums = {category_enum.__name__: category_enum for category_enum in concept.category_enums}
+    categories = [_decode_category(category, enums) for category in data['categories']]
+    matches = None
+    if data['matches'] is not None:
+        matches = [FrozenMatch.from_data(text, match_data) for match_data in data['matches']]
+    return categories, matches
+
+
+def _encode_category(category, enums):
+    if isinstance(category, ExtractionResult):
+        if not isinstance(category.value, _PRIMITIVES) or not isinstance(category.group, _PRIMITIVES):
+            raise TypeError(f'Unable to cache extracted value: {category.value!r}')
+        return {'label': _encode_category(category.label, enums), 'value': category.value, 'group': category.group}
+    if isinstance(category, Enum):
+        if enums.get(type(category).__name__) is not type(category):
+            raise TypeError(f'Unable to resolve category enum: {category!r}')
+        return {'enum': type(category).__name__, 'name': category.name}
+    if isinstance(category, _PRIMITIVES):
+        return {'value': category}
+    raise TypeError(f'Unable to cache category: {category!r}')
+
+
+def _decode_category(data, enums):
+    if 'enum' in data:
+        return enums[data['enum']][data['name']]
+    if 'label' in data:
+        return ExtractionResult(label=_decode_category(data['label'], enums), value=data['value'], group=data['group'])
+    return data['value']
@@ -3,6 +3,7 @@ import datetime
 from pathlib import Path
 
 from konsepy.constants import NOTETEXT_LABEL, NOTEDATE_LABEL, NOTEID_LABEL, ID_LABEL
+from konsepy.sentences import SENTENCE_MODELS
 
 
 def concept_cli(func):
@@ -31,6 +32,12 @@ def add_common_cli(parser: argparse.ArgumentParser):
                         help='Name of concepts to process/run regular expressions for.')
     parser.add_argument('--require-regex', default=None,
                         help='Output text containing this regex but in which no regexes were found.')
+    parser.add_argument('--max-snippets', default=10_000, type=int,
+                        help='Maximum number of distinct not-found snippets to retain in memory;'
+                             ' the most frequent are counted in snippets.csv, and a sample is in snippets_sample.csv.')
+    parser.add_argument('--max-snippet-length', default=500, type=int,
+                        help='Truncate not-found snippets (whole notes unless --require-regex is given) to this'
+                             ' many characters; with --max-snippets, this bounds the memory used for snippets.')
     parser.add_argument('--start-after', default=0, type=int,
                         help='Start after skipping this many records')
     parser.add_argument('--stop-after', default=None, type=int,
@@ -78,6 +85,37 @@ def add_run_all_args(parser: argparse.ArgumentParser = None):
                         help='Change the window for the pre/post contexts')
     parser.add_argument('--word-window', dest='word_window', default=None, type=int,
                         help='Change the word window for the pre/post contexts')
+    parser.add_argument('--anchor-index', action='store_true', default=False,
+                        help='Find literal anchors of all regexes in one pass over each note and skip regexes'
+                             ' whose anchors are absent (faster; results are unchanged).')
+    parser.add_argument('--regex-backend', choices=['re', 'regex', 're2'], default=None,
+                        help='Regex engine for patterns compiled with `rx_compile` (default: re). `regex` supports'
+                             ' duplicate group names natively; `re2` runs in linear time where the pattern allows.')
+    parser.add_argument('--sections', nargs='+', default=None,
+                        help='Only search text within these sections (e.g., assessment_and_plan medications);'
+                             ' see `konsepy.sections.DEFAULT_SECTION_HEADERS`.')
+    parser.add_argument('--annotators', nargs='+', choices=['date', 'number', 'score'], default=None,
+                        help='Shared annotations computed once per note and passed to postprocessors as'
+                             ' `annotations` (see `konsepy.annotations`).')
+    parser.add_argument('--regex-timeout', type=float, default=None,
+                        help='Maximum seconds for a single regex on a note; concepts run in a separate process'
+                             ' and notes exceeding the budget are skipped and recorded in quarantine.jsonl.')
+    parser.add_argument('--note-timeout', type=float, default=None,
+                        help='Maximum seconds for all concepts on a single note (see `--regex-timeout`).')
+    parser.add_argument('--result-cache', dest='result_cache', default=None, type=Path,
+                        help='Path to a persistent result cache (sqlite) re-used across duplicate notes and runs.')
+    parser.add_argument('--result-cache-size', dest='result_cache_size', default=1_000_000, type=int,
+                        help='Maximum number of results retained in `--result-cache` (least recently used evicted).')
+
+
+def add_sentence_args(parser: argparse.ArgumentParser):
+    parser.add_argument('--sentence-model', choices=SENTENCE_MODELS, default='senter',
+                        help='Sentence splitter: spaCy senter/parser, or fast rules requiring no spaCy model.')
+    parser.add_argument('--batch-size', type=int, default=256,
+                        help='Number of notes sent to the sentence splitter at a time.')
+    parser.add_argument('--n-process', type=int, default=1,
+                        help='Number of processes used to split sentences.')
+    return parser
 
 
 def _get_casting_func(target, format_=None):
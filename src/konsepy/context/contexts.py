@@ -1,5 +1,7 @@
 import re
 
+from konsepy.context.cues import has_banned_characters
+
 
 def get_precontext(m, text, window=20, start=None, word_window=None, region_start=0):
     if start is None:
@@ -150,34 +152,42 @@ def get_contexts_by_index(start, end, text, window=20, context_match=None, conte
 
 
 def check_if_pattern_after(pattern, m, text, window=20, banned_characters='.', end=None, return_concept=None, **kwargs):
+    if end is None:
+        end = m.end()
     postcontext = get_postcontext(m, text, window=window, end=end)
     if m2 := pattern.search(postcontext):
-        for ch in banned_characters:
-            if ch in postcontext[:m2.start()]:
-                return None
+        if has_banned_characters(postcontext, 0, m2.start(), banned_characters, note=text, offset=end):
+            return None
         return m2 if return_concept is None else return_concept
 
 
 def check_if_pattern_before(pattern, m, text, window=20, banned_characters='.', start=None, return_concept=None,
                             **kwargs):
+    if start is None:
+        start = m.start()
     precontext = get_precontext(m, text, window=window, start=start)
     if m2 := pattern.search(precontext):
-        for ch in banned_characters:
-            if ch in precontext[m2.end():]:
-                return None
+        if has_banned_characters(precontext, m2.end(), None, banned_characters,
+                                 note=text, offset=start - len(precontext)):
+            return None
         return m2 if return_concept is None else return_concept
 
 
 def check_if_pattern_around(pattern, m, text, window=20, banned_characters='.', start=None, end=None,
                             return_concept=None, **kwargs):
+    """Return first match of `pattern` around `m` not separated from it by a banned character."""
+    if start is None:
+        start = m.start()
+    if end is None:
+        end = m.end()
     around = get_around(m, text, window, start=start, end=end)
+    offset = max(0, start - window)
     for m2 in pattern.finditer(around):
-        if m2.end() < m.start():  # match before
-            for ch in banned_characters:
-                if ch in around[m2.end():m.start()]:
-                    continue
-        elif m2.start() > m.end():
-            for ch in banned_characters:
-                if ch in around[m.end():m2.start()]:
-                    continue
+        m2_start, m2_end = offset + m2.start(), offset + m2.end()
+        if m2_end <= start:  # match before
+            if has_banned_characters(text, m2_end, start, banned_characters, note=text):
+                continue
+        elif m2_start >= end:  # match after
+            if has_banned_characters(text, end, m2_start, banned_characters, note=text):
+                continue
         return m2 if return_concept is None else return_concept
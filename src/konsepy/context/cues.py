@@ -0,0 +1,98 @@
+"""
+Per-note cache of context cue lookups (e.g., negation or other-subject terms) and banned characters.
+
+Cue patterns are still run against each match's pre/postcontext (so that, e.g., a word truncated by the edge of
+the context window is treated exactly as before), but lookups are memoized per note so that repeated contexts
+(e.g., the same match checked by several concepts) are only searched once, and banned characters are resolved
+from a single scan of the note. (A note-level index of cue positions would need every cue crossing a window edge
+to be re-checked against the window, which costs more than searching the short window itself.)
+"""
+import functools
+import re
+from bisect import bisect_left
+
+
+class NoteCues:
+    """Memoized cue lookups and sorted banned-character (e.g., sentence boundary) positions for a single note."""
+
+    def __init__(self, text):
+        self.text = text
+        self._cues = {}  # (pattern, start, end) -> first match in text[start:end]
+        self._banned = {}  # banned characters -> sorted positions
+
+    def search(self, pattern, start, end):
+        """Return first match of `pattern` in the context text[start:end] (offsets relative to the context)."""
+        key = (pattern, start, end)
+        if key not in self._cues:
+            self._cues[key] = pattern.search(self.text[start:end])
+        return self._cues[key]
+
+    def _get_banned(self, banned_characters):
+        if banned_characters not in self._banned:
+            self._banned[banned_characters] = [
+                m.start() for m in re.finditer(f'[{re.escape(banned_characters)}]', self.text)
+            ] if banned_characters else []
+        return self._banned[banned_characters]
+
+    def has_banned(self, banned_characters, start, end):
+        """Is any of the banned characters in text[start:end]?"""
+        if not isinstance(banned_characters, str):  # e.g., a list of multi-character strings
+            return any(ch in self.text[start:end] for ch in banned_characters)
+        positions = self._get_banned(banned_characters)
+        index = bisect_left(positions, start)
+        return index < len(positions) and positions[index] < end
+
+    def find_before(self, pattern, start, end, banned_characters='.'):
+        """Cue in text[start:end] (a precontext) with no banned character between it and `end`."""
+        if (cue := self.search(pattern, start, end)) and not self.has_banned(banned_characters,
+                                                                             start + cue.end(), end):
+            return cue
+        return None
+
+    def find_after(self, pattern, start, end, banned_characters='.'):
+        """Cue in text[start:end] (a postcontext) with no banned character between `start` and it."""
+        if (cue := self.search(pattern, start, end)) and not self.has_banned(banned_characters,
+                                                                             start, start + cue.start()):
+            return cue
+        return None
+
+
+@functools.lru_cache(maxsize=8)
+def get_note_cues(text):
+    """
+    Return the (cached) cues for `text`. These are kept in their own small cache rather than
+    `konsepy.notecache.note_memo` since helpers may be called on text other than the note (e.g., a
+    context), which would otherwise reset the values cached for the note itself.
+    """
+    return NoteCues(text)
+
+
+def has_banned_characters(context, start, end, banned_characters='.', note=None, offset=0):
+    """
+    Is any banned character in context[start:end]?
+
+    note: full note text from which `context` was sliced at `offset`; if supplied, the note's sorted index of
+        banned character positions is used instead of scanning the slice
+    """
+    if end is None:
+        end = len(context)
+    if note is None:
+        segment = context[start:end]
+        return any(ch in segment for ch in banned_characters)
+    return get_note_cues(note).has_banned(banned_characters, offset + start, offset + end)
+
+
+def get_context_span(m, precontext=None, postcontext=None, text=''):
+    """
+    Return (start, end) of the pre- or postcontext within `text`, or None if the context was not
+    taken from `text` around `m` (in which case callers should search the context itself).
+    """
+    if precontext is not None:
+        start = m.start() - len(precontext)
+        if start >= 0 and text.startswith(precontext, start):
+            return start, m.start()
+        return None
+    end = m.end() + len(postcontext)
+    if text.startswith(postcontext, m.end()):
+        return m.end(), end
+    return None
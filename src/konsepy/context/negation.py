@@ -1,6 +1,6 @@
 import re
 
-from konsepy.context.contexts import get_contexts
+from konsepy.context.cues import get_context_span, get_note_cues, has_banned_characters
 from konsepy.rxsearch import SKIP
 
 DEFAULT_PRENEG_PAT = re.compile(
@@ -20,9 +20,9 @@ def is_not_negated(m, precontext, postcontext, banned_characters='.', **kwargs):
 
 def check_if_negated(m, precontext, postcontext, text, window, neg_concept=SKIP, **kwargs):
     direction = 0
-    if m2 := has_negation(precontext, direction=-1, **kwargs):
+    if m2 := _find_negation(m, precontext, text, direction=-1, **kwargs):
         direction = -1
-    elif m2 := has_negation(postcontext, direction=1, **kwargs):
+    elif m2 := _find_negation(m, postcontext, text, direction=1, **kwargs):
         direction = 1
     if m2:
         # TODO: fix this: I think it's uposed to look between matches for puncutation (already accounted for)
@@ -35,6 +35,20 @@ def check_if_negated(m, precontext, postcontext, text, window, neg_concept=SKIP,
     return None
 
 
+def _find_negation(m, context, text, direction, prenegation_pat=DEFAULT_PRENEG_PAT,
+                   postnegation_pat=DEFAULT_POSTNEG_PAT, banned_characters='.', **kwargs):
+    """Look up negation in the pre- (direction=-1) or postcontext (1) using the note's cue cache."""
+    if direction == -1:
+        span = get_context_span(m, precontext=context, text=text)
+        if span is None:  # context not taken from text
+            return has_prenegation(context, prenegation_pat, banned_characters)
+        return get_note_cues(text).find_before(prenegation_pat, *span, banned_characters)
+    span = get_context_span(m, postcontext=context, text=text)
+    if span is None:
+        return has_postnegation(context, postnegation_pat, banned_characters)
+    return get_note_cues(text).find_after(postnegation_pat, *span, banned_characters)
+
+
 def has_negation(text, direction=0, prenegation_pat=DEFAULT_PRENEG_PAT,
                  postnegation_pat=DEFAULT_POSTNEG_PAT, banned_characters='.',
                  m=None, window=20, **kwargs):
@@ -43,33 +57,42 @@ def has_negation(text, direction=0, prenegation_pat=DEFAULT_PRENEG_PAT,
     direction = set to -1 (precontext) or 1 (postcontext) to ensure is in same sentence
     """
     if m is not None:
-        pretext = text[max(0, m.start() - window):m.start()]
+        pre_offset = max(0, m.start() - window)
+        pretext = text[pre_offset:m.start()]
         posttext = text[m.end(): m.end() + window]
+        note, post_offset = text, m.end()
     else:
         pretext = text
         posttext = text
+        note, pre_offset, post_offset = None, 0, 0
     if direction == -1:  # precontext
-        return has_prenegation(pretext, prenegation_pat, banned_characters)
+        return has_prenegation(pretext, prenegation_pat, banned_characters, note=note, offset=pre_offset)
     elif direction == 1:  # postcontext
-        return has_postnegation(posttext, postnegation_pat, banned_characters)
+        return has_postnegation(posttext, postnegation_pat, banned_characters, note=note, offset=post_offset)
     elif direction == 0:  # both directions
-        return (has_prenegation(pretext, prenegation_pat, banned_characters)
-                or has_postnegation(posttext, postnegation_pat, banned_characters))
+        return (has_prenegation(pretext, prenegation_pat, banned_characters, note=note, offset=pre_offset)
+                or has_postnegation(posttext, postnegation_pat, banned_characters, note=note, offset=post_offset))
     else:
         raise ValueError(f'Unexpected negation direction: {direction} (expected: -1 [pre], 0 [both], or 1 [post]).')
 
 
-def has_prenegation(text, prenegation_pat=DEFAULT_PRENEG_PAT, banned_characters='.'):
+def has_prenegation(text, prenegation_pat=DEFAULT_PRENEG_PAT, banned_characters='.', *, note=None, offset=0):
+    """
+    note: full note from which `text` was sliced at `offset`; banned characters are then looked up in
+        the note's boundary index
+    """
     if m := prenegation_pat.search(text):
-        for ch in banned_characters:
-            if ch in text[m.end():]:
-                return None
+        if has_banned_characters(text, m.end(), None, banned_characters, note=note, offset=offset):
+            return None
         return m
 
 
-def has_postnegation(text, postnegation_pat=DEFAULT_POSTNEG_PAT, banned_characters='.'):
+def has_postnegation(text, postnegation_pat=DEFAULT_POSTNEG_PAT, banned_characters='.', *, note=None, offset=0):
+    """
+    note: full note from which `text` was sliced at `offset`; banned characters are then looked up in
+        the note's boundary index
+    """
     if m := postnegation_pat.search(text):
-        for ch in banned_characters:
-            if ch in text[:m.start()]:
-                return None
+        if has_banned_characters(text, 0, m.start(), banned_characters, note=note, offset=offset):
+            return None
         return m
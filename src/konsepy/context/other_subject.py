@@ -1,6 +1,6 @@
 import re
 
-from konsepy.context.contexts import get_contexts
+from konsepy.context.cues import get_context_span, get_note_cues, has_banned_characters
 from konsepy.rxsearch import SKIP
 
 OTHER_SUBJECT = [
@@ -25,20 +25,21 @@ OTHER_SUBJECT_RX = re.compile('(?:{})'.format(
 )
 
 
-def has_other_subject(text, direction=0, other_subject_rx=OTHER_SUBJECT_RX, banned_characters='.'):
+def has_other_subject(text, direction=0, other_subject_rx=OTHER_SUBJECT_RX, banned_characters='.', *,
+                      note=None, offset=0):
     """Return first mention of other subject
 
     direction = set to -1 (precontext) or 1 (postcontext) to ensure is in same sentence
+    note: full note from which `text` was sliced at `offset`; banned characters are then looked up in
+        the note's boundary index
     """
     if m := other_subject_rx.search(text):
         if direction == -1:  # precontext
-            for ch in banned_characters:
-                if ch in text[m.end():]:
-                    return None
+            if has_banned_characters(text, m.end(), None, banned_characters, note=note, offset=offset):
+                return None
         elif direction == 1:  # postcontext
-            for ch in banned_characters:
-                if ch in text[:m.start()]:
-                    return None
+            if has_banned_characters(text, 0, m.start(), banned_characters, note=note, offset=offset):
+                return None
         return m
     return None
 
@@ -57,18 +58,26 @@ def is_not_other_subject(m, precontext, postcontext, **kwargs):
 
 def check_if_other_subject(m, precontext, postcontext, text, window=30, banned_characters='.',
                            other_concept=SKIP, return_match=False, **kwargs):
-    if m2 := has_other_subject(precontext, direction=-1, banned_characters=banned_characters):
-        if is_not_other_subject(**get_contexts(
-                m2, text, context_match=m, context_window=window, context_direction=-1,
-        )):
-            pass  # might still be in post-context
-        else:
-            return m2 if return_match else other_concept
-    if m2 := has_other_subject(postcontext, direction=1, banned_characters=banned_characters):
-        if is_not_other_subject(**get_contexts(
-                m2, text, context_match=m, context_window=window, context_direction=1,
-        )):
-            pass
-        else:
-            return m2 if return_match else other_concept
+    for direction, context in ((-1, precontext), (1, postcontext)):
+        if not (m2 := _find_other_subject(m, context, text, direction, banned_characters)):
+            continue
+        # exception contexts, as from `get_contexts(m2, text, context_match=m, context_window=window, ...)`
+        offset = max(0, m.start() - window) if direction == -1 else m.end()
+        start, end = offset + m2.start(), offset + m2.end()
+        if is_not_other_subject(m2, text[max(0, start - 20):start], text[end:end + 20]):
+            continue  # might still be in post-context
+        return m2 if return_match else other_concept
     return None
+
+
+def _find_other_subject(m, context, text, direction, banned_characters='.'):
+    """Look up other subject in the pre- (direction=-1) or postcontext (1) using the note's cue cache."""
+    if direction == -1:
+        span = get_context_span(m, precontext=context, text=text)
+        if span is None:  # context not taken from text
+            return has_other_subject(context, direction=direction, banned_characters=banned_characters)
+        return get_note_cues(text).find_before(OTHER_SUBJECT_RX, *span, banned_characters)
+    span = get_context_span(m, postcontext=context, text=text)
+    if span is None:
+        return has_other_subject(context, direction=direction, banned_characters=banned_characters)
+    return get_note_cues(text).find_after(OTHER_SUBJECT_RX, *span, banned_characters)
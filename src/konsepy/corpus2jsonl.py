@@ -1,63 +1,139 @@
+import bisect
 import datetime
+import itertools
 import json
-from collections import Counter
 from pathlib import Path
 
 from loguru import logger
 
-from konsepy.bio_tag_sentence import get_pipeline
-from konsepy.cli import add_outdir_and_infiles
+from konsepy.cli import add_outdir_and_infiles, add_sentence_args, parse_and_clean_args
 from konsepy.constants import NOTEDATE_LABEL, ID_LABEL, NOTEID_LABEL, NOTETEXT_LABEL
+from konsepy.sections import SectionSegmenter
+from konsepy.sentences import iter_sentences
 from konsepy.textio import iterate_csv_file
 
 
-def get_target_overlap(sentences: list[tuple[int, str]], max_previous):
-    """Determine how many sentences can be retained to provide additional context."""
-    if len(sentences) == 1:
-        return 2, [], 0  # if only a single sentence, don't include in next window
-    total_length = 0
-    total_char_length = 0
-    for i, (length, sentence) in enumerate(sentences[::-1]):
-        if total_length + length >= max_previous:
-            if i == 0 and length > max_previous * 2:
-                return 2, [], 0  # previous sentence is too long
-            return length + 2, sentences[min(-1, -i):], total_char_length
-        total_length += length
-        total_char_length += len(sentence)
-    return total_length + 2, sentences[-1:], total_char_length  # just the last sentence
+def sentence_token_lengths(tokenizer, texts, sentences_per_text):
+    """
+    Count the tokens in each sentence of each text with a single tokenizer call.
+
+    A fast tokenizer encodes the whole texts, and each token is assigned to the sentence containing the start of
+    its offset mapping; other tokenizers encode all sentences in one batch.
+    """
+    if getattr(tokenizer, 'is_fast', False):
+        encodings = tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True,
+                              return_attention_mask=False, return_token_type_ids=False)
+        result = []
+        for offsets, sentences in zip(encodings['offset_mapping'], sentences_per_text):
+            starts = [start for start, end in offsets if end > start]
+            result.append([
+                bisect.bisect_left(starts, sent.end_char) - bisect.bisect_left(starts, sent.start_char)
+                for sent in sentences
+            ])
+        return result
+    input_ids = tokenizer([sent.text for sentences in sentences_per_text for sent in sentences],
+                          add_special_tokens=False)['input_ids']
+    lengths = iter(len(ids) for ids in input_ids)
+    return [[next(lengths) for _ in sentences] for sentences in sentences_per_text]
+
+
+def chunk_sentences(sentences, lengths, max_seq_length=512, overlap=0):
+    """
+    Pack sentences into chunks of at most `max_seq_length` tokens (including 2 special tokens), ending chunks at
+    paragraph ends. With `overlap`, a chunk begins with the trailing sentences (of at most `overlap` tokens) of
+    the previous chunk, excluding its first sentence (so a single-sentence chunk is never repeated). A sentence
+    longer than `max_seq_length` forms its own chunk.
+
+    Return: list of (first, last) indices into `sentences`, where `last` is exclusive
+    """
+    cumsum = list(itertools.accumulate(lengths, initial=0))
+    paragraph_ends = [i for i, sent in enumerate(sentences) if sent.ends_paragraph]
+    budget = max_seq_length - 2
+    chunks = []
+    start = end = 0
+    while end < len(sentences):
+        if cumsum[end + 1] - cumsum[start] > budget:  # drop overlap to fit the next sentence
+            start = bisect.bisect_left(cumsum, cumsum[end + 1] - budget, start, end)
+        prev_end = end
+        end = max(bisect.bisect_right(cumsum, cumsum[start] + budget) - 1, prev_end + 1)
+        paragraph_idx = bisect.bisect_left(paragraph_ends, prev_end)
+        if paragraph_idx < len(paragraph_ends) and paragraph_ends[paragraph_idx] < end:
+            end = paragraph_ends[paragraph_idx] + 1
+        chunks.append((start, end))
+        if overlap and end - start > 1:  # keep trailing sentences, but never the whole chunk
+            start = bisect.bisect_left(cumsum, cumsum[end] - overlap, start + 1, end)
+        else:
+            start = end
+    return chunks
+
+
+def _iter_batches(items, size):
+    items = iter(items)
+    while batch := list(itertools.islice(items, size)):
+        yield batch
 
 
 def corpus2jsonl(input_files, outdir: Path, *,
                  split=None, max_seq_length=512, tokenizer=None,
-                 sentence_model='senter',
+                 sentence_model='senter', batch_size=256, n_process=1,
                  id_label=ID_LABEL, noteid_label=NOTEID_LABEL,
                  notedate_label=NOTEDATE_LABEL, notetext_label=NOTETEXT_LABEL,
                  noteorder_label=None, metadata_labels=None, encoding='utf8',
-                 limit_noteids=None):
+                 limit_noteids=None, section_segmenter=None):
     """
     Convert a corpus to a jsonl format, suitable for using prodigy
+
+    sentence_model: 'senter' or 'parser' (spaCy), or 'rules' (no spaCy model required)
+    batch_size: number of notes sent to the sentence splitter at a time
+    n_process: number of processes used to split sentences
+    tokenizer: path to (or instance of) tokenizer counting tokens when `split` is sent_chunk or sent_window;
+        the sentences of `batch_size` notes are counted with one call, so prefer a fast tokenizer
+    section_segmenter: `SectionSegmenter` used when `split == 'section'` (default: built-in header lexicon)
     """
-    if split in {'sentence', 'sent_chunk', 'sent_window'}:
-        nlp = get_pipeline(sentence_model)
-    if split in {'sent_chunk', 'sent_window'}:
+    if split in {'sent_chunk', 'sent_window'} and (tokenizer is None or isinstance(tokenizer, (str, Path))):
         from transformers import AutoTokenizer
         tokenizer = AutoTokenizer.from_pretrained(tokenizer)
+    if split == 'section':
+        section_segmenter = section_segmenter or SectionSegmenter(default_section='preamble')
     start_time = datetime.datetime.now()
     dt = start_time.strftime("%Y%m%d_%H%M%S")
     if split is not None:
         name = f'corpus_{dt}.{split}.jsonl'
     else:
         name = f'corpus_{dt}.jsonl'
-    length_counter = Counter()
-    with open(outdir / name, 'w', encoding='utf8') as out:
+    truncated = []  # token lengths of sentences longer than `max_seq_length`
+    notes = (
+        (count, studyid, note_id, note_date, text)
         for count, studyid, note_id, note_date, text, metadata in iterate_csv_file(
-                input_files, encoding=encoding,
-                id_label=id_label, noteid_label=noteid_label,
-                notedate_label=notedate_label, notetext_label=notetext_label,
-                noteorder_label=noteorder_label, metadata_labels=metadata_labels,
-        ):
-            if limit_noteids and note_id not in limit_noteids:
-                continue
+            input_files, encoding=encoding,
+            id_label=id_label, noteid_label=noteid_label,
+            notedate_label=notedate_label, notetext_label=notetext_label,
+            noteorder_label=noteorder_label, metadata_labels=metadata_labels,
+        )
+        if not limit_noteids or note_id in limit_noteids  # filter before any sentence splitting
+    )
+    if split in {'sentence', 'sent_chunk', 'sent_window'}:
+        notes = (
+            (*note, sents)
+            for sents, note in iter_sentences(
+                ((note[-1], note) for note in notes),  # (text, context)
+                sentence_model, batch_size=batch_size, n_process=n_process,
+            )
+        )
+    else:
+        notes = ((*note, None) for note in notes)
+    if split in {'sent_chunk', 'sent_window'}:
+        notes = (
+            (*note, lengths)
+            for batch in _iter_batches(notes, batch_size)
+            for note, lengths in zip(batch, sentence_token_lengths(
+                tokenizer, [text for *_, text, _ in batch], [sents for *_, sents in batch],
+            ))
+        )
+    else:
+        notes = ((*note, None) for note in notes)
+    with open(outdir / name, 'w', encoding='utf8') as out:
+        for count, studyid, note_id, note_date, text, sents, lengths in notes:
             if split is None:
                 out.write(json.dumps({
                     'id': count,
@@ -69,137 +145,36 @@ def corpus2jsonl(input_files, outdir: Path, *,
                     'text': text,
                 }) + '\n')
             elif split == 'sentence':
-                doc = nlp(text)
-                for sent_id, spacy_sentence in enumerate(doc.sents):
-                    sentence = str(spacy_sentence)
+                for sent_id, sent in enumerate(sents):
                     out.write(json.dumps({
                         'id': count,
                         'studyid': studyid,
                         'note_id': note_id,
                         'note_date': note_date,
                         'sentence_id': sent_id,
-                        'start_index': spacy_sentence.start_char,
-                        'end_index': spacy_sentence.end_char,
-                        'text': sentence,
+                        'start_index': sent.start_char,
+                        'end_index': sent.end_char,
+                        'text': sent.text,
                     }) + '\n')
             elif split == 'section':
-                raise NotImplementedError
-            elif split == 'sent_chunk':
-                doc = nlp(text)
-                sents = list(doc.sents)
-                chunk_id = 0
-                curr = []
-                curr_length = 2  # start/end
-                start_index = 0  # approximate character index from start
-                end_index = None
-                for sent_id, spacy_sentence in enumerate(sents):
-                    sentence = str(spacy_sentence)
-                    length = len(tokenizer.tokenize(sentence))  # if len(sent) > max_seq_length, allow truncation
-                    if length + curr_length > max_seq_length:
-                        # TODO: what if curr_length == 0 (i.e., len(sentence) > max_seq_length)?
-                        out.write(json.dumps({
-                            'id': count,
-                            'studyid': studyid,
-                            'note_id': note_id,
-                            'note_date': note_date,
-                            'chunk_id': chunk_id,
-                            'start_index': start_index,
-                            'end_index': end_index,
-                            'text': ' '.join(curr),  # sentences retain their punctuation chars, but not spaces
-                        }) + '\n')
-                        # reset vars
-                        chunk_id += 1
-                        curr = [sentence]
-                        curr_length = 2 + length
-                        start_index = spacy_sentence.start_char
-                        end_index = spacy_sentence.end_char
-                    else:
-                        length_counter[length] += 1
-                        curr.append(sentence)
-                        curr_length += length
-                        end_index = spacy_sentence.end_char
-                        if spacy_sentence[-1].is_space and spacy_sentence[-1].text.count('\n') > 1:
-                            # end of a section/paragraph
-                            out.write(json.dumps({
-                                'id': count,
-                                'studyid': studyid,
-                                'note_id': note_id,
-                                'note_date': note_date,
-                                'chunk_id': chunk_id,
-                                'start_index': start_index,
-                                'end_index': end_index,
-                                'text': ' '.join(curr),  # sentences retain their punctuation chars
-                            }) + '\n')
-                            # reset vars
-                            chunk_id += 1
-                            curr = []
-                            curr_length = 2
-                            start_index = spacy_sentence.end_char
-                # final fencepost
-                if curr:
+                for section_id, (start, end, section) in enumerate(section_segmenter.segment(text)):
                     out.write(json.dumps({
                         'id': count,
                         'studyid': studyid,
                         'note_id': note_id,
                         'note_date': note_date,
-                        'chunk_id': chunk_id,
-                        'start_index': start_index,
-                        'end_index': end_index,
-                        'text': ' '.join(curr),  # sentences retain their punctuation chars
+                        'section_id': section_id,
+                        'section': section,
+                        'start_index': start,
+                        'end_index': end,
+                        'text': text[start:end],
                     }) + '\n')
-            elif split == 'sent_window':
-                target_overlap = int(max_seq_length / 4)
-                doc = nlp(text)
-                sents = list(doc.sents)
-                chunk_id = 0
-                curr = []  # tuple(length: int, sentence: str)
-                curr_length = 2  # start/end
-                start_index = 0
-                end_index = None
-                for sent_id, spacy_sentence in enumerate(sents):
-                    sentence = str(spacy_sentence)
-                    length = len(tokenizer.tokenize(sentence))  # if len(sent) > max_seq_length, allow truncation
-                    if length + curr_length > max_seq_length:
-                        out.write(json.dumps({
-                            'id': count,
-                            'studyid': studyid,
-                            'note_id': note_id,
-                            'note_date': note_date,
-                            'chunk_id': chunk_id,
-                            'start_index': start_index,
-                            'end_index': end_index,
-                            'text': ' '.join(c for _, c in curr),  # sentences retain their punctuation chars
-                        }) + '\n')
-                        # reset vars
-                        chunk_id += 1
-                        curr_length, curr, char_length = get_target_overlap(curr, target_overlap)
-                        curr.append((length, sentence))
-                        curr_length = 2 + length
-                        start_index = spacy_sentence.start_char - char_length  # this is the next sentence - overlap
-                        end_index = spacy_sentence.end_char
-                    else:
-                        length_counter[length] += 1
-                        curr.append((length, sentence))
-                        curr_length += length
-                        end_index = spacy_sentence.end_char
-                        if spacy_sentence[-1].is_space and spacy_sentence[-1].text.count('\n') > 1:
-                            # end of a section/paragraph
-                            out.write(json.dumps({
-                                'id': count,
-                                'studyid': studyid,
-                                'note_id': note_id,
-                                'note_date': note_date,
-                                'chunk_id': chunk_id,
-                                'start_index': start_index,
-                                'end_index': end_index,
-                                'text': ' '.join(c for _, c in curr),  # sentences retain their punctuation chars
-                            }) + '\n')
-                            # reset vars
-                            chunk_id += 1
-                            curr_length, curr, char_length = get_target_overlap(curr, target_overlap)
-                            start_index = spacy_sentence.end_char + 1 - char_length  # this sentence - overlap
-                # final fencepost
-                if curr:
+            elif split in {'sent_chunk', 'sent_window'}:
+                truncated += [length for length in lengths if length > max_seq_length - 2]
+                overlap = max_seq_length // 4 if split == 'sent_window' else 0
+                for chunk_id, (first, last) in enumerate(chunk_sentences(sents, lengths, max_seq_length, overlap)):
+                    start_index = sents[first].start_char
+                    end_index = sents[last - 1].end_char
                     out.write(json.dumps({
                         'id': count,
                         'studyid': studyid,
@@ -208,16 +183,16 @@ def corpus2jsonl(input_files, outdir: Path, *,
                         'chunk_id': chunk_id,
                         'start_index': start_index,
                         'end_index': end_index,
-                        'text': ' '.join(c for _, c in curr),  # sentences retain their punctuation chars
+                        'text': text[start_index:end_index],
                     }) + '\n')
             else:
                 raise ValueError(f'Unrecognized option for splitting: {split}')
             if count % 50000 == 0:
                 logger.info(f'Completed {count:,} records ({datetime.datetime.now()})')
     end_time = datetime.datetime.now()
-    if length_counter:
-        logger.info(f'Too long so truncated: {len(length_counter)}')
-        logger.info(f' * {sorted(length_counter, reverse=True)[:5]}')
+    if truncated:
+        logger.info(f'Too long so truncated: {len(truncated)}')
+        logger.info(f' * {sorted(truncated, reverse=True)[:5]}')
     logger.info(f'DONE: Completed {count:,} records ({end_time})')
     logger.info(f'DONE: Total processing time: {end_time - start_time}.')
 
@@ -234,4 +209,5 @@ if __name__ == '__main__':
                         help='Number of tokens to retain when `--split` is sent_chunk or sent_window.')
     parser.add_argument('--tokenizer', default=None,
                         help='Path to BERT tokenizer.')
-    corpus2jsonl(**vars(parser.parse_args()))
+    add_sentence_args(parser)
+    corpus2jsonl(**parse_and_clean_args(parser))
@@ -1,6 +1,8 @@
 import argparse
 import datetime
+import hashlib
 import json
+import re
 from pathlib import Path
 
 try:
@@ -11,126 +13,247 @@ from konsepy.cli import clean_args
 from loguru import logger
 
 
-def get_spans(spans):
-    """Get start, end, and domain (i.e., tag)"""
-    for span in spans:
-        yield span['start'], span['end'], span['domain'], False
+TOKEN_RX = re.compile(r'[^\W\d_]+|[^ ]')  # runs of letters, or any other character except space
 
 
-def update_word(i, tokens, ner_tags, curr_word, span_start, span_is_middle, span_tag):
-    tokens.append(''.join(curr_word))
-    if i >= span_start:
-        if span_is_middle:
-            ner_tags.append(f'I-{span_tag}')
+def _is_word_char(char):
+    return char.isalnum() and not char.isdecimal()  # matches `[^\W\d_]`
+
+
+def _split_token(token):
+    """
+    Split a token into runs of alphabetic characters and single other characters (e.g., 'a½' -> 'a', '½');
+    yield (piece, offset of piece in token).
+    """
+    if len(token) == 1 or token.isalpha():
+        yield token, 0
+        return
+    word_start = None
+    for i, char in enumerate(token):
+        if char.isalpha():
+            word_start = i if word_start is None else word_start
+            continue
+        if word_start is not None:
+            yield token[word_start:i], word_start
+            word_start = None
+        yield char, i
+    if word_start is not None:
+        yield token[word_start:], word_start
+
+
+def _iter_tokens(text, start, end, is_ascii):
+    """Yield (token, (start, end)) for each token in text[start:end]."""
+    for m in TOKEN_RX.finditer(text, start, end):
+        if is_ascii:
+            yield m.group(), m.span()
+            continue
+        for token, offset in _split_token(m.group()):
+            yield token, (m.start() + offset, m.start() + offset + len(token))
+
+
+def _tag_windows(text, spans, retire):
+    """Return merged [(start, end), ...] containing every word which could be tagged by a span."""
+    length = len(text)
+    windows = []
+    for k, (span_start, _, _) in enumerate(spans):
+        lo = max(retire[k - 1] + 1 if k else 0, span_start)  # a word is tagged by span k if it ends in [lo, hi]
+        hi = min(retire[k], length)
+        if lo > hi:
+            continue
+        start = max(lo - 1, 0)
+        while 0 < start < length and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+            start -= 1
+        end = hi
+        while 0 < end < length and _is_word_char(text[end - 1]) and _is_word_char(text[end]):
+            end += 1
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(end, windows[-1][1]))
         else:
-            ner_tags.append(f'B-{span_tag}')
-            span_is_middle = True
-    else:
-        ner_tags.append('O')
-    return span_is_middle
+            windows.append((start, end))
+    return windows
 
 
-def create_bio_dataset(path: Path, outpath: Path, test_size=0.1, validation_size=0.05, note_id_field='note_id'):
+def tag_bio_tokens(text, spans):
+    """
+    Split text into words (runs of letters) and other non-space characters, with BIO tags from `spans` (dicts
+    with start, end, and domain); return (tokens, ner_tags, token_offsets), where each token is
+    `text[start:end]` for its (start, end) offset.
+
+    A word is tagged by the current span if the word ends at or after the span's start; spans are consumed in
+    order, each ending at the first character at or after its end (and at most one per character). Only text
+    near spans is tagged word by word; other text is tagged 'O' without checking spans.
+    """
+    spans = [(span['start'], span['end'], span['domain']) for span in spans]
+    retire = []  # character index at which each span stops being the current span
+    prev = -1
+    for _, end, _ in spans:
+        prev = max(end, prev + 1)
+        retire.append(prev)
+    is_ascii = text.isascii()  # otherwise, tokens may need splitting (see `_split_token`)
+    tokens = []
+    ner_tags = []
+    token_offsets = []
+    current = 0
+    is_middle = False
+    length = len(text)
+    position = 0
+    for window_start, window_end in _tag_windows(text, spans, retire) + [(length, length)]:
+        for token, offset in _iter_tokens(text, position, window_start, is_ascii):
+            tokens.append(token)
+            token_offsets.append(offset)
+            ner_tags.append('O')
+        for token, offset in _iter_tokens(text, window_start, window_end, is_ascii):
+            tokens.append(token)
+            token_offsets.append(offset)
+            if not token.isalpha():
+                ner_tags.append('O')
+                continue
+            # a word is tagged when its following character is reached (or, at text end, its last character)
+            end = offset[1]
+            while current < len(spans) and retire[current] < end:
+                current += 1
+                is_middle = False
+            if current < len(spans) and (end if end < length else length - 1) >= spans[current][0]:
+                ner_tags.append(f'{"I" if is_middle else "B"}-{spans[current][2]}')
+                is_middle = True
+            else:
+                ner_tags.append('O')
+        position = window_end
+    return tokens, ner_tags, token_offsets
+
+
+def _shard_ranges(path: Path, num_shards):
+    """Split a file into up to `num_shards` (start, end) byte ranges aligned to line boundaries."""
+    size = path.stat().st_size
+    bounds = [0]
+    with open(path, 'rb') as fh:
+        for i in range(1, num_shards):
+            fh.seek(max(size * i // num_shards, bounds[-1]))
+            fh.readline()
+            position = min(fh.tell(), size)
+            if position > bounds[-1]:
+                bounds.append(position)
+    if bounds[-1] < size or size == 0:
+        bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def assign_split(key, test_size=0.1, validation_size=0.05, seed=0):
+    """Assign `key` (e.g., a note_id) to 'validation', 'test', or 'train' by its hash, independent of row order."""
+    digest = hashlib.md5(f'{seed}:{key}'.encode('utf8')).digest()
+    value = int.from_bytes(digest[:8], 'big') / 2 ** 64
+    if value < validation_size:
+        return 'validation'
+    if value < validation_size + test_size:
+        return 'test'
+    return 'train'
+
+
+def _iter_bio_examples(shards, split=None, note_id_field='note_id', split_field='note_id', test_size=0.1,
+                       validation_size=0.05, seed=0):
+    """
+    Yield dataset rows from the lines in each (path, mtime, start, end) shard.
+
+    split: only yield (and tag) rows assigned to this split (default: all rows)
+    """
+    for path, _, start, end in shards:
+        with open(path, 'rb') as fh:
+            fh.seek(start)
+            while fh.tell() < end:
+                line = fh.readline()
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if split is not None and assign_split(data[split_field], test_size, validation_size, seed) != split:
+                    continue
+                tokens, ner_tags, token_offsets = tag_bio_tokens(data['text'], data['results'])
+                yield {
+                    'tokens': tokens,
+                    'ner_tags': ner_tags,
+                    'token_offsets': token_offsets,
+                    'note_ids': str(data[note_id_field]),
+                }
+
+
+def _generate_split(features, split, num_proc=None, **gen_kwargs):
+    """Stream the rows of `split` (or all rows if None) into a dataset."""
+    try:
+        return Dataset.from_generator(
+            _iter_bio_examples,
+            features=features,
+            gen_kwargs=dict(gen_kwargs, split=split),
+            num_proc=num_proc if len(gen_kwargs['shards']) > 1 else None,
+        )
+    except ValueError as e:
+        if 'corresponds to no data' not in str(e):  # datasets cannot build a dataset from an empty generator
+            raise
+        return _empty_dataset(features)
+
+
+def _empty_dataset(features):
+    return Dataset.from_dict({name: [] for name in features}, features=features)
+
+
+def create_bio_dataset(path: Path, outpath: Path, test_size=0.1, validation_size=0.05, note_id_field='note_id',
+                       split_field=None, seed=0, num_proc=None, num_shards=None):
     """Convert jsonl file into a datasets.DatasetDict for use in model building.
 
+    Lines are streamed from the jsonl file into Arrow-backed datasets, so memory use does not grow with the
+    size of the corpus. Each row is assigned to a split by hashing its `split_field`, so all rows of a note (or
+    patient) land in the same split, and each split is written directly by its own pass over the file (lines
+    of other splits are parsed but not tagged). Rows keep the character (start, end) of each token in
+    `token_offsets`.
+
     path: path to jsonl file generated by `bio_tag.py`
     outpath: path to place dataset
-    test_size: size of test set (default: 0.05)
-    validation_size: size of validation set (default: 0.1)
+    test_size: size of test set (default: 0.1)
+    validation_size: size of validation set (default: 0.05)
     note_id_field: name of field containing unique identifier to the note/document (default: note_id)
+    split_field: field whose value determines the split, e.g., studyid (default: `note_id_field`)
+    seed: changes the assignment of notes to splits
+    num_proc: number of processes tagging the file (each handles separate line-aligned shards)
+    num_shards: number of shards the file is split into (default: 4 per process)
     """
-    all_note_ids = []
-    all_tokens = []
-    all_ner_tags = []
-    with open(path, encoding='utf8') as fh:
-        for line in fh:
-            data = json.loads(line.strip())
-            tokens = []
-            ner_tags = []
-            spans = get_spans(data['results'])
-            try:
-                span_start, span_end, span_tag, span_is_middle = next(spans)
-            except StopIteration:
-                span_start, span_end = 100_000, 100_000
-                span_tag = None
-                span_is_middle = False
-
-            curr_word = []
-            for i, letter in enumerate(data['text']):
-                if letter == ' ':  # end of word
-                    if curr_word:
-                        span_is_middle = update_word(
-                            i, tokens, ner_tags, curr_word, span_start,
-                            span_is_middle, span_tag,
-                        )
-                        curr_word = []
-                elif letter.isalpha():
-                    curr_word.append(letter)
-                else:  # punctuation
-                    if curr_word:
-                        span_is_middle = update_word(
-                            i, tokens, ner_tags, curr_word, span_start,
-                            span_is_middle, span_tag,
-                        )
-                        curr_word = []
-                    tokens.append(letter)
-                    ner_tags.append('O')
-                if i >= span_end:
-                    try:
-                        span_start, span_end, span_tag, span_is_middle = next(spans)
-                    except StopIteration:
-                        span_start, span_end = 100_000, 100_000
-            if curr_word:
-                span_is_middle = update_word(
-                    i, tokens, ner_tags, curr_word, span_start,
-                    span_is_middle, span_tag,
-                )
-            all_note_ids.append(data[note_id_field])
-            all_tokens.append(tokens)
-            all_ner_tags.append(ner_tags)
-
-    tagset = set([x for el in all_ner_tags for x in el])
-    logger.info(f'Tagset of length {len(tagset)}: {",".join(tagset)}')
-
+    if Dataset is None:
+        raise ImportError('create_bio_dataset requires datasets to be installed.')
+    num_shards = num_shards or 4 * (num_proc or 1)
+    num_proc = num_proc if num_proc and num_proc > 1 else None
+    mtime = path.stat().st_mtime_ns  # included in shards, so datasets' cache is not re-used after edits
+    shards = [(str(path), mtime, start, end) for start, end in _shard_ranges(path, num_shards)]
     features = Features({
         'tokens': Sequence(Value('string')),
         'ner_tags': Sequence(Value('string')),
+        'token_offsets': Sequence(Sequence(Value('int32'), length=2)),
         'note_ids': Value('string'),
     })
-    ds = Dataset.from_dict({
-        'tokens': all_tokens,
-        'ner_tags': all_ner_tags,
-        'note_ids': all_note_ids,
-    }, features=features)
-
-    num_rows = len(ds)
-    if num_rows < 2:
-        ds = DatasetDict(
-            {
-                'train': ds,
-                'test': ds.select([]),
-                'validation': ds.select([]),
-            }
-        )
-    else:
-        if validation_size:
-            res = ds.train_test_split(validation_size, shuffle=True)
-        else:
-            res = DatasetDict({'train': ds, 'test': ds.select([])})
-
-        # split the remaining data into train/test, keeping the requested overall ratios
-        if test_size:
-            remaining_ratio = 1 - validation_size if validation_size else 1
-            test_ratio = test_size / remaining_ratio if remaining_ratio else 0
-        else:
-            test_ratio = test_size
+    gen_kwargs = {
+        'shards': shards,
+        'note_id_field': note_id_field,
+        'split_field': split_field or note_id_field,
+        'test_size': test_size or 0,
+        'validation_size': validation_size or 0,
+        'seed': seed,
+    }
+    sizes = {'train': 1, 'test': test_size or 0, 'validation': validation_size or 0}
+    ds = DatasetDict({
+        name: _generate_split(features, name, num_proc, **gen_kwargs)
+        if size > 0 else _empty_dataset(features)
+        for name, size in sizes.items()
+    })
+    if sum(len(split) for split in ds.values()) < 2:
+        train = _generate_split(features, None, num_proc, **gen_kwargs)
+        ds = DatasetDict({'train': train, 'test': _empty_dataset(features), 'validation': _empty_dataset(features)})
 
-        if test_ratio and len(res['train']) >= 2:
-            ds = res['train'].train_test_split(test_size=test_ratio, shuffle=True)
-        else:
-            ds = DatasetDict({'train': res['train'], 'test': res['train'].select([])})
-        ds['validation'] = res['test']
-    ds.save_to_disk(outpath / f'{path.stem}.{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.dataset')
+    tagset = set()
+    for split in ds.values():
+        for batch in split.iter(batch_size=10_000):
+            tagset.update(tag for tags in batch['ner_tags'] for tag in tags)
+    logger.info(f'Tagset of length {len(tagset)}: {",".join(tagset)}')
+    logger.info(f'Split rows: {", ".join(f"{name}={len(split):,}" for name, split in ds.items())}')
+    ds.save_to_disk(
+        outpath / f'{path.stem}.{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.dataset',
+        num_shards={name: 1 for name, split in ds.items() if not len(split)},  # else no file, so cannot be loaded
+    )
 
 
 def create_bio_dataset_args():
@@ -145,6 +268,14 @@ def create_bio_dataset_args():
                         help='Percent of data to hold out for final validation.')
     parser.add_argument('--note-id-field', dest='note_id_field', type=str, default='note_id',
                         help='Specify label in jsonl file for distinguishing unique documents/notes.')
+    parser.add_argument('--split-field', type=str, default=None,
+                        help='Field whose value assigns rows to splits, e.g., studyid (default: --note-id-field).')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for the hash-based assignment of notes to splits.')
+    parser.add_argument('--num-proc', type=int, default=None,
+                        help='Number of processes used to tag the input file.')
+    parser.add_argument('--num-shards', type=int, default=None,
+                        help='Number of line-aligned shards the input file is split into (default: 4 per process).')
     create_bio_dataset(**clean_args(vars(parser.parse_args())))
 
 
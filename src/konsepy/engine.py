@@ -1,7 +1,16 @@
 import datetime
+import json
+from collections import Counter
+
 from loguru import logger
+from konsepy.anchors import AnchorIndex, use_anchor_index
+from konsepy.annotations import resolve_annotators, use_annotators
+from konsepy.cache import ResultCache, decode_results, encode_results, fingerprint_options, get_cache_key, hash_text
 from konsepy.importer import get_all_concepts
+from konsepy.rxutils import use_regex_backend
+from konsepy.sections import get_default_segmenter
 from konsepy.textio import iterate_csv_file
+from konsepy.watchdog import NoteTimeout, Watchdog
 from konsepy.constants import NOTEDATE_LABEL, ID_LABEL, NOTEID_LABEL, NOTETEXT_LABEL
 
 class ProcessingEngine:
@@ -10,7 +19,30 @@ class ProcessingEngine:
                  notedate_label=NOTEDATE_LABEL, notetext_label=NOTETEXT_LABEL,
                  noteorder_label=None, metadata_labels=None,
                  concepts=None, limit_noteids=None, start_after=0, stop_after=None,
-                 select_probability=1.0, **kwargs):
+                 select_probability=1.0, result_cache=None, result_cache_size=1_000_000,
+                 watermark=None, anchor_index=False, regex_backend=None,
+                 note_timeout=None, regex_timeout=None, quarantine_path=None,
+                 sections=None, section_segmenter=None, annotators=None, **kwargs):
+        """
+        result_cache: optional path to (or instance of) a `ResultCache`; verbatim duplicate notes will
+            re-use cached results rather than re-running each concept
+        result_cache_size: maximum number of entries retained in the result cache
+        watermark: optional `Watermark`; only notes beyond it are processed, and it is advanced past
+            every processed note (persist it, e.g., with `RunStore.save_watermark`, for the next run)
+        anchor_index: if True, find the literal anchors of all concepts' regexes in a single pass over each note
+            and only run regexes whose anchors occur (see `konsepy.anchors`); results are unchanged
+        regex_backend: default backend (`re`, `regex`, or `re2`) for patterns compiled with `rx_compile`
+            while the concepts are imported; concepts already imported in this process keep their backend
+        note_timeout/regex_timeout: maximum seconds per note/per regex on a note; if either is set, concepts run
+            in a killable worker (see `konsepy.watchdog`), and notes exceeding a budget are skipped
+        quarantine_path: jsonl file recording each skipped note with the concept and regex index it stalled on
+        sections: only search text in these named sections (see `konsepy.sections`); text outside them is
+            blanked out (offsets are unchanged) before concepts are run
+        section_segmenter: `SectionSegmenter` used to find `sections` (default: built-in header lexicon)
+        annotators: shared note-level annotators (True for all built-in, names of built-in, or dict of
+            name -> function); computed at most once per note and passed to postprocessors as `annotations`
+            (see `konsepy.annotations`)
+        """
         self.input_files = input_files
         self.package_name = package_name
         self.encoding = encoding
@@ -24,32 +56,154 @@ class ProcessingEngine:
         self.start_after = start_after
         self.stop_after = stop_after
         self.select_probability = select_probability
+        self.result_cache = result_cache
+        self.result_cache_size = result_cache_size
+        self.watermark = watermark
+        self.regex_backend = regex_backend
+        self.note_timeout = note_timeout
+        self.regex_timeout = regex_timeout
+        self.quarantine_path = quarantine_path
+        self.quarantined = Counter()
+        self.sections = frozenset(sections) if sections else None
+        self.section_segmenter = section_segmenter or (get_default_segmenter() if sections else None)
+        self.annotators = resolve_annotators(annotators)
         self.kwargs = kwargs
 
-        self.concepts = list(get_all_concepts(package_name, *(concepts or list())))
+        with use_regex_backend(regex_backend):
+            self.concepts = list(get_all_concepts(package_name, *(concepts or list())))
         logger.info(f'Loaded {len(self.concepts)} concepts for processing.')
+        self.anchor_index = AnchorIndex.from_concepts(self.concepts) if anchor_index else None
 
-    def run(self, callback):
+    def run(self, callback, *, concept_filter=None):
         """
         callback: function(studyid, note_id, note_date, text, metadata, concept, categories, matches)
+        concept_filter: optional function(studyid, note_id, text, concept) -> bool; concepts returning False
+            are not run for that note
         """
+        cache = self._open_result_cache()
+        options = fingerprint_options(self.result_options()) if cache else ''
+        watchdog = self._start_watchdog()
+        quarantine = open(self.quarantine_path, 'w', encoding='utf8') if watchdog and self.quarantine_path else None
         count = 0
-        for count, studyid, note_id, note_date, text, metadata in iterate_csv_file(
-                self.input_files, encoding=self.encoding,
-                id_label=self.id_label, noteid_label=self.noteid_label,
-                notedate_label=self.notedate_label, notetext_label=self.notetext_label,
-                noteorder_label=self.noteorder_label, metadata_labels=self.metadata_labels,
-                start_after=self.start_after, stop_after=self.stop_after,
-                select_probability=self.select_probability
-        ):
-            if self.limit_noteids and note_id not in self.limit_noteids:
-                continue
-            
-            if count % 50000 == 0:
-                 logger.info(f'Completed {count:,} records ({datetime.datetime.now()})')
-
-            for concept in self.concepts:
-                categories, matches = concept.run_func(text, include_match=True, **metadata)
-                callback(studyid, note_id, note_date, text, metadata, concept, categories, matches)
-        
+        try:
+            with use_anchor_index(self.anchor_index), use_annotators(self.annotators):
+                for count, studyid, note_id, note_date, text, metadata in iterate_csv_file(
+                        self.input_files, encoding=self.encoding,
+                        id_label=self.id_label, noteid_label=self.noteid_label,
+                        notedate_label=self.notedate_label, notetext_label=self.notetext_label,
+                        noteorder_label=self.noteorder_label, metadata_labels=self.metadata_labels,
+                        start_after=self.start_after, stop_after=self.stop_after,
+                        select_probability=self.select_probability, watermark=self.watermark,
+                ):
+                    if self.limit_noteids and note_id not in self.limit_noteids:
+                        continue
+                    if self.watermark is not None:
+                        if not self.watermark.include_note(studyid, note_id, text):
+                            continue
+                        self.watermark.observe(studyid, note_id, note_date, text)
+
+                    if count % 50000 == 0:
+                         logger.info(f'Completed {count:,} records ({datetime.datetime.now()})')
+
+                    concepts = self.concepts
+                    if concept_filter is not None:
+                        concepts = [concept for concept in concepts
+                                    if concept_filter(studyid, note_id, text, concept)]
+                        if not concepts:
+                            continue
+
+                    search_text = text
+                    if self.sections is not None:
+                        search_text = self.section_segmenter.mask(text, self.sections)
+                    try:
+                        results = self._run_concepts(concepts, search_text, metadata, cache, watchdog, options)
+                    except NoteTimeout as e:
+                        self._quarantine(quarantine, e, studyid, note_id, note_date, text)
+                        continue
+                    for concept, (categories, matches) in zip(concepts, results):
+                        callback(studyid, note_id, note_date, text, metadata, concept, categories, matches)
+        finally:
+            if self.anchor_index is not None:
+                self.anchor_index.log_summary()
+            if cache:
+                cache.log_summary()
+                if cache is not self.result_cache:
+                    cache.close()
+            if watchdog:
+                watchdog.close()
+            if quarantine:
+                quarantine.close()
+
+        if self.watermark is not None:
+            logger.info(f'Updated watermark: {self.watermark} ({self.watermark.skipped:,} previously seen notes skipped).')
+        if watchdog:
+            logger.info(f'Quarantined {sum(self.quarantined.values()):,} notes'
+                        f' (regex timeouts: {self.quarantined["regex"]:,}; note timeouts: {self.quarantined["note"]:,})'
+                        + (f'; see {self.quarantine_path}.' if self.quarantine_path else '.'))
         logger.info(f'Finished. Total records: {count:,} ({datetime.datetime.now()})')
+
+    def result_options(self):
+        """Engine options which change concept results; cached results are only re-used under the same options."""
+        options = {}
+        if self.regex_backend not in (None, 're'):
+            options['regex_backend'] = self.regex_backend
+        if self.annotators:
+            options['annotators'] = self.annotators
+        return options
+
+    def _start_watchdog(self):
+        if self.note_timeout is None and self.regex_timeout is None:
+            return None
+        watchdog = Watchdog(self.package_name, [concept.name for concept in self.concepts],
+                            note_timeout=self.note_timeout, regex_timeout=self.regex_timeout,
+                            regex_backend=self.regex_backend, anchor_index=self.anchor_index is not None,
+                            annotators=self.annotators)
+        watchdog.start()
+        return watchdog
+
+    def _quarantine(self, quarantine, error, studyid, note_id, note_date, text):
+        self.quarantined[error.reason] += 1
+        logger.warning(f'Quarantined note {note_id} ({studyid}): {error}.')
+        if quarantine:
+            quarantine.write(json.dumps({
+                'studyid': studyid,
+                'note_id': note_id,
+                'note_date': note_date,
+                'reason': error.reason,
+                'concept': error.concept,
+                'regex_index': error.regex_index,
+                'elapsed': round(error.elapsed, 3),
+                'text_length': len(text),
+            }, default=str) + '\n')
+            quarantine.flush()
+
+    @staticmethod
+    def _run_concepts(concepts, text, metadata, cache, watchdog, options=''):
+        """Return [(categories, matches), ...] for each concept, using cached results where available."""
+        results = {}
+        pending = []
+        keys = {}
+        if cache:
+            text_hash = hash_text(text)
+            for concept in concepts:
+                keys[concept.name] = get_cache_key(concept, text_hash, metadata, options)
+                if (value := cache.get(keys[concept.name])) is not None:
+                    results[concept.name] = decode_results(value, text, concept)
+                else:
+                    pending.append(concept)
+        else:
+            pending = concepts
+        if watchdog:
+            computed = watchdog.run(text, metadata, pending) if pending else []
+        else:
+            computed = [concept.run_func(text, include_match=True, **metadata) for concept in pending]
+        for concept, (categories, matches) in zip(pending, computed):
+            results[concept.name] = categories, matches
+            if cache and (value := encode_results(categories, matches, text, concept)) is not None:
+                cache.put(keys[concept.name], value)
+        return [results[concept.name] for concept in concepts]
+
+    def _open_result_cache(self):
+        if self.result_cache is None or isinstance(self.result_cache, ResultCache):
+            return self.result_cache
+        return ResultCache(self.result_cache, max_entries=self.result_cache_size)
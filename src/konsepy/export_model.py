@@ -0,0 +1,137 @@
+"""
+Export a BIO token-classification model (see `train_on_bio_dataset`) to ONNX for CPU inference.
+
+The export directory contains `model.onnx` (optionally int8-quantized), the tokenizer, and `id2label.json`, and
+can be passed as the model path to `predict_bio_dataset`, which then runs it with ONNX Runtime.
+"""
+import argparse
+import shutil
+from pathlib import Path
+
+from loguru import logger
+
+try:
+    from transformers import AutoModelForTokenClassification, AutoTokenizer
+except ImportError:  # pragma: no cover - optional dependency
+    AutoModelForTokenClassification = None
+    AutoTokenizer = None
+try:
+    import torch
+except ImportError:  # pragma: no cover - optional dependency
+    torch = None
+try:
+    import onnxruntime
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+except ImportError:  # pragma: no cover - optional dependency
+    onnxruntime = None
+    QuantType = None
+    quantize_dynamic = None
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+ONNX_MODEL_NAME = 'model.onnx'
+
+
+def export_model(model_path: Path, outdir: Path, *, tokenizer_path: Path = None, id2label_path: Path = None,
+                 quantize=False, opset=17):
+    """
+    Export a trained token-classification model to `outdir / model.onnx`.
+
+    quantize: apply dynamic int8 quantization to the weights (smaller and usually faster on CPU)
+    """
+    if torch is None:
+        raise ImportError('export_model requires torch to be installed.')
+    if AutoTokenizer is None or AutoModelForTokenClassification is None:
+        raise ImportError('export_model requires transformers to be installed.')
+    if quantize and quantize_dynamic is None:
+        raise ImportError('export_model requires onnxruntime to be installed to quantize.')
+    outdir.mkdir(parents=True, exist_ok=True)
+    tokenizer_path = tokenizer_path or model_path
+    id2label_path = id2label_path or model_path.parent / 'id2label.json'
+
+    logger.info(f'Loading tokenizer from {tokenizer_path}')
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+    logger.info(f'Loading model from {model_path}')
+    model = AutoModelForTokenClassification.from_pretrained(model_path)
+    model.eval()
+
+    dummy = dict(tokenizer(['Väinämöinen sang the Sampo.'], return_tensors='pt'))
+    input_names = list(dummy)
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['logits']}
+    onnx_path = outdir / ONNX_MODEL_NAME
+    export_path = outdir / 'model.fp32.onnx' if quantize else onnx_path
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy,),  # trailing dict is passed as keyword arguments
+            str(export_path),
+            input_names=input_names,
+            output_names=['logits'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    if quantize:
+        quantize_dynamic(str(export_path), str(onnx_path), weight_type=QuantType.QInt8)
+        logger.info(f'Quantized model: {export_path.stat().st_size / 2 ** 20:.1f}MB'
+                    f' -> {onnx_path.stat().st_size / 2 ** 20:.1f}MB')
+        export_path.unlink()
+
+    tokenizer.save_pretrained(outdir)
+    if id2label_path.exists():
+        shutil.copyfile(id2label_path, outdir / 'id2label.json')
+    else:
+        logger.warning(f'No labels found at {id2label_path}: supply `--id2label-path` when predicting.')
+    logger.info(f'Exported model to {onnx_path}')
+    return onnx_path
+
+
+def find_onnx_model(model_path: Path):
+    """Return the path of an exported ONNX model (a `.onnx` file, or a directory containing one), else None."""
+    if model_path.suffix == '.onnx':
+        return model_path
+    if (model_path / ONNX_MODEL_NAME).exists():
+        return model_path / ONNX_MODEL_NAME
+    return None
+
+
+class OnnxModel:
+    """Run an exported token-classification model with ONNX Runtime (CPU)."""
+
+    def __init__(self, path: Path, num_threads=None):
+        if onnxruntime is None or np is None:
+            raise ImportError('OnnxModel requires onnxruntime to be installed.')
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(str(path), options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def predict_ids(self, encoded):
+        """encoded: tokenizer output as numpy arrays; return predicted label ids per sequence"""
+        feeds = {key: np.asarray(value, dtype=np.int64) for key, value in encoded.items() if key in self.input_names}
+        logits = self.session.run(['logits'], feeds)[0]
+        return logits.argmax(axis=-1).tolist()
+
+
+def export_model_args():
+    parser = argparse.ArgumentParser(fromfile_prefix_chars='@')
+    add_export_model_args(parser)
+    export_model(**vars(parser.parse_args()))
+
+
+def add_export_model_args(parser: argparse.ArgumentParser):
+    parser.add_argument('model_path', type=Path, help='Path to trained token-classification model.')
+    parser.add_argument('outdir', type=Path, help='Directory to write model.onnx, tokenizer, and labels.')
+    parser.add_argument('--tokenizer-path', type=Path, help='Path to tokenizer. Defaults to model path.')
+    parser.add_argument('--id2label-path', type=Path,
+                        help='Path to id2label.json. Defaults to model parent directory.')
+    parser.add_argument('--quantize', action='store_true', default=False,
+                        help='Apply dynamic int8 quantization (requires onnxruntime).')
+    parser.add_argument('--opset', type=int, default=17, help='ONNX opset version.')
+    return parser
+
+
+if __name__ == '__main__':
+    export_model_args()
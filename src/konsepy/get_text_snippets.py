@@ -8,6 +8,7 @@ from loguru import logger
 from konsepy.cli import snippet_cli
 from konsepy.constants import NOTEDATE_LABEL, ID_LABEL, NOTEID_LABEL, NOTETEXT_LABEL
 from konsepy.importer import get_all_concepts
+from konsepy.normalize import get_normalized_text
 from konsepy.textio import iterate_csv_file
 
 
@@ -25,7 +26,8 @@ def get_text_snippets_regexes(input_files, outdir, regexes, *, start_after=0, st
     outfile = outdir / f'{label}_{dt}.csv'
     with open(outfile, 'w', newline='') as out:
         writer = csv.writer(out)
-        writer.writerow(['id', 'studyid', 'note_id', 'date', 'regex_name', 'precontext', 'term', 'postcontext'])
+        writer.writerow(['id', 'studyid', 'note_id', 'date', 'regex_name', 'precontext', 'term', 'postcontext',
+                         'start', 'end'])
         for i, (_, studyid, note_id, note_date, text, metadata) in enumerate(iterate_csv_file(
                 input_files, encoding=encoding,
                 start_after=start_after, stop_after=stop_after,
@@ -34,7 +36,8 @@ def get_text_snippets_regexes(input_files, outdir, regexes, *, start_after=0, st
                 noteorder_label=noteorder_label, metadata_labels=metadata_labels,
                 select_probability=select_probability,
         ), start=1):
-            text = ' '.join(text.split())  # remove newlines, etc. (bad for snippets in Excel)
+            # remove newlines, etc. (bad for snippets in Excel), retaining offsets into the original text
+            normalized = get_normalized_text(text)
             for regex_ in regexes:
                 if isinstance(regex_, (str, tuple)):
                     if isinstance(regex_, str):
@@ -43,23 +46,26 @@ def get_text_snippets_regexes(input_files, outdir, regexes, *, start_after=0, st
                         name, regex = regex_
                     if isinstance(regex, str):
                         regex = re.compile(regex, re.I)
-                    func = lambda x: zip(itertools.repeat(name), regex.finditer(x))
+                    results = zip(itertools.repeat(name), normalized.finditer(regex))
                 elif callable(regex_):
-                    func = lambda x: regex_(x, include_match=True, **metadata)
+                    categories, matches = regex_(text, include_match=True, **metadata)
+                    results = zip(categories, matches or [])
                 else:
                     raise ValueError(f'Unknown how to handle regular expression of type {type(regex_)}: {regex_}')
-                for name, m in zip(func(text)):
-                    precontext = text[max(m.start() - window_size, 0):m.start()]
-                    postcontext = text[m.end():m.end() + window_size]
+                for name, m in results:
+                    start = normalized.to_normalized(m.start())
+                    end = normalized.to_normalized(m.end())
                     writer.writerow([
                         rx_count,  # id
                         studyid,
                         note_id,
                         note_date,
                         name,
-                        precontext,
-                        m.group(),  # term
-                        postcontext,
+                        normalized.text[max(start - window_size, 0):start],  # precontext
+                        normalized.text[start:end],  # term
+                        normalized.text[end:end + window_size],  # postcontext
+                        m.start(),  # offsets in original text
+                        m.end(),
                     ])
                     rx_count += 1
                     if stop_after_regex_count and rx_count >= stop_after_regex_count:
@@ -1,11 +1,16 @@
+import functools
+import hashlib
 import importlib
 import inspect
 import pkgutil
+import sys
 from enum import EnumMeta
 from pathlib import Path
 
 from loguru import logger
 
+import konsepy
+
 
 class ConceptImport:
 
@@ -18,6 +23,8 @@ class ConceptImport:
         self._params = inspect.signature(self._run_func).parameters
 
         self.has_include_match = self.has_param('include_match')
+        self.has_presence = 'presence' in self._params
+        self._source_hash = None
 
     def has_param(self, param, default=False):
         exists = param in self._params
@@ -25,9 +32,17 @@ class ConceptImport:
             logger.warning(f'Concept `{self.name}` is missing `{param}={default}` in RUN_REGEXES_FUNC.')
         return exists
 
-    def run_func(self, text, include_match=True, categories_only=False, **metadata):
+    def relevant_metadata(self, metadata):
+        """Restrict metadata to the keyword arguments accepted by RUN_REGEXES_FUNC."""
+        return {k: v for k, v in metadata.items() if k in self._params}
+
+    def run_func(self, text, include_match=True, categories_only=False, presence=False, **metadata):
         # ensure requested metadata in calling function
-        metadata = {k: v for k, v in metadata.items() if k in self._params}
+        metadata = self.relevant_metadata(metadata)
+        if presence:  # only the distinct categories are required (not per-match counts)
+            if self.has_presence:
+                metadata['presence'] = True
+            include_match = False
         if include_match and self.has_include_match:
             res = list(self._run_func(text, include_match=include_match, **metadata))
             matches = [m for _, m in res]  # return match directly
@@ -45,6 +60,36 @@ class ConceptImport:
     def run(self, sentence):
         return self.run_func(sentence)
 
+    @property
+    def source_hash(self):
+        """
+        Content hash of everything determining the concept's results: the konsepy version, the concept module
+        source and its compiled regexes, and the source of `dependency_modules`.
+        """
+        if self._source_hash is None:
+            digest = hashlib.sha256(f'konsepy {konsepy.__version__}\0'.encode('utf8'))
+            try:
+                digest.update(Path(inspect.getfile(self.imp)).read_bytes())
+            except (OSError, TypeError):
+                digest.update(self.name.encode('utf8'))
+            for module_name in self.dependency_modules:
+                digest.update(f'{module_name}\0{_get_module_digest(module_name)}\0'.encode('utf8'))
+            for regex, *_ in self.regexes:
+                if regex is not None:
+                    pattern = getattr(regex, 'pattern', regex)
+                    digest.update(f'{pattern!r}\0{getattr(regex, "flags", 0)}\0'.encode('utf8', 'surrogatepass'))
+            self._source_hash = digest.hexdigest()
+        return self._source_hash
+
+    @property
+    def dependency_modules(self):
+        """Other modules defining RUN_REGEXES_FUNC, postprocessors, and the functions these call by name."""
+        modules = set()
+        for func in _iter_callables([self._run_func, [entry[1:] for entry in self.regexes]]):
+            modules |= _get_function_modules(func)
+        modules.discard(self.imp.__name__)
+        return sorted(modules)
+
     @property
     def domain(self):
         return self.name
@@ -67,6 +112,36 @@ class ConceptImport:
         return f'ConceptImport<{self.name}>'
 
 
+def _iter_callables(value):
+    if callable(value):
+        yield value
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            yield from _iter_callables(item)
+    elif isinstance(value, dict):
+        yield from _iter_callables(list(value.values()))
+
+
+def _get_function_modules(func):
+    """Modules defining `func` and any functions it refers to by global name (e.g., a helper called by a lambda)."""
+    func = getattr(func, 'func', func)  # functools.partial
+    modules = {getattr(func, '__module__', None)}
+    func_globals = getattr(func, '__globals__', {})
+    for name in getattr(getattr(func, '__code__', None), 'co_names', ()):
+        if callable(value := func_globals.get(name)):
+            modules.add(getattr(value, '__module__', None))
+    modules.discard(None)
+    return modules
+
+
+@functools.lru_cache(maxsize=None)
+def _get_module_digest(module_name):
+    try:
+        return hashlib.sha256(Path(inspect.getfile(sys.modules[module_name])).read_bytes()).hexdigest()
+    except (KeyError, OSError, TypeError):
+        return ''
+
+
 def get_all_concepts(package_name: str, *concepts):
     imp = importlib.import_module(f'{package_name}.concepts')
     path = Path(imp.__file__).parent
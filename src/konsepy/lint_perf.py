@@ -0,0 +1,430 @@
+"""
+Find concept regexes liable to super-linear (catastrophic) backtracking.
+
+Each pattern is checked statically for nested quantifiers (e.g., `(?:\\w+\\W*){0,5}`, as produced by `Rx.o5`)
+and unanchored leading `.*`, and then timed on adversarial inputs: repetitions of text matching each quantified
+group (and some generic runs of letters/whitespace/digits) followed by a character which forces the match to
+fail. Timings are taken in a killable worker process, so a pattern which never finishes is reported as a timeout.
+"""
+import csv
+import math
+import multiprocessing
+import re
+import time
+from re import _constants as sre_constants, _parser as sre_parse
+
+from loguru import logger
+
+from konsepy.importer import get_all_concepts
+
+_QUANTIFIER_RX = re.compile(r'(?:(?P<symbol>[*+?])|\{(?P<exact>\d+)\}|\{(?P<min>\d*),(?P<max>\d*)\})[?+]?')
+_LEADING_DOT_STAR_RX = re.compile(r'\.[*+][?+]?')
+
+GENERIC_PUMPS = ('a', ' ', 'a ', '1', 'a.')
+SUFFIXES = ('!', '\n', '')
+
+
+class Finding:
+    """A statically-detected construct at `pattern[start:end]`."""
+
+    def __init__(self, kind, start, end, message):
+        self.kind = kind  # 'nested-quantifier' or 'leading-dot-star'
+        self.start = start
+        self.end = end
+        self.message = message
+
+    def location(self, pattern):
+        """Return the pattern with the construct underlined."""
+        return f'{pattern}\n{" " * self.start}{"^" * (self.end - self.start)}'
+
+    def __str__(self):
+        return f'{self.kind}@{self.start}-{self.end}'
+
+    def __repr__(self):
+        return f'Finding({self.kind!r}, {self.start}, {self.end}, {self.message!r})'
+
+
+class PatternReport:
+
+    def __init__(self, concept, regex_index, pattern, findings):
+        self.concept = concept
+        self.regex_index = regex_index
+        self.pattern = pattern
+        self.findings = findings
+        self.worst_seconds = 0.0
+        self.worst_input = None  # (description, length)
+        self.growth = None  # estimated exponent of time vs. input length for the worst input
+        self.timed_out = False
+
+    def record(self, description, timings):
+        """timings: [(length, seconds or None if timed out), ...] for increasing lengths of one input"""
+        length, seconds = timings[-1]
+        if seconds is None:
+            if not self.timed_out:
+                self.timed_out = True
+                self.worst_input = (description, length)
+            return
+        if self.timed_out or seconds <= self.worst_seconds:
+            return
+        self.worst_seconds = seconds
+        self.worst_input = (description, length)
+        self.growth = _estimate_growth(timings)
+
+    @property
+    def sort_key(self):
+        return self.timed_out, self.worst_seconds
+
+    def __str__(self):
+        timing = 'timeout' if self.timed_out else f'{self.worst_seconds:.4f}s'
+        if self.growth is not None:
+            timing += f' (~n^{self.growth:.1f})'
+        description = f' on {self.worst_input[0]} (length {self.worst_input[1]:,})' if self.worst_input else ''
+        lines = [f'{self.concept}[{self.regex_index}]: {timing}{description}']
+        for finding in self.findings:
+            lines.append(f'  {finding.message}:')
+            lines.extend(f'    {line}' for line in finding.location(self.pattern).split('\n'))
+        return '\n'.join(lines)
+
+
+def lint_perf(package_name, concepts=None, *, max_length=4096, timeout=1.0, top=20, outfile=None):
+    """
+    Lint all regexes in a concept package for super-linear behaviour.
+
+    max_length: longest adversarial input (in characters) to time
+    timeout: seconds a single search may take before the pattern is reported as timing out
+    top: number of slowest patterns to log
+    outfile: optional csv path for the full report
+
+    Return: list of `PatternReport`, slowest first
+    """
+    regexes = []
+    reports = []
+    for concept in get_all_concepts(package_name, *(concepts or list())):
+        for regex_index, (regex, *_) in enumerate(concept.regexes):
+            if (pattern := getattr(regex, 'pattern', None)) is None or not isinstance(pattern, str):
+                continue
+            regexes.append(regex)
+            reports.append(PatternReport(concept.name, regex_index, pattern, lint_pattern(regex)))
+    logger.info(f'Timing {len(regexes):,} regexes on adversarial inputs (up to {max_length:,} characters).')
+
+    with _TimingWorker(regexes) as worker:
+        for index, (regex, report) in enumerate(zip(regexes, reports)):
+            for description, prefix, pump, suffix in adversarial_inputs(regex, report.findings):
+                timings = []
+                for count in _pump_counts(len(pump), len(prefix) + len(suffix), max_length):
+                    text = prefix + pump * count + suffix
+                    seconds = worker.time(index, text, timeout)
+                    timings.append((len(text), seconds))
+                    if seconds is None:
+                        break
+                report.record(description, timings)
+
+    reports.sort(key=lambda r: r.sort_key, reverse=True)
+    for report in reports[:top]:
+        logger.info(str(report))
+    if outfile:
+        _write_report(outfile, reports)
+    return reports
+
+
+def lint_pattern(regex):
+    """Return list of `Finding` for nested quantifiers and unanchored leading `.*` in a compiled regex."""
+    pattern = regex.pattern
+    flags = getattr(regex, 'flags', 0)
+    findings = _find_nested_quantifiers(pattern, verbose=bool(flags & re.VERBOSE))
+    if (finding := _find_leading_dot_star(pattern, flags)) is not None:
+        findings.append(finding)
+    return findings
+
+
+def adversarial_inputs(regex, findings=()):
+    """Yield (description, prefix, pump, suffix): inputs are `prefix + pump * n + suffix` for increasing n."""
+    pattern = regex.pattern
+    flags = getattr(regex, 'flags', 0)
+    pumps = {}
+    for finding in findings:
+        if finding.kind != 'nested-quantifier':
+            continue
+        if pump := _sample_pattern(pattern[finding.start:finding.end], flags):
+            # text preceding the construct (e.g., a keyword) must match for the construct to be reached
+            prefix = _sample_pattern(pattern[:finding.start], flags) or ''
+            pumps.setdefault((prefix, pump), f'`{pattern[finding.start:finding.end]}` sample {pump!r}')
+    if pump := _sample_pattern(pattern, flags):
+        pumps.setdefault(('', pump), f'pattern sample {pump!r}')
+    for pump in GENERIC_PUMPS:
+        pumps.setdefault(('', pump), repr(pump))
+    for (prefix, pump), description in pumps.items():
+        if prefix:
+            description = f'{prefix!r} + {description}'
+        for suffix in SUFFIXES:
+            yield f'{description} + {suffix!r}' if suffix else description, prefix, pump, suffix
+
+
+def _find_nested_quantifiers(pattern, verbose=False):
+    """
+    Scan the pattern source for repeated groups which themselves contain a repeated element.
+
+    The scan is lexical so that locations refer to the pattern as written.
+    """
+    findings = []
+    stack = [[0, None]]  # [group start, span of first repeated element within the group]
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        inner = None
+        if ch == '\\':
+            start, i = i, i + 2
+        elif ch == '[':
+            start, i = i, _skip_class(pattern, i)
+        elif ch == '(':
+            if pattern.startswith('(?#', i):
+                i = pattern.find(')', i) + 1 or len(pattern)
+                continue
+            stack.append([i, None])
+            i += 1
+            continue
+        elif ch == ')' and len(stack) > 1:
+            start, inner = stack.pop()
+            i += 1
+        elif verbose and ch.isspace():
+            i += 1
+            continue
+        elif verbose and ch == '#':
+            i = pattern.find('\n', i) + 1 or len(pattern)
+            continue
+        else:
+            start, i = i, i + 1
+        frame = stack[-1]
+        if verbose:
+            while i < len(pattern) and pattern[i].isspace():
+                i += 1
+        if (m := _QUANTIFIER_RX.match(pattern, i)) and ch not in '|^$' and _repeats(m):
+            if inner is not None:
+                findings.append(Finding(
+                    'nested-quantifier', start, m.end(),
+                    f'nested quantifier: `{pattern[start:m.end()]}` repeats `{pattern[inner[0]:inner[1]]}`',
+                ))
+            frame[1] = frame[1] or (start, m.end())
+            i = m.end()
+        else:
+            if m:
+                i = m.end()
+            frame[1] = frame[1] or inner
+    return findings
+
+
+def _skip_class(pattern, i):
+    """Return index after the character class starting at `pattern[i] == '['`."""
+    j = i + 1
+    if j < len(pattern) and pattern[j] == '^':
+        j += 1
+    if j < len(pattern) and pattern[j] == ']':
+        j += 1
+    while j < len(pattern) and pattern[j] != ']':
+        j += 2 if pattern[j] == '\\' else 1
+    return j + 1
+
+
+def _repeats(m):
+    """Can the quantifier match its element more than once?"""
+    if m.group('symbol'):
+        return m.group('symbol') != '?'
+    if m.group('exact') is not None:
+        return int(m.group('exact')) > 1
+    return not m.group('max') or int(m.group('max')) > 1
+
+
+def _find_leading_dot_star(pattern, flags):
+    """An unanchored leading `.*`/`.+` is retried from every start position (quadratic when there is no match)."""
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return None
+    first = _first_element(parsed)
+    if first is None:
+        return None
+    op, av = first
+    if op not in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) or av[1] != sre_constants.MAXREPEAT:
+        return None
+    if list(av[2]) and all(sub_op is sre_constants.ANY for sub_op, _ in av[2]):
+        m = _LEADING_DOT_STAR_RX.search(pattern)
+        start, end = m.span() if m else (0, 1)
+        return Finding('leading-dot-star', start, end,
+                       f'unanchored leading `{pattern[start:end]}`: consider anchoring or removing it')
+    return None
+
+
+def _first_element(subpattern):
+    for op, av in subpattern:
+        if op is sre_constants.SUBPATTERN:
+            return _first_element(av[3])
+        return op, av
+    return None
+
+
+def _sample_pattern(pattern, flags):
+    """Return a short string matched by `pattern` (best effort), or None."""
+    try:
+        return _sample(sre_parse.parse(pattern, flags))
+    except (re.error, ValueError, IndexError):
+        return None
+
+
+_CATEGORY_SAMPLES = {
+    sre_constants.CATEGORY_DIGIT: '1',
+    sre_constants.CATEGORY_NOT_DIGIT: 'a',
+    sre_constants.CATEGORY_SPACE: ' ',
+    sre_constants.CATEGORY_NOT_SPACE: 'a',
+    sre_constants.CATEGORY_WORD: 'a',
+    sre_constants.CATEGORY_NOT_WORD: ' ',
+}
+
+
+def _sample(subpattern):
+    result = []
+    for op, av in subpattern:
+        if op is sre_constants.LITERAL:
+            result.append(chr(av))
+        elif op is sre_constants.NOT_LITERAL:
+            result.append('b' if av == ord('a') else 'a')
+        elif op is sre_constants.ANY:
+            result.append('a')
+        elif op is sre_constants.IN:
+            result.append(_sample_class(av))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, sre_constants.POSSESSIVE_REPEAT):
+            min_repeat, _, p = av
+            result.append(_sample(p) * max(min_repeat, 1))
+        elif op is sre_constants.SUBPATTERN:
+            result.append(_sample(av[3]))
+        elif op is sre_constants.ATOMIC_GROUP:
+            result.append(_sample(av))
+        elif op is sre_constants.BRANCH:
+            result.append(_sample(av[1][0]))
+    return ''.join(result)
+
+
+def _sample_class(items):
+    negated = items and items[0][0] is sre_constants.NEGATE
+    if not negated:
+        op, av = items[0]
+        if op is sre_constants.LITERAL:
+            return chr(av)
+        if op is sre_constants.RANGE:
+            return chr(av[0])
+        if op is sre_constants.CATEGORY:
+            return _CATEGORY_SAMPLES.get(av, 'a')
+    for candidate in 'a 1.!A_-\n':
+        if _class_matches(items, candidate):
+            return candidate
+    raise ValueError('no sample for character class')
+
+
+def _class_matches(items, ch):
+    negated = items[0][0] is sre_constants.NEGATE
+    matched = False
+    for op, av in items[1:] if negated else items:
+        if op is sre_constants.LITERAL:
+            matched = ord(ch) == av
+        elif op is sre_constants.RANGE:
+            matched = av[0] <= ord(ch) <= av[1]
+        elif op is sre_constants.CATEGORY:
+            matched = av in _CATEGORY_PATTERNS and re.fullmatch(_CATEGORY_PATTERNS[av], ch) is not None
+        if matched:
+            break
+    return matched != negated
+
+
+_CATEGORY_PATTERNS = {
+    sre_constants.CATEGORY_DIGIT: r'\d',
+    sre_constants.CATEGORY_NOT_DIGIT: r'\D',
+    sre_constants.CATEGORY_SPACE: r'\s',
+    sre_constants.CATEGORY_NOT_SPACE: r'\S',
+    sre_constants.CATEGORY_WORD: r'\w',
+    sre_constants.CATEGORY_NOT_WORD: r'\W',
+}
+
+
+def _pump_counts(pump_length, other_length, max_length):
+    count = 8
+    while count * pump_length + other_length <= max_length:
+        yield count
+        count *= 2
+
+
+def _estimate_growth(timings):
+    """Exponent k in time ~ length^k from the two largest inputs (None if too fast to measure)."""
+    if len(timings) < 2:
+        return None
+    (length1, seconds1), (length2, seconds2) = timings[-2:]
+    if not seconds1 or seconds1 < 1e-4 or seconds2 is None:
+        return None
+    return math.log(seconds2 / seconds1) / math.log(length2 / length1)
+
+
+def _write_report(outfile, reports):
+    with open(outfile, 'w', newline='', encoding='utf8') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['concept', 'regex_index', 'timed_out', 'worst_seconds', 'growth', 'worst_input',
+                         'input_length', 'findings', 'pattern'])
+        for report in reports:
+            description, length = report.worst_input or (None, None)
+            writer.writerow([
+                report.concept, report.regex_index, report.timed_out, f'{report.worst_seconds:.6f}',
+                None if report.growth is None else f'{report.growth:.2f}', description, length,
+                '; '.join(str(finding) for finding in report.findings), report.pattern,
+            ])
+    logger.info(f'Wrote performance report to {outfile}.')
+
+
+class _TimingWorker:
+    """Time `regex.finditer` in a separate process, killing (and restarting) it when a search exceeds a timeout."""
+
+    def __init__(self, regexes):
+        self.regexes = regexes
+        self._context = multiprocessing.get_context()
+        self._process = None
+        self._connection = None
+
+    def start(self):
+        parent_connection, child_connection = self._context.Pipe()
+        self._process = self._context.Process(target=_timing_main, args=(child_connection, self.regexes),
+                                              daemon=True)
+        self._process.start()
+        child_connection.close()
+        self._connection = parent_connection
+
+    def time(self, index, text, timeout):
+        """Return seconds to find all matches of regex `index` in `text`, or None if `timeout` was exceeded."""
+        if self._process is None:
+            self.start()
+        self._connection.send((index, text))
+        if not self._connection.poll(timeout):
+            self.close()
+            return None
+        return self._connection.recv()
+
+    def close(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._connection.close()
+            self._process = None
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _timing_main(connection, regexes):
+    while True:
+        try:
+            index, text = connection.recv()
+        except EOFError:
+            return
+        start = time.perf_counter()
+        for _ in regexes[index].finditer(text):
+            pass
+        connection.send(time.perf_counter() - start)
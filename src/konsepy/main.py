@@ -4,13 +4,16 @@ from pathlib import Path
 from loguru import logger
 
 from konsepy.predict_bio_dataset import predict_bio_dataset
+from konsepy.export_model import add_export_model_args, export_model
 from konsepy.run_all import run_all
 from konsepy.run_all_matches import run_all_matches
+from konsepy.run_hybrid import run_hybrid
 from konsepy.run4snippets import run4snippets
 from konsepy.bio_tag import get_bio_tags
 from konsepy.corpus2jsonl import corpus2jsonl
 from konsepy.create_bio_dataset import create_bio_dataset
-from konsepy.cli import add_outdir_and_infiles, add_run_all_args, clean_args, clean_metadata_labels
+from konsepy.lint_perf import lint_perf
+from konsepy.cli import add_outdir_and_infiles, add_run_all_args, add_sentence_args, clean_args, clean_metadata_labels
 
 
 def main():
@@ -25,6 +28,15 @@ def main():
                                 help='Name of package to run regular expressions from.')
     run_all_parser.add_argument('--include-text-output', action='store_true',
                                 help='Include original text in output jsonl.')
+    run_all_parser.add_argument('--incremental', type=Path, default=None,
+                                help='Previous `run_all` directory (or its run_store.db): only recompute changed'
+                                     ' concepts and new notes, carrying forward all other results.')
+    run_all_parser.add_argument('--result-store', type=Path, default=None,
+                                help='Persistent result store to update in place (incremental when it already exists).')
+    run_all_parser.add_argument('--watermark', choices=['note_date', 'note_id', 'hash'], default=None,
+                                help='Only process notes beyond the watermark saved in the result store'
+                                     ' (max note_date/note_id, or previously seen note hashes);'
+                                     ' notes on the last processed note_date are re-read in case more were added.')
 
     # run-all-matches
     run_all_matches_parser = subparsers.add_parser('run-all-matches', help='Run all concepts and output each match')
@@ -33,6 +45,36 @@ def main():
     run_all_matches_parser.add_argument('--package-name', required=True,
                                         help='Name of package to run regular expressions from.')
 
+    # run-hybrid
+    run_hybrid_parser = subparsers.add_parser(
+        'run-hybrid', help='Run all concepts, and a BIO model only on notes/windows where selected concepts match',
+    )
+    add_outdir_and_infiles(run_hybrid_parser)
+    add_run_all_args(run_hybrid_parser)
+    run_hybrid_parser.add_argument('--package-name', required=True,
+                                   help='Name of package to run regular expressions from.')
+    run_hybrid_parser.add_argument('--model-path', type=Path, required=True,
+                                   help='Path to trained token-classification model (or ONNX export).')
+    run_hybrid_parser.add_argument('--gate-concepts', nargs='+', default=None,
+                                   help='Only run the model where these concepts match (default: any concept).')
+    run_hybrid_parser.add_argument('--gate-categories', nargs='+', default=None,
+                                   help='Only run the model where matches have these categories (e.g., YES).')
+    run_hybrid_parser.add_argument('--context', type=int, default=None,
+                                   help='Characters of context around each match to run the model over'
+                                        ' (default: whole note).')
+    run_hybrid_parser.add_argument('--tokenizer-path', type=Path, help='Path to tokenizer. Defaults to model path.')
+    run_hybrid_parser.add_argument('--id2label-path', type=Path,
+                                   help='Path to id2label.json. Defaults to model parent directory.')
+    run_hybrid_parser.add_argument('--max-length', type=int, default=512)
+    run_hybrid_parser.add_argument('--device', help='Device to use, e.g. cpu, cuda, cuda:0.')
+    run_hybrid_parser.add_argument('--batch-size', type=int, default=8,
+                                   help='Number of notes/windows to run through the model together.')
+    run_hybrid_parser.add_argument('--stride', type=int, default=None,
+                                   help='Predict windows longer than --max-length with sliding windows overlapping'
+                                        ' by this many tokens (default: truncate).')
+    run_hybrid_parser.add_argument('--num-threads', type=int, default=None,
+                                   help='Number of CPU threads used by the model.')
+
     # run4snippets
     run4snippets_parser = subparsers.add_parser('run4snippets', help='Extract snippets for review')
     add_outdir_and_infiles(run4snippets_parser)
@@ -58,11 +100,13 @@ def main():
     # corpus2jsonl
     corpus2jsonl_parser = subparsers.add_parser('corpus2jsonl', help='Convert corpus to jsonl')
     add_outdir_and_infiles(corpus2jsonl_parser)
-    corpus2jsonl_parser.add_argument('--split', choices=['sentence', 'chunk', 'window'], help='Split type')
+    corpus2jsonl_parser.add_argument('--split', choices=['sentence', 'section', 'sent_chunk', 'sent_window'],
+                                     help='Split type')
     corpus2jsonl_parser.add_argument('--max-seq-length', dest='max_seq_length', default=512, type=int,
                                      help='Number of tokens to retain when `--split` is sent_chunk or sent_window.')
     corpus2jsonl_parser.add_argument('--tokenizer', default=None,
                                      help='Path to BERT tokenizer.')
+    add_sentence_args(corpus2jsonl_parser)
 
     # create-bio-dataset
     create_bio_ds_parser = subparsers.add_parser('create-bio-dataset', help='Create BIO dataset for training')
@@ -70,6 +114,18 @@ def main():
     create_bio_ds_parser.add_argument('outpath', type=Path, help='Path to write created dataset.')
     create_bio_ds_parser.add_argument('--test-size', type=float, default=0.1)
     create_bio_ds_parser.add_argument('--validation-size', type=float, default=0.05)
+    create_bio_ds_parser.add_argument('--note-id-field', default='note_id',
+                                      help='Field containing note/document IDs.')
+    create_bio_ds_parser.add_argument('--split-field', default=None,
+                                      help='Field whose value assigns rows to splits, e.g., studyid'
+                                           ' (default: --note-id-field).')
+    create_bio_ds_parser.add_argument('--seed', type=int, default=0,
+                                      help='Seed for the hash-based assignment of notes to splits.')
+    create_bio_ds_parser.add_argument('--num-proc', type=int, default=None,
+                                      help='Number of processes used to tag the input file.')
+    create_bio_ds_parser.add_argument('--num-shards', type=int, default=None,
+                                      help='Number of line-aligned shards the input file is split into'
+                                           ' (default: 4 per process).')
 
     # predict-bio-dataset
     predict_bio_ds_parser = subparsers.add_parser(
@@ -86,6 +142,37 @@ def main():
     )
     predict_bio_ds_parser.add_argument('--max-length', type=int, default=512)
     predict_bio_ds_parser.add_argument('--device', help='Device to use, e.g. cpu, cuda, cuda:0.')
+    predict_bio_ds_parser.add_argument('--batch-size', type=int, default=8,
+                                       help='Number of notes (sorted by length) to run through the model together.')
+    predict_bio_ds_parser.add_argument('--stride', type=int, default=None,
+                                       help='Predict notes longer than --max-length with sliding windows overlapping'
+                                            ' by this many tokens (default: truncate).')
+    predict_bio_ds_parser.add_argument('--num-threads', type=int, default=None,
+                                       help='Number of CPU threads used by the model in each process.')
+    predict_bio_ds_parser.add_argument('--workers', type=int, default=None,
+                                       help='Number of inference processes, each loading the model (CPU).')
+
+    # export-model
+    export_model_parser = subparsers.add_parser(
+        'export-model',
+        help='Export a trained BIO token-classification model to ONNX for CPU inference.',
+    )
+    add_export_model_args(export_model_parser)
+
+    # lint-perf
+    lint_perf_parser = subparsers.add_parser('lint-perf', help='Find regexes liable to catastrophic backtracking')
+    lint_perf_parser.add_argument('--package-name', required=True,
+                                  help='Name of package to lint regular expressions from.')
+    lint_perf_parser.add_argument('--concepts', nargs='+', default=None,
+                                  help='Only lint these concepts.')
+    lint_perf_parser.add_argument('--max-length', type=int, default=4096,
+                                  help='Length (in characters) of the longest adversarial input.')
+    lint_perf_parser.add_argument('--timeout', type=float, default=1.0,
+                                  help='Seconds a single search may take before the regex is reported as timing out.')
+    lint_perf_parser.add_argument('--top', type=int, default=20,
+                                  help='Number of slowest regexes to report.')
+    lint_perf_parser.add_argument('--outfile', type=Path, default=None,
+                                  help='Write the full report to this csv file.')
 
     args = parser.parse_args()
 
@@ -103,6 +190,8 @@ def main():
         run_all(**cmd_args)
     elif command == 'run-all-matches':
         run_all_matches(**cmd_args)
+    elif command == 'run-hybrid':
+        run_hybrid(**cmd_args)
     elif command == 'run4snippets':
         run4snippets(**cmd_args)
     elif command == 'bio-tag':
@@ -113,6 +202,10 @@ def main():
         create_bio_dataset(**cmd_args)
     elif command == 'predict-bio-dataset':
         predict_bio_dataset(**cmd_args)
+    elif command == 'export-model':
+        export_model(**cmd_args)
+    elif command == 'lint-perf':
+        lint_perf(**cmd_args)
 
 
 if __name__ == '__main__':
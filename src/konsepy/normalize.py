@@ -0,0 +1,119 @@
+"""
+Offset-preserving normalized view of a note.
+
+Whitespace runs are collapsed to a single space (leading/trailing whitespace is removed) and text is optionally
+case-folded. The view keeps a compact map (two arrays with one entry per non-whitespace token), so matches found
+in the normalized text can be reported with offsets into the original note.
+
+Views are cached per note (see `konsepy.notecache`): use `get_normalized_text(text)` rather than re-normalizing
+within postprocessors.
+"""
+import re
+from array import array
+from bisect import bisect_right
+
+from konsepy.notecache import note_memo
+from konsepy.rxutils import FrozenMatch
+
+_TOKEN_RX = re.compile(r'\S+')
+
+
+class NormalizedText:
+    """
+    casefold: case-fold the normalized text; characters whose case-folded form has a different length
+        (e.g., 'ß') are left unchanged so that offsets still map one-to-one within a token
+    """
+
+    def __init__(self, text, casefold=False):
+        self.original = text
+        self.casefold = casefold
+        self._orig_starts = array('q')  # original start of each token
+        self._norm_starts = array('q')  # normalized start of each token
+        self._lengths = array('q')
+        pieces = []
+        position = 0
+        for m in _TOKEN_RX.finditer(text):
+            token = m.group()
+            if casefold:
+                token = _casefold(token)
+            self._orig_starts.append(m.start())
+            self._norm_starts.append(position)
+            self._lengths.append(len(token))
+            pieces.append(token)
+            position += len(token) + 1
+        self.text = ' '.join(pieces)
+
+    def __len__(self):
+        return len(self.text)
+
+    def to_original(self, pos):
+        """Map an offset in the normalized text to the original text (a collapsed space maps to its start)."""
+        i = bisect_right(self._norm_starts, pos) - 1
+        if i < 0:
+            return 0 if self._orig_starts else len(self.original)
+        offset = min(pos - self._norm_starts[i], self._lengths[i])
+        return self._orig_starts[i] + offset
+
+    def to_normalized(self, pos):
+        """Map an offset in the original text to the normalized text (whitespace maps to its collapsed space)."""
+        i = bisect_right(self._orig_starts, pos) - 1
+        if i < 0:
+            return 0
+        offset = min(pos - self._orig_starts[i], self._lengths[i])
+        return self._norm_starts[i] + offset
+
+    def span(self, start, end):
+        """Map a (start, end) span in the normalized text to the original text."""
+        return self.to_original(start), self.to_original(end)
+
+    def slice(self, start, end):
+        """Return the normalized text for the original span text[start:end]."""
+        return self.text[self.to_normalized(start):self.to_normalized(end)]
+
+    def finditer(self, regex, pos=0, endpos=None):
+        """
+        Run `regex` over the normalized text, yielding `FrozenMatch`es on the original text.
+
+        pos/endpos: offsets in the original text
+        """
+        norm_end = len(self.text) if endpos is None else self.to_normalized(endpos)
+        for m in regex.finditer(self.text, self.to_normalized(pos), norm_end):
+            yield FrozenMatch.from_match(m).rebind(self.original, lambda span: self.span(*span))
+
+
+def get_normalized_text(text, casefold=False):
+    """Return the (cached) `NormalizedText` for a note."""
+    memo = note_memo(text)
+    key = ('normalized', casefold)
+    if key not in memo:
+        memo[key] = NormalizedText(text, casefold=casefold)
+    return memo[key]
+
+
+class NormalizedRegex:
+    """
+    Run a regex on the normalized view of each note, reporting matches with original offsets.
+
+    Can be used in place of a compiled regex in `REGEXES`, so the pattern only needs to consider single spaces
+    (and, with `casefold=True`, lower case). The literal anchor index (`konsepy.anchors`) does not apply to it.
+    """
+
+    def __init__(self, regex, casefold=False):
+        self.regex = regex
+        self.casefold = casefold
+
+    def finditer(self, string, pos=0, endpos=None):
+        return get_normalized_text(string, self.casefold).finditer(self.regex, pos, endpos)
+
+    def search(self, string, pos=0, endpos=None):
+        return next(self.finditer(string, pos, endpos), None)
+
+    def __repr__(self):
+        return f'NormalizedRegex({self.regex!r}, casefold={self.casefold!r})'
+
+
+def _casefold(token):
+    folded = token.casefold()
+    if len(folded) == len(token):
+        return folded
+    return ''.join(ch.casefold() if len(ch.casefold()) == 1 else ch for ch in token)
@@ -0,0 +1,18 @@
+"""
+Values computed once per note and shared by every regex/concept run against it.
+
+Postprocessors only receive the note text, so the memo is keyed on the text itself: the cache holds the most
+recent note and is reset as soon as a different text is seen.
+"""
+
+_memo_text = None
+_memo = {}
+
+
+def note_memo(text):
+    """Return a dict for caching values derived from `text` (e.g., `note_memo(text).setdefault(key, ...)`)."""
+    global _memo_text, _memo
+    if text is not _memo_text and text != _memo_text:
+        _memo_text = text
+        _memo = {}
+    return _memo
@@ -1,11 +1,16 @@
 import argparse
 import json
+import multiprocessing
+import os
+import time
+from collections import deque
 from pathlib import Path
 
 from loguru import logger
 
 from konsepy.cli import add_outdir_and_infiles, clean_args
 from konsepy.constants import ID_LABEL, NOTEID_LABEL, NOTEDATE_LABEL, NOTETEXT_LABEL
+from konsepy.export_model import OnnxModel, find_onnx_model
 from konsepy.textio import iterate_csv_file
 try:
     from transformers import AutoModelForTokenClassification, AutoTokenizer
@@ -89,31 +94,220 @@ def _iter_predicted_spans(
         max_length=512,
         device='cpu',
         merge_subwords=True,
+        stride=None,
 ):
-    if torch is None:
+    yield from _predict_spans_batch(
+        [text],
+        tokenizer,
+        model,
+        id2label,
+        max_length=max_length,
+        device=device,
+        merge_subwords=merge_subwords,
+        stride=stride,
+    )[0]
+
+
+def _predict_spans_batch(
+        texts,
+        tokenizer,
+        model,
+        id2label,
+        *,
+        max_length=512,
+        device='cpu',
+        merge_subwords=True,
+        stride=None,
+):
+    """
+    Run the model once over a batch of texts (padded to the longest); return a list of spans per text.
+
+    stride: if set, texts longer than `max_length` tokens are split into windows overlapping by `stride` tokens
+        (rather than truncated); each token is labelled by the window in which it is most central
+    """
+    is_onnx = isinstance(model, OnnxModel)
+    if torch is None and not is_onnx:
         raise ImportError('predict_bio_dataset requires torch to be installed.')
+    texts = list(texts)
+    kwargs = {'return_overflowing_tokens': True, 'stride': stride} if stride else {}
     encoded = tokenizer(
-        text,
+        texts,
         return_offsets_mapping=True,
-        return_tensors='pt',
+        return_tensors='np' if is_onnx else 'pt',
         truncation=True,
         max_length=max_length,
+        padding='longest',
+        **kwargs,
     )
 
-    offset_mapping = encoded.pop('offset_mapping')[0].tolist()
-    encoded = {key: value.to(device) for key, value in encoded.items()}
+    offset_mappings = encoded.pop('offset_mapping').tolist()  # padding has (0, 0) offsets, so is skipped
+    sample_mapping = encoded.pop('overflow_to_sample_mapping').tolist() if stride else range(len(texts))
+
+    predicted_ids = []
+    chunk_size = max(len(texts), 1)  # with windows, keep each forward pass to the batch size
+    if is_onnx:
+        for i in range(0, len(offset_mappings), chunk_size):
+            predicted_ids.extend(model.predict_ids({key: value[i:i + chunk_size] for key, value in encoded.items()}))
+    else:
+        encoded = {key: value.to(device) for key, value in encoded.items()}
+        with torch.no_grad():
+            for i in range(0, len(offset_mappings), chunk_size):
+                logits = model(**{key: value[i:i + chunk_size] for key, value in encoded.items()}).logits
+                predicted_ids.extend(logits.argmax(dim=-1).tolist())
+
+    windows = [[] for _ in texts]
+    for sample_index, window_ids, offset_mapping in zip(sample_mapping, predicted_ids, offset_mappings):
+        windows[sample_index].append(([id2label[label_id] for label_id in window_ids], offset_mapping))
+
+    results = []
+    for note_windows in windows:
+        labels, offsets = note_windows[0] if len(note_windows) == 1 else _merge_windows(note_windows)
+        results.append(list(_iter_spans_from_labels_and_offsets(
+            labels,
+            offsets,
+            merge_subwords=merge_subwords,
+        )))
+    return results
+
+
+def _merge_windows(windows):
+    """
+    Merge overlapping windows of (labels, offsets) into a single sequence ordered by offset.
+
+    A token in several windows takes its label from the window in which it is furthest from either edge.
+    """
+    best = {}  # (start, end) -> (centrality, label)
+    for labels, offsets in windows:
+        positions = [i for i, (start, end) in enumerate(offsets) if start != end]
+        if not positions:
+            continue
+        first, last = positions[0], positions[-1]
+        for i in positions:
+            offset = tuple(offsets[i])
+            centrality = min(i - first, last - i)
+            if offset not in best or centrality > best[offset][0]:
+                best[offset] = (centrality, labels[i])
+    offsets = sorted(best)
+    return [best[offset][1] for offset in offsets], offsets
+
+
+def check_stride(stride, max_length, tokenizer=None):
+    """
+    Raise ValueError unless windows overlapping by `stride` tokens still advance through the note.
+
+    Each window holds `max_length` tokens less the tokenizer's special tokens (e.g., [CLS] and [SEP]); the
+    stride must be smaller than that.
+    """
+    if not stride:
+        return
+    special_tokens = tokenizer.num_special_tokens_to_add(pair=False) if tokenizer is not None else 0
+    if stride < 0 or stride >= max_length - special_tokens:
+        raise ValueError(f'`stride` ({stride}) must be at least 0 and less than `max_length` ({max_length})'
+                         f' less {special_tokens} special tokens, i.e., below {max_length - special_tokens}.')
+
+
+def _length_sorted_batches(lengths, batch_size):
+    """Return batches (lists of indices) of similar lengths, minimizing padding within each batch."""
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def _iter_pools(records, pool_size):
+    pool = []
+    for record in records:
+        pool.append(record)
+        if len(pool) >= pool_size:
+            yield pool
+            pool = []
+    if pool:
+        yield pool
+
+
+def load_bio_model(model_path: Path, *, tokenizer_path: Path = None, id2label_path: Path = None, device=None,
+                   num_threads=None):
+    """
+    Load a trained BIO model (or its ONNX export, see `export_model`) with its tokenizer and labels.
+
+    Return: (tokenizer, model, id2label, device)
+    """
+    onnx_path = find_onnx_model(model_path)
+    device = _resolve_device(onnx_path, device)
+    model_dir = _get_model_dir(model_path, onnx_path)
+    tokenizer_path = tokenizer_path or model_dir
+    id2label_path = id2label_path or (model_path.parent if onnx_path is None else model_dir) / 'id2label.json'
 
-    with torch.no_grad():
-        logits = model(**encoded).logits[0]
+    logger.info(f'Loading tokenizer from {tokenizer_path}')
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
 
-    predicted_ids = logits.argmax(dim=-1).tolist()
-    labels = [id2label[label_id] for label_id in predicted_ids]
+    if onnx_path is not None:
+        logger.info(f'Loading ONNX model from {onnx_path}')
+        model = OnnxModel(onnx_path, num_threads=num_threads)
+    else:
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        logger.info(f'Loading model from {model_path}')
+        model = AutoModelForTokenClassification.from_pretrained(model_path)
+        model.to(device)
+        model.eval()
 
-    yield from _iter_spans_from_labels_and_offsets(
-        labels,
-        offset_mapping,
-        merge_subwords=merge_subwords,
-    )
+    logger.info(f'Loading labels from {id2label_path}')
+    return tokenizer, model, _load_id2label(id2label_path), device
+
+
+def _get_model_dir(model_path, onnx_path):
+    return model_path if onnx_path is None else onnx_path.parent
+
+
+def _resolve_device(onnx_path, device):
+    """Check dependencies for running the model; return the device it will run on."""
+    if onnx_path is None and torch is None:
+        raise ImportError('load_bio_model requires torch to be installed.')
+    if AutoTokenizer is None or AutoModelForTokenClassification is None:
+        raise ImportError('load_bio_model requires transformers to be installed.')
+    if onnx_path is not None:
+        return 'cpu'
+    return device or ('cuda' if torch.cuda.is_available() else 'cpu')
+
+
+def predict_spans(texts, tokenizer, model, id2label, *, batch_size=8, **kwargs):
+    """Predict spans for each of `texts` in length-sorted batches; return a list of spans per text, in order."""
+    spans = [None] * len(texts)
+    for batch in _length_sorted_batches([len(text) for text in texts], batch_size):
+        batch_spans = _predict_spans_batch([texts[index] for index in batch], tokenizer, model, id2label, **kwargs)
+        for index, note_spans in zip(batch, batch_spans):
+            spans[index] = note_spans
+    return spans
+
+
+def _ordered_map(executor, func, items, *, max_pending, key=None):
+    """Yield (item, result of func) in input order, keeping at most `max_pending` items in flight."""
+    pending = deque()
+    for item in items:
+        pending.append((item, executor.apply_async(func, (item if key is None else key(item),))))
+        if len(pending) >= max_pending:
+            item, result = pending.popleft()
+            yield item, result.get()
+    while pending:
+        item, result = pending.popleft()
+        yield item, result.get()
+
+
+_worker_state = None
+
+
+def _init_worker(model_path, load_kwargs, predict_kwargs):
+    global _worker_state
+    tokenizer, model, id2label, device = load_bio_model(model_path, **load_kwargs)
+    _worker_state = (tokenizer, model, id2label, dict(predict_kwargs, device=device))
+
+
+def _predict_in_worker(texts):
+    tokenizer, model, id2label, predict_kwargs = _worker_state
+    return predict_spans(texts, tokenizer, model, id2label, **predict_kwargs)
+
+
+def _pool_texts(pool):
+    return [text for _, _, _, _, text, _ in pool]
 
 
 def predict_bio_dataset(
@@ -133,78 +327,120 @@ def predict_bio_dataset(
         max_length=512,
         device=None,
         merge_subwords=True,
+        batch_size=8,
+        pool_size=None,
+        stride=None,
+        num_threads=None,
+        workers=None,
 ):
-    """Run a trained BIO token-classification model over raw input files."""
-    if torch is None:
-        raise ImportError('predict_bio_dataset requires torch to be installed.')
-    if AutoTokenizer is None or AutoModelForTokenClassification is None:
-        raise ImportError('predict_bio_dataset requires transformers to be installed.')
-    outdir.mkdir(parents=True, exist_ok=True)
-
-    tokenizer_path = tokenizer_path or model_path
-    id2label_path = id2label_path or model_path.parent / 'id2label.json'
-    if device is None:
-        device = 'cpu' if torch is None else ('cuda' if torch.cuda.is_available() else 'cpu')
+    """
+    Run a trained BIO token-classification model over raw input files.
+
+    batch_size: number of notes run through the model together (padded to the longest in the batch)
+    pool_size: number of notes read ahead and sorted by length into batches (default: 32 batches);
+        predictions are written in input order
+    stride: predict notes longer than `max_length` tokens with sliding windows overlapping by `stride` tokens
+        (default: truncate notes to `max_length` tokens)
+    num_threads: number of CPU threads used by the model in each process (default with `workers`: the CPU
+        count divided by `workers`)
+    workers: number of inference processes (each loading the model); notes are read in the main process and
+        pools of notes are sent to the workers, with predictions written in input order
+
+    If `model_path` is an ONNX export (see `export_model`), it is run on CPU with ONNX Runtime, and the
+    tokenizer and labels default to those saved alongside it.
+    """
+    check_stride(stride, max_length)
+    onnx_path = find_onnx_model(model_path)
+    device = _resolve_device(onnx_path, device)
+    backend = 'onnx' if onnx_path is not None else device
+    if workers and workers > 1:
+        num_threads = num_threads or max(1, (os.cpu_count() or 1) // workers)
+    load_kwargs = {
+        'tokenizer_path': tokenizer_path,
+        'id2label_path': id2label_path,
+        'device': device,
+        'num_threads': num_threads,
+    }
+    if not workers or workers <= 1:
+        tokenizer, model, id2label, device = load_bio_model(model_path, **load_kwargs)
+        check_stride(stride, max_length, tokenizer)
+    elif stride:  # check before starting workers, which would each fail (and be restarted) on the first batch
+        check_stride(stride, max_length,
+                     AutoTokenizer.from_pretrained(tokenizer_path or _get_model_dir(model_path, onnx_path)))
 
-    logger.info(f'Loading tokenizer from {tokenizer_path}')
-    tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+    outdir.mkdir(parents=True, exist_ok=True)
+    output_path = outdir / 'predictions.jsonl'
 
-    logger.info(f'Loading model from {model_path}')
-    model = AutoModelForTokenClassification.from_pretrained(model_path)
-    model.to(device)
-    model.eval()
+    records = iterate_csv_file(
+        input_files,
+        encoding=encoding,
+        id_label=id_label,
+        noteid_label=noteid_label,
+        notedate_label=notedate_label,
+        notetext_label=notetext_label,
+        noteorder_label=noteorder_label,
+        metadata_labels=metadata_labels,
+    )
+    pool_size = pool_size or batch_size * 32
+    predict_kwargs = {
+        'batch_size': batch_size,
+        'max_length': max_length,
+        'merge_subwords': merge_subwords,
+        'stride': stride,
+    }
+    note_count = 0
+    start_time = time.perf_counter()
+    with open(output_path, 'w', encoding='utf8') as out:
+        if workers and workers > 1:
+            logger.info(f'Starting {workers} inference workers ({num_threads} threads each).')
+            with multiprocessing.get_context('spawn').Pool(
+                    workers, initializer=_init_worker, initargs=(model_path, load_kwargs, predict_kwargs),
+            ) as executor:
+                for pool, spans in _ordered_map(executor, _predict_in_worker, _iter_pools(records, pool_size),
+                                                max_pending=workers * 2, key=_pool_texts):
+                    _write_predictions(out, pool, spans)
+                    note_count += len(pool)
+        else:
+            for pool in _iter_pools(records, pool_size):
+                spans = predict_spans(_pool_texts(pool), tokenizer, model, id2label, device=device,
+                                      **predict_kwargs)
+                _write_predictions(out, pool, spans)
+                note_count += len(pool)
+
+    elapsed = time.perf_counter() - start_time
+    logger.info(f'Predicted {note_count:,} notes in {elapsed:.1f}s'
+                f' ({note_count / elapsed if elapsed else 0:.1f} notes/sec; batch size {batch_size};'
+                f' {backend}{f"; {workers} workers" if workers and workers > 1 else ""}).')
+    logger.info(f'Wrote predictions to {output_path}')
+    return output_path
 
-    logger.info(f'Loading labels from {id2label_path}')
-    id2label = _load_id2label(id2label_path)
 
-    output_path = outdir / 'predictions.jsonl'
+def _write_predictions(out, pool, spans):
+    for (_, studyid, note_id, note_date, text, metadata), note_spans in zip(pool, spans):
+        results = []
 
-    with open(output_path, 'w', encoding='utf8') as out:
-        for _, studyid, note_id, note_date, text, metadata in iterate_csv_file(
-                input_files,
-                encoding=encoding,
-                id_label=id_label,
-                noteid_label=noteid_label,
-                notedate_label=notedate_label,
-                notetext_label=notetext_label,
-                noteorder_label=noteorder_label,
-                metadata_labels=metadata_labels,
-        ):
-            results = []
-
-            for span in _iter_predicted_spans(
-                    text,
-                    tokenizer,
-                    model,
-                    id2label,
-                    max_length=max_length,
-                    device=device,
-                    merge_subwords=merge_subwords,
-            ):
-                start = span['start']
-                end = span['end']
-                results.append({
-                    'domain': span['domain'],
-                    'capture': text[start:end],
-                    'start': start,
-                    'end': end,
-                })
-
-            row = {
-                'studyid': studyid,
-                'note_id': note_id,
-                'note_date': note_date,
-                'text': text,
-                'results': results,
-            }
+        for span in note_spans:
+            start = span['start']
+            end = span['end']
+            results.append({
+                'domain': span['domain'],
+                'capture': text[start:end],
+                'start': start,
+                'end': end,
+            })
 
-            if metadata:
-                row.update(metadata)
+        row = {
+            'studyid': studyid,
+            'note_id': note_id,
+            'note_date': note_date,
+            'text': text,
+            'results': results,
+        }
 
-            out.write(json.dumps(row) + '\n')
+        if metadata:
+            row.update(metadata)
 
-    logger.info(f'Wrote predictions to {output_path}')
-    return output_path
+        out.write(json.dumps(row) + '\n')
 
 
 def predict_bio_dataset_args():
@@ -221,6 +457,15 @@ def predict_bio_dataset_args():
     parser.add_argument('--noteorder-label')
     parser.add_argument('--max-length', type=int, default=512)
     parser.add_argument('--device', help='Device to use, e.g. cpu, cuda, cuda:0.')
+    parser.add_argument('--batch-size', type=int, default=8,
+                        help='Number of notes (sorted by length) to run through the model together.')
+    parser.add_argument('--stride', type=int, default=None,
+                        help='Predict notes longer than --max-length with sliding windows overlapping by this many'
+                             ' tokens (default: truncate).')
+    parser.add_argument('--num-threads', type=int, default=None,
+                        help='Number of CPU threads used by the model in each process.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of inference processes, each loading the model (CPU).')
     parser.add_argument(
         '--no-merge-subwords',
         action='store_true',
@@ -4,6 +4,7 @@ from collections import Counter, defaultdict
 
 from konsepy.constants import NOTEDATE_LABEL, ID_LABEL, NOTEID_LABEL, NOTETEXT_LABEL
 from konsepy.results import ExtractionResult, get_result_label
+from konsepy.snippets import SnippetCounter
 from konsepy.textio import iterate_csv_file, output_results
 from loguru import logger
 
@@ -15,13 +16,18 @@ def run_regex_on_files(input_files, regex_func, package_name=None, *, start_afte
                        id_label=ID_LABEL, noteid_label=NOTEID_LABEL,
                        notedate_label=NOTEDATE_LABEL, notetext_label=NOTETEXT_LABEL,
                        noteorder_label=None, metadata_labels=None,
-                       select_probability=1.0, **kwargs):
+                       select_probability=1.0, max_snippets=10_000, max_snippet_length=500, **kwargs):
+    """
+    max_snippets: maximum number of distinct not-found snippets to retain (see `SnippetCounter`)
+    max_snippet_length: snippets (e.g., whole notes when `require_regex` is not given) are truncated to this
+        many characters, so that memory is bounded by both limits
+    """
     cat_counter_notes = Counter()
     cat_counter_mrns = defaultdict(set)
     noteid_to_cat = defaultdict(Counter)
     mrn_to_cat = defaultdict(Counter)
     unique_mrns = set()
-    not_found_text = Counter()
+    not_found_text = SnippetCounter(max_snippets, max_length=max_snippet_length)
     extraction_rows = []
     if require_regex:
         require_regex = re.compile(require_regex, re.I)
@@ -76,15 +82,15 @@ def extract_categories(mrn, note_id, text, regex_func, *, categories=None,
             )
     if categories:
         unique_mrns.add(mrn)
-    if not categories and not_found_text:
+    if not categories and not_found_text is not None:
         if require_regex:
             for m in require_regex.finditer(text):
                 start_snippet = max(0, m.start() - window_size)
                 end_snippet = m.end() + window_size
                 snippet = text[start_snippet:end_snippet + 1]
-                not_found_text[' '.join(snippet.split())] += 1
+                not_found_text.update((' '.join(snippet.split()),))
         else:
-            not_found_text[' '.join(text.split())] += 1
+            not_found_text.update((' '.join(text.split()),))
 
 
 def run_regex_and_output(package_name, input_files, outdir, *concepts,
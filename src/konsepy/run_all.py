@@ -9,7 +9,9 @@ from konsepy.cli import add_outdir_and_infiles, add_run_all_args, clean_args
 from konsepy.constants import NOTEDATE_LABEL, ID_LABEL, NOTEID_LABEL, NOTETEXT_LABEL
 from konsepy.regex import extract_categories
 from konsepy.results import get_result_label
+from konsepy.store import RUN_STORE_NAME, RunStore
 from konsepy.textio import output_results
+from konsepy.watermark import Watermark, hash_note
 
 from konsepy.engine import ProcessingEngine
 
@@ -18,9 +20,22 @@ def run_all(input_files, outdir: pathlib.Path, package_name: str, *,
             encoding='latin1', id_label=ID_LABEL, noteid_label=NOTEID_LABEL,
             notedate_label=NOTEDATE_LABEL, notetext_label=NOTETEXT_LABEL,
             noteorder_label=None, metadata_labels=None, incremental_output_only=False,
-            concepts=None, include_text_output=False, limit_noteids=None, **kwargs) -> pathlib.Path:
+            concepts=None, include_text_output=False, limit_noteids=None, incremental=None,
+            result_store=None, watermark=None, **kwargs) -> pathlib.Path:
     """
     Run all concepts.
+
+    Results are also recorded in `run_store.db` in the output directory. To re-use these in a later run,
+    supply `incremental` (the previous `run_all` directory or its store): only concepts whose source has
+    changed and notes not seen in the previous run (or whose text has changed) are computed, and all outputs
+    are regenerated from the combined store.
+
+    result_store: path to a persistent store to use (and update in place) instead of `run_store.db`; when it
+        already exists, the run is incremental against it
+    watermark: `note_date`, `note_id`, or `hash`; skip notes at or below the watermark saved in the store
+        (for `note_date`/`note_id`, filtering is done by the input readers); notes on the last processed
+        `note_date` are read again and skipped if already in the store
+
     Return: Newly created `run_all` directory.
     """
     logger.info(f'Arguments ignored: {kwargs}')
@@ -36,6 +51,7 @@ def run_all(input_files, outdir: pathlib.Path, package_name: str, *,
     unique_mrns = set()
     extraction_rows = []
 
+    kwargs.setdefault('quarantine_path', curr_outdir / 'quarantine.jsonl')
     engine = ProcessingEngine(
         input_files, package_name, encoding=encoding, id_label=id_label,
         noteid_label=noteid_label, notedate_label=notedate_label,
@@ -44,11 +60,57 @@ def run_all(input_files, outdir: pathlib.Path, package_name: str, *,
         limit_noteids=limit_noteids, **kwargs
     )
 
-    with open(curr_outdir / 'output.jsonl', 'w') as out:
+    store_path = pathlib.Path(result_store) if result_store else curr_outdir / RUN_STORE_NAME
+    if incremental and store_path.exists():
+        raise ValueError(f'Result store {store_path} already exists; do not also specify `incremental`.')
+    carry_forward = bool(incremental) or store_path.exists()
+    store = RunStore.from_previous(incremental, store_path) if incremental else RunStore(store_path)
+    changed_concepts = store.update_concepts(engine.concepts)
+    known_notes = store.known_notes() if carry_forward else {}
+    if carry_forward:
+        logger.info(f'Incremental run: {len(changed_concepts):,} new/changed concepts'
+                    f' ({", ".join(sorted(changed_concepts)) or "none"});'
+                    f' carrying forward {len(known_notes):,} previously processed notes.')
+    if watermark:
+        engine.watermark = store.load_watermark(watermark)
+        if changed_concepts and known_notes:
+            logger.warning(f'Ignoring {engine.watermark} for this run: new/changed concepts must be run'
+                           f' over previously processed notes.')
+            engine.watermark = Watermark(watermark)
+        logger.info(f'Processing notes beyond {engine.watermark}.')
+
+    note_hashes = {}  # only retain the hash for the current note
+
+    def get_note_hash(studyid, note_id, text):
+        key = (str(studyid), str(note_id))
+        if key not in note_hashes:
+            note_hashes.clear()
+            note_hashes[key] = hash_note(studyid, note_id, text)
+        return note_hashes[key]
+
+    def concept_filter(studyid, note_id, text, concept):
+        if concept.name in changed_concepts:
+            return True
+        key = (str(studyid), str(note_id))
+        if key not in known_notes:
+            return True
+        if known_notes[key] != get_note_hash(studyid, note_id, text):  # note text has changed
+            store.drop_note(studyid, note_id)
+            del known_notes[key]
+            return True
+        return False
+
+    current_note = None  # concepts for a note are run consecutively: record each note once
+
+    with store, open(curr_outdir / 'output.jsonl', 'w') as out:
         def callback(studyid, note_id, note_date, text, metadata, concept, categories, matches):
+            nonlocal current_note
+            if (studyid, note_id) != current_note:
+                current_note = (studyid, note_id)
+                store.add_note(studyid, note_id, note_date, get_note_hash(studyid, note_id, text))
             if categories:
                 output_categories = [str(get_result_label(category)) for category in categories]
-                out.write(json.dumps({
+                output = json.dumps({
                     'studyid': studyid,
                     'note_id': note_id,
                     'note_date': note_date,
@@ -56,8 +118,11 @@ def run_all(input_files, outdir: pathlib.Path, package_name: str, *,
                     'concept': concept.name,
                     'matches': [m.group() for m in matches] if matches else None,
                     'categories': output_categories,
-                }) + '\n')
-            if not incremental_output_only:
+                })
+                store.add_result(studyid, note_id, concept.name, output, categories)
+                if not carry_forward:
+                    out.write(output + '\n')
+            if not carry_forward and not incremental_output_only:
                 extract_categories(
                     studyid, note_id, text, concept.run_func, categories=categories,
                     cat_counter_mrns=cat_counter_mrns, cat_counter_notes=cat_counter_notes,
@@ -65,7 +130,22 @@ def run_all(input_files, outdir: pathlib.Path, package_name: str, *,
                     unique_mrns=unique_mrns, extraction_rows=extraction_rows
                 )
 
-        engine.run(callback)
+        engine.run(callback, concept_filter=concept_filter if carry_forward else None)
+        if engine.watermark is not None:
+            store.save_watermark(engine.watermark)
+
+        if carry_forward:  # regenerate outputs from the combined store without re-reading historical notes
+            store.commit()
+            concept_names = {concept.name for concept in engine.concepts}
+            for studyid, note_id, concept_name, output, categories in store.iter_results(concept_names):
+                out.write(output + '\n')
+                if not incremental_output_only:
+                    extract_categories(
+                        studyid, note_id, None, None, categories=categories,
+                        cat_counter_mrns=cat_counter_mrns, cat_counter_notes=cat_counter_notes,
+                        mrn_to_cat=mrn_to_cat, noteid_to_cat=noteid_to_cat,
+                        unique_mrns=unique_mrns, extraction_rows=extraction_rows
+                    )
 
     if not incremental_output_only:
         logger.info(f'Bulk writing to {curr_outdir}.')
@@ -83,4 +163,10 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(fromfile_prefix_chars='@!')
     add_outdir_and_infiles(parser)
     add_run_all_args(parser)
+    parser.add_argument('--incremental', type=pathlib.Path, default=None,
+                        help='Previous `run_all` directory (or its run_store.db) to carry unchanged results forward.')
+    parser.add_argument('--result-store', type=pathlib.Path, default=None,
+                        help='Persistent result store to update in place (incremental when it already exists).')
+    parser.add_argument('--watermark', choices=Watermark.FIELDS, default=None,
+                        help='Only process notes beyond the watermark saved in the result store.')
     run_all(**clean_args(vars(parser.parse_args())))
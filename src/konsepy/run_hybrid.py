@@ -0,0 +1,174 @@
+"""
+Regex-gated model inference: run concepts over every note, then run a BIO model (see `predict_bio_dataset`)
+only over notes (or windows around matches) where selected concepts fired.
+"""
+import datetime
+import json
+import pathlib
+import time
+
+from loguru import logger
+
+from konsepy.constants import NOTEDATE_LABEL, ID_LABEL, NOTEID_LABEL, NOTETEXT_LABEL
+from konsepy.engine import ProcessingEngine
+from konsepy.predict_bio_dataset import check_stride, load_bio_model, predict_spans
+from konsepy.results import get_result_label
+
+
+def run_hybrid(input_files, outdir: pathlib.Path, package_name: str, model_path: pathlib.Path, *,
+               encoding='latin1', id_label=ID_LABEL, noteid_label=NOTEID_LABEL,
+               notedate_label=NOTEDATE_LABEL, notetext_label=NOTETEXT_LABEL,
+               noteorder_label=None, metadata_labels=None, concepts=None, limit_noteids=None,
+               gate_concepts=None, gate_categories=None, context=None,
+               tokenizer_path: pathlib.Path = None, id2label_path: pathlib.Path = None, max_length=512,
+               device=None, merge_subwords=True, batch_size=8, pool_size=None, stride=None, num_threads=None,
+               **kwargs) -> pathlib.Path:
+    """
+    Run all concepts, and a BIO model only where `gate_concepts` matched; output one JSONL row per note
+    with any regex or model results.
+
+    gate_concepts: names of concepts whose matches send a note to the model (default: all concepts)
+    gate_categories: only matches in these categories (e.g., `Category.YES` or `YES`) send a note to the model
+    context: characters of context around each gating match to send to the model (overlapping windows are
+        merged, and extended to whitespace); if None, the whole note is sent
+    pool_size: notes are buffered (in input order) until this many model windows or notes are pending
+        (default: 32 batches)
+    Return: Newly created `run_hybrid` directory.
+    """
+    check_stride(stride, max_length)
+    dt = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    curr_outdir = outdir / f'run_hybrid_{dt}'
+    curr_outdir.mkdir(parents=True)
+    logger.add(curr_outdir / f'run_hybrid_{dt}.log')
+
+    tokenizer, model, id2label, device = load_bio_model(
+        model_path, tokenizer_path=tokenizer_path, id2label_path=id2label_path, device=device,
+        num_threads=num_threads,
+    )
+    check_stride(stride, max_length, tokenizer)
+    engine = ProcessingEngine(
+        input_files, package_name, encoding=encoding, id_label=id_label,
+        noteid_label=noteid_label, notedate_label=notedate_label,
+        notetext_label=notetext_label, noteorder_label=noteorder_label,
+        metadata_labels=metadata_labels, concepts=concepts,
+        limit_noteids=limit_noteids, **kwargs
+    )
+    gate_concepts = set(gate_concepts) if gate_concepts else None
+    gate_categories = set(gate_categories) if gate_categories else None
+    pool_size = pool_size or batch_size * 32
+    predict_kwargs = {'batch_size': batch_size, 'max_length': max_length, 'device': device,
+                      'merge_subwords': merge_subwords, 'stride': stride}
+
+    stats = {'notes': 0, 'gated': 0, 'chars': 0, 'model_chars': 0}
+    pool = []  # notes with results, awaiting model predictions
+    pool_windows = 0
+    current = None
+    output_path = curr_outdir / 'output.jsonl'
+    start_time = time.perf_counter()
+    with open(output_path, 'w', encoding='utf8') as out:
+        def flush_note():
+            nonlocal pool_windows
+            if current is None:
+                return
+            stats['notes'] += 1
+            stats['chars'] += len(current['text'])
+            if current['gate_spans']:
+                current['windows'] = _context_windows(current['text'], current['gate_spans'], context)
+                stats['gated'] += 1
+                stats['model_chars'] += sum(end - start for start, end in current['windows'])
+            if current['regex_results'] or current['gate_spans']:
+                pool.append(current)
+                pool_windows += len(current['windows'])
+            # also cap the number of notes, so regex-only notes are written rather than held
+            if pool_windows >= pool_size or len(pool) >= pool_size:
+                _predict_and_write(pool, out, tokenizer, model, id2label, predict_kwargs)
+                pool.clear()
+                pool_windows = 0
+
+        def callback(studyid, note_id, note_date, text, metadata, concept, categories, matches):
+            nonlocal current
+            if current is None or current['text'] is not text or current['note_id'] != note_id:
+                flush_note()
+                current = {'studyid': studyid, 'note_id': note_id, 'note_date': note_date, 'text': text,
+                           'metadata': metadata, 'regex_results': [], 'gate_spans': [], 'windows': []}
+            if not matches:
+                return
+            gate = gate_concepts is None or concept.name in gate_concepts
+            for category, m in zip(categories, matches):
+                label = str(get_result_label(category))
+                current['regex_results'].append({
+                    'concept': concept.name,
+                    'category': label,
+                    'match': m.group(),
+                    'start': m.start(),
+                    'end': m.end(),
+                })
+                if gate and (gate_categories is None or _category_in(label, gate_categories)):
+                    current['gate_spans'].append((m.start(), m.end()))
+
+        engine.run(callback)
+        flush_note()
+        _predict_and_write(pool, out, tokenizer, model, id2label, predict_kwargs)
+
+    elapsed = time.perf_counter() - start_time
+    logger.info(f'Sent {stats["gated"]:,} of {stats["notes"]:,} notes to the model'
+                f' ({stats["model_chars"]:,} of {stats["chars"]:,} characters'
+                f'; {stats["model_chars"] / stats["chars"] if stats["chars"] else 0:.2%}) in {elapsed:.1f}s.')
+    logger.info(f'Wrote results to {output_path}')
+    return curr_outdir
+
+
+def _category_in(label, categories):
+    return label in categories or label.rsplit('.', 1)[-1] in categories
+
+
+def _context_windows(text, spans, context):
+    """Return merged [(start, end), ...] covering each span with `context` characters on either side."""
+    if context is None:
+        return [(0, len(text))]
+    windows = []
+    for start, end in sorted(spans):
+        start = _word_boundary(text, max(0, start - context), -1)
+        end = _word_boundary(text, min(len(text), end + context), 1)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(end, windows[-1][1]))
+        else:
+            windows.append((start, end))
+    return windows
+
+
+def _word_boundary(text, pos, step):
+    """Move `pos` by `step` until it is not within a word."""
+    while 0 < pos < len(text) and not (text[pos - 1].isspace() or text[pos].isspace()):
+        pos += step
+    return pos
+
+
+def _predict_and_write(notes, out, tokenizer, model, id2label, predict_kwargs):
+    windows = [(note, start, end) for note in notes for start, end in note['windows']]
+    spans = predict_spans(
+        [note['text'][start:end] for note, start, end in windows], tokenizer, model, id2label, **predict_kwargs
+    ) if windows else []
+    model_results = {}
+    for (note, offset, _), window_spans in zip(windows, spans):
+        model_results.setdefault(id(note), []).extend(
+            {
+                'domain': span['domain'],
+                'capture': note['text'][span['start'] + offset:span['end'] + offset],
+                'start': span['start'] + offset,
+                'end': span['end'] + offset,
+            }
+            for span in window_spans
+        )
+    for note in notes:
+        row = {
+            'studyid': note['studyid'],
+            'note_id': note['note_id'],
+            'note_date': note['note_date'],
+            'regex_results': note['regex_results'],
+            'model_results': model_results.get(id(note), []) if note['windows'] else None,
+            'model_windows': note['windows'] or None,
+        }
+        if note['metadata']:
+            row.update(note['metadata'])
+        out.write(json.dumps(row) + '\n')
@@ -2,13 +2,25 @@ from bisect import bisect_left
 from enum import Enum
 from warnings import warn
 
+from konsepy.anchors import get_anchor_index
+from konsepy.annotations import get_note_annotations
 from konsepy.context.contexts import get_contexts, get_contexts_by_index
+from konsepy.notecache import note_memo
 from konsepy.results import ExtractionResult
 
 _DEFAULT_WINDOW = 30
 
 SKIP = object()
 
+_search_progress = None
+
+
+def set_search_progress(progress):
+    """Record the index of the regex currently being run in `progress.value` (e.g., a shared
+    `multiprocessing.Value`, see `konsepy.watchdog`); None to disable."""
+    global _search_progress
+    _search_progress = progress
+
 
 def search_all_regex(regexes, window=_DEFAULT_WINDOW, word_window=None, suppress_overlaps=False):
     """
@@ -74,12 +86,14 @@ def search_first_regex(regexes, window=_DEFAULT_WINDOW, word_window=None, suppre
     """
     search_all = search_all_regex(regexes, window=window, word_window=word_window, suppress_overlaps=suppress_overlaps)
 
-    def _search_first_regex(text, *, include_match=False, ignore_indices=False, categories_only=False):
+    def _search_first_regex(text, *, include_match=False, ignore_indices=False,
+                            categories_only=False, presence=False):
         for result in search_all(
                 text,
                 include_match=include_match,
                 ignore_indices=ignore_indices,
                 categories_only=categories_only,
+                presence=presence,
         ):
             yield result
             return
@@ -140,29 +154,75 @@ def _search_regex(regexes, window=_DEFAULT_WINDOW, word_window=None, *, extracto
         A function that takes text and returns a generator of results.
     """
 
-    def _run_search(text, *, include_match=False, ignore_indices=False, categories_only=False):
+    def _run_search(text, *, include_match=False, ignore_indices=False,
+                    categories_only=False, presence=False):
+        """
+        presence: presence mode; each distinct result is yielded once per note, and a regex whose
+            result cannot vary (no postprocessors or extractor) stops scanning once its category is found
+        """
         found_non_unknown = False
         claimed_spans = SpanTracker()
+        found_results = _ResultSet()
+        anchor_index = get_anchor_index()
+        annotations = None  # shared note-level annotations (if any annotators are active)
 
-        for regex, category, *other in regexes:
+        for regex_index, (regex, category, *other) in enumerate(regexes):
             if regex is None:
                 if found_non_unknown:
                     break
                 continue
+            if _search_progress is not None:
+                _search_progress.value = regex_index
 
             postprocessors, preprocessors = _unpack_regex_args(other)
+            needs_contexts = extractor is not None or any(func is not None for func in postprocessors)
+            if not needs_contexts and category is None:
+                continue  # can never yield a result
+            # the only possible result is `category`: once found, further matches add nothing
+            fixed_result = presence and not needs_contexts and not suppress_overlaps
+            if fixed_result and category in found_results:
+                continue
 
             if ignore_indices:
                 regions = [(0, len(text))]
             else:
                 regions = list(_get_search_regions(text, preprocessors))
 
+            anchor = anchor_index.lookup(regex) if anchor_index is not None else None
+
             for start, end in regions:
-                for m in regex.finditer(text, pos=start, endpos=end):
+                if fixed_result and category in found_results:
+                    break
+                search_start = start
+                if anchor is not None:  # only search if (and from where) an anchor literal occurs
+                    search_start = anchor.earliest_start(anchor_index.scan(text), start, end)
+                    if search_start is None:
+                        anchor_index.skipped += 1
+                        continue
+                    anchor_index.searched += 1
+                for m in regex.finditer(text, pos=search_start, endpos=end):
                     if suppress_overlaps and claimed_spans.overlaps(m.start(), m.end()):
                         continue
 
+                    if not needs_contexts:  # no need to build contexts or apply postprocessors
+                        if suppress_overlaps:
+                            claimed_spans.add(m.start(), m.end())
+                        if presence:
+                            if category in found_results:
+                                continue
+                            found_results.add(category)
+                        yield (category, m) if include_match else category
+                        if _is_non_unknown(category):
+                            found_non_unknown = True
+                        if fixed_result:
+                            break
+                        continue
+
                     contexts = get_contexts(m, text, window, word_window=word_window, region=(start, end))
+                    if annotations is None:
+                        annotations = get_note_annotations(text) or False
+                    if annotations:
+                        contexts['annotations'] = annotations
                     default_result = category
                     
                     if extractor is not None:
@@ -199,6 +259,11 @@ def _search_regex(regexes, window=_DEFAULT_WINDOW, word_window=None, *, extracto
                     if suppress_overlaps:
                         claimed_spans.add(m.start(), m.end())
 
+                    if presence:
+                        if result in found_results:
+                            continue
+                        found_results.add(result)
+
                     yield (result, result_match) if include_match else result
 
                     if _is_non_unknown(result):
@@ -244,12 +309,14 @@ def extract_first_regex_target(
         suppress_overlaps=suppress_overlaps,
     )
 
-    def _extract_first_regex(text, *, include_match=False, ignore_indices=False, categories_only=False):
+    def _extract_first_regex(text, *, include_match=False, ignore_indices=False,
+                             categories_only=False, presence=False):
         for result in search_all(
                 text,
                 include_match=include_match,
                 ignore_indices=ignore_indices,
                 categories_only=categories_only,
+                presence=presence,
         ):
             yield result
             return
@@ -327,12 +394,13 @@ def get_all_regex_by_index(regexes, window=_DEFAULT_WINDOW, word_window=None, su
     """
     search_all = search_all_regex(regexes, window=window, word_window=word_window, suppress_overlaps=suppress_overlaps)
 
-    def _get_all_regex_by_index(text, *, ignore_indices=False, categories_only=False):
+    def _get_all_regex_by_index(text, *, ignore_indices=False, categories_only=False, presence=False):
         for result, match in search_all(
                 text,
                 include_match=True,
                 ignore_indices=ignore_indices,
                 categories_only=categories_only,
+                presence=presence,
         ):
             yield result, match.group(), match.start(), match.end()
 
@@ -363,12 +431,13 @@ def search_and_replace_regex_func(regexes, window=_DEFAULT_WINDOW, word_window=N
     search_all = search_all_regex(regexes, window=window, word_window=word_window, suppress_overlaps=suppress_overlaps)
 
     def _search_and_replace_regex(text, *, include_match=False,
-                                  ignore_indices=False, categories_only=False):
+                                  ignore_indices=False, categories_only=False, presence=False):
         yield from search_all(
             text,
             include_match=include_match,
             ignore_indices=ignore_indices,
             categories_only=categories_only,
+            presence=presence,
         )
 
     return _search_and_replace_regex
@@ -465,6 +534,26 @@ class SpanTracker:
         self._spans[index:remove_until] = [(start, end)]
 
 
+class _ResultSet:
+    """Distinct results yielded for a note; falls back to a list for unhashable results."""
+
+    def __init__(self):
+        self._hashable = set()
+        self._unhashable = []
+
+    def add(self, result):
+        try:
+            self._hashable.add(result)
+        except TypeError:
+            self._unhashable.append(result)
+
+    def __contains__(self, result):
+        try:
+            return result in self._hashable
+        except TypeError:
+            return result in self._unhashable
+
+
 def _make_extractor(target, *, transform=None, missing=SKIP, unmatched=SKIP):
     if transform is None:
         return extract_group(target, missing=missing, unmatched=unmatched)
@@ -502,30 +591,40 @@ def _get_search_regions(text, preprocessors):
     Yield valid searchable regions from pre-processors.
 
     If no pre-processors are provided, the full text range is yielded.
+    Regions are computed once per note and pre-processor, and shared by all regexes (and concepts) using it.
     """
     if not preprocessors:
         yield 0, len(text)
         return
 
+    memo = note_memo(text)
     for func in preprocessors:
         if func is None:
             continue
+        key = ('search_regions', func)
+        if key not in memo:
+            memo[key] = _run_preprocessor(func, text)
+        yield from memo[key]
 
-        regions = func(text)
 
-        if regions is None:
-            continue
+def _run_preprocessor(func, text):
+    regions = func(text)
 
-        for region in regions:
-            if region is None:
-                continue
+    if regions is None:
+        return []
 
-            start, end = region
+    result = []
+    for region in regions:
+        if region is None:
+            continue
 
-            if start == end:
-                continue
+        start, end = region
+
+        if start == end:
+            continue
 
-            yield start, end
+        result.append((start, end))
+    return result
 
 
 def _apply_postprocessors(m, category, funcs, contexts):
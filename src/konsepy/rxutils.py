@@ -1,6 +1,23 @@
 import re
+from contextlib import contextmanager
+from re import _constants as sre_constants, _parser as sre_parse
 from typing import Dict, List, Union
 
+from loguru import logger
+
+try:
+    import regex
+except ImportError:  # pragma: no cover - optional dependency
+    regex = None
+try:
+    import re2
+except ImportError:  # pragma: no cover - optional dependency
+    re2 = None
+
+REGEX_BACKENDS = ('re', 'regex', 're2')
+_default_backend = 're'
+_NAMED_GROUP_RX = re.compile(r'\(\?P<(?P<name>[a-zA-Z_][a-zA-Z0-9_]*)>')
+
 
 class KonsepyMatch:
     """Wrapper for re.Match that handles duplicate named groups."""
@@ -95,16 +112,109 @@ class KonsepyMatch:
         return self.__str__()
 
 
+class FrozenMatch:
+    """Detached snapshot of a match's spans and groups.
+
+    Supports the subset of the `re.Match` API used by konsepy outputs (group, groupdict, start, end, span).
+    Group text is sliced lazily from `string`, so a snapshot can be rebound to an identical note.
+    """
+
+    def __init__(self, string: str, spans: List, names: Dict[str, int]):
+        self.string = string
+        self._spans = spans  # (start, end) or None, by group index
+        self._names = names  # group name -> group index
+
+    @classmethod
+    def from_match(cls, m, string=None):
+        """Snapshot any match-like object (including `KonsepyMatch`), collapsing duplicate names."""
+        spans = []
+        for i in range(len(m.groups()) + 1):
+            span = m.span(i)
+            spans.append(None if span[0] == -1 else tuple(span))
+        names = {}
+        for name in m.groupdict():
+            span = m.span(name)
+            if span[0] == -1:
+                names[name] = None
+                continue
+            names[name] = len(spans)
+            spans.append(tuple(span))
+        return cls(m.string if string is None else string, spans, names)
+
+    def to_data(self):
+        return {'spans': self._spans, 'names': self._names}
+
+    @classmethod
+    def from_data(cls, string, data):
+        return cls(string, [tuple(span) if span else None for span in data['spans']], data['names'])
+
+    def rebind(self, string, convert_span):
+        """Return a copy over `string` with each span mapped by `convert_span((start, end))`."""
+        return FrozenMatch(string, [None if span is None else convert_span(span) for span in self._spans],
+                           self._names)
+
+    def _index(self, group):
+        return self._names[group] if isinstance(group, str) else group
+
+    def _span(self, group):
+        index = self._index(group)
+        return None if index is None else self._spans[index]
+
+    def group(self, *args):
+        if not args:
+            args = (0,)
+        results = []
+        for arg in args:
+            span = self._span(arg)
+            results.append(None if span is None else self.string[span[0]:span[1]])
+        if len(results) == 1:
+            return results[0]
+        return tuple(results)
+
+    def __getitem__(self, group):
+        return self.group(group)
+
+    def groups(self, default=None):
+        group_count = len(self._spans) - sum(1 for index in self._names.values() if index is not None)
+        return tuple(default if (value := self.group(i)) is None else value for i in range(1, group_count))
+
+    def groupdict(self, default=None):
+        return {name: default if (value := self.group(name)) is None else value for name in self._names}
+
+    def start(self, group=0):
+        span = self._span(group)
+        return -1 if span is None else span[0]
+
+    def end(self, group=0):
+        span = self._span(group)
+        return -1 if span is None else span[1]
+
+    def span(self, group=0):
+        span = self._span(group)
+        return (-1, -1) if span is None else span
+
+    def __str__(self):
+        return f'FrozenMatch(match={self.group(0)!r}, span={self.span()!r})'
+
+    def __repr__(self):
+        return self.__str__()
+
+
 class KonsepyRegex:
     """Wrapper for compiled regex that handles optional duplicate named groups."""
 
-    def __init__(self, pattern: Union[str, re.Pattern], flags: int = 0, allow_dupe_names: bool = True):
+    def __init__(self, pattern: Union[str, re.Pattern], flags: int = 0, allow_dupe_names: bool = True,
+                 anchors=None, compiler=re.compile):
+        """
+        compiler: function(pattern, flags) used to compile the (renamed) pattern
+        """
+        self.anchors = list(anchors) if anchors else None  # literals, one of which occurs in every match
         self._original_pattern = pattern.pattern if isinstance(pattern, re.Pattern) else pattern
         self._flags = flags
         self._group_mapping = {}
         if allow_dupe_names and isinstance(pattern, str):
             # find all (?P<name>...)
-            named_group_re = re.compile(r'\(\?P<(?P<name>[a-zA-Z_][a-zA-Z0-9_]*)>')
+            named_group_re = _NAMED_GROUP_RX
 
             group_counts = {}
 
@@ -126,7 +236,7 @@ class KonsepyRegex:
             pattern = named_group_re.sub(rename_match, pattern)
 
         if isinstance(pattern, str):
-            self._pattern = re.compile(pattern, flags)
+            self._pattern = compiler(pattern, flags)
         else:
             self._pattern = pattern
 
@@ -177,14 +287,158 @@ class KonsepyRegex:
         )
 
 
-def rx_compile(pattern: str, flags: int = 0) -> KonsepyRegex:
+def rx_compile(pattern: str, flags: int = 0, anchors=None, *, backend=None, timeout=None):
     r"""
     Compile a regex pattern, allowing duplicate named groups in alternation branches.
 
+    anchors: optional literals of which at least one appears in every match (see `konsepy.anchors`);
+        by default, these are extracted from the pattern
+    backend: regex engine (default: see `use_regex_backend`)
+        * `re`: standard library; duplicate names are renamed and matches wrapped in `KonsepyMatch`
+        * `regex`: third-party `regex` module; duplicate names are supported natively (no wrapper), and
+          `timeout` (seconds) raises `TimeoutError` rather than backtracking indefinitely
+        * `re2`: linear-time RE2 binding; patterns RE2 cannot run with identical semantics (e.g., lookarounds,
+          backreferences, unicode `\w`/`\b` without `re.ASCII`) fall back to `re`
+
     Example:
         compile_pattern_allow_dupe_names(r'(?:score: (?P<val>\d+)|results: (?P<val>\d+))')
     """
-    return KonsepyRegex(pattern, flags=flags, allow_dupe_names=True)
+    backend = backend or _default_backend
+    if backend == 're':
+        return KonsepyRegex(pattern, flags=flags, allow_dupe_names=True, anchors=anchors)
+    elif backend == 'regex':
+        if regex is None:
+            raise ImportError('The `regex` backend requires regex to be installed.')
+        compiled = regex.compile(pattern, _get_regex_flags(flags))
+        if anchors or timeout is not None:
+            return BackendRegex(compiled, anchors=anchors, timeout=timeout)
+        return compiled
+    elif backend == 're2':
+        if re2 is None:
+            raise ImportError('The `re2` backend requires re2 to be installed.')
+        if (prefix := _get_re2_prefix(pattern, flags)) is None:
+            logger.debug(f'Unable to run pattern with re2, falling back to re: {pattern!r}')
+            return KonsepyRegex(pattern, flags=flags, allow_dupe_names=True, anchors=anchors)
+        try:
+            return KonsepyRegex(pattern, flags=flags, allow_dupe_names=True, anchors=anchors,
+                                compiler=lambda p, _: re2.compile(prefix + p))
+        except Exception as e:  # bindings raise their own error types
+            logger.debug(f'Unable to compile pattern with re2 ({e}), falling back to re: {pattern!r}')
+            return KonsepyRegex(pattern, flags=flags, allow_dupe_names=True, anchors=anchors)
+    raise ValueError(f'Unrecognized regex backend: {backend} (expected one of: {", ".join(REGEX_BACKENDS)}).')
+
+
+@contextmanager
+def use_regex_backend(backend):
+    """
+    Make `backend` (if not None) the default for `rx_compile` while in this context.
+
+    Only patterns compiled inside the context are affected: concept modules compile their regexes when first
+    imported, so a concept already imported (e.g., by an earlier engine in the same process) keeps its backend.
+    """
+    global _default_backend
+    backend = backend or _default_backend
+    if backend not in REGEX_BACKENDS:
+        raise ValueError(f'Unrecognized regex backend: {backend} (expected one of: {", ".join(REGEX_BACKENDS)}).')
+    previous = _default_backend
+    _default_backend = backend
+    try:
+        yield backend
+    finally:
+        _default_backend = previous
+
+
+_REGEX_FLAG_NAMES = ('ASCII', 'DEBUG', 'IGNORECASE', 'LOCALE', 'MULTILINE', 'DOTALL', 'UNICODE', 'VERBOSE')
+
+
+def _get_regex_flags(flags):
+    """Translate `re` flags to `regex` flags by name; the values differ (e.g., `re.ASCII` is `regex.V1`)."""
+    result = 0
+    for name in _REGEX_FLAG_NAMES:
+        if flags & getattr(re, name):
+            result |= getattr(regex, name)
+    return result
+
+
+_RE2_INLINE_FLAGS = {re.IGNORECASE: 'i', re.MULTILINE: 'm', re.DOTALL: 's'}
+_RE2_UNSUPPORTED_OPS = {
+    sre_constants.ASSERT, sre_constants.ASSERT_NOT, sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS,
+    sre_constants.ATOMIC_GROUP, sre_constants.POSSESSIVE_REPEAT,
+}
+
+
+def _get_re2_prefix(pattern, flags):
+    """Return inline flag prefix to run `pattern` under re2, or None if re2 semantics would differ."""
+    if not isinstance(pattern, str):
+        return None
+    try:
+        parsed = sre_parse.parse(_NAMED_GROUP_RX.sub('(', pattern), flags)
+    except re.error:
+        return None
+    flags = parsed.state.flags
+    is_ascii = bool(flags & re.ASCII)
+    if flags & (re.VERBOSE | re.LOCALE):
+        return None
+    if not _re2_compatible(parsed, is_ascii, multiline=bool(flags & re.MULTILINE)):
+        return None
+    letters = ''.join(letter for flag, letter in _RE2_INLINE_FLAGS.items() if flags & flag)
+    return f'(?{letters})' if letters else ''
+
+
+def _re2_compatible(subpattern, is_ascii, multiline=False):
+    for op, av in subpattern:
+        if op in _RE2_UNSUPPORTED_OPS:
+            return False
+        if op is sre_constants.AT:
+            if av in (sre_constants.AT_BOUNDARY, sre_constants.AT_NON_BOUNDARY) and not is_ascii:
+                return False  # re2 word boundaries are ascii-only
+            if av is sre_constants.AT_END and not multiline:
+                return False  # re's `$` also matches before a final newline
+        if op is sre_constants.IN:
+            if not is_ascii and any(item_op is sre_constants.CATEGORY for item_op, _ in av):
+                return False
+        elif op is sre_constants.CATEGORY and not is_ascii:
+            return False
+        elif op is sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, p = av
+            if add_flags or del_flags or not _re2_compatible(p, is_ascii, multiline):
+                return False
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            if max(av[0], 0 if av[1] == sre_constants.MAXREPEAT else av[1]) > 1000:
+                return False  # re2 limits counted repetition
+            if not _re2_compatible(av[2], is_ascii, multiline):
+                return False
+        elif op is sre_constants.BRANCH:
+            if not all(_re2_compatible(p, is_ascii, multiline) for p in av[1]):
+                return False
+    return True
+
+
+class BackendRegex:
+    """Thin wrapper around a `regex` pattern to apply a default timeout and/or declared anchors."""
+
+    def __init__(self, pattern, anchors=None, timeout=None):
+        self._pattern = pattern
+        self.anchors = list(anchors) if anchors else None
+        self.timeout = timeout
+
+    def finditer(self, string, pos=None, endpos=None):
+        return self._pattern.finditer(string, pos, endpos, timeout=self.timeout)
+
+    def search(self, string, pos=None, endpos=None):
+        return self._pattern.search(string, pos, endpos, timeout=self.timeout)
+
+    def match(self, string, pos=None, endpos=None):
+        return self._pattern.match(string, pos, endpos, timeout=self.timeout)
+
+    def fullmatch(self, string, pos=None, endpos=None):
+        return self._pattern.fullmatch(string, pos, endpos, timeout=self.timeout)
+
+    def __getattr__(self, name):
+        return getattr(self._pattern, name)
+
+    def __repr__(self):
+        return f'BackendRegex({self._pattern!r}, timeout={self.timeout!r})'
 
 
 class RxType(type):
@@ -0,0 +1,118 @@
+"""
+Rule-based section segmentation.
+
+Header lines are found with a single scan of a compiled lexicon of section headers; each section runs from its
+header to the next header (or the end of the note). Segments are cached per note (see `konsepy.notecache`), so
+any number of regexes, concepts, and preprocessors can ask for sections without re-scanning the note.
+
+Use as a `REGEXES` preprocessor to only search particular sections:
+
+    (re.compile(r'...'), Category.YES, None, in_sections('assessment_and_plan', 'plan'))
+"""
+import re
+
+from konsepy.notecache import note_memo
+
+# section name -> header terms (case-insensitive; spaces match any whitespace)
+DEFAULT_SECTION_HEADERS = {
+    'chief_complaint': ['chief complaint', 'reason for visit', 'cc'],
+    'history_of_present_illness': ['history of present illness', 'hpi'],
+    'past_medical_history': ['past medical history', 'medical history', 'pmh', 'pmhx'],
+    'past_surgical_history': ['past surgical history', 'surgical history', 'psh'],
+    'medications': ['current medications', 'medications', 'meds'],
+    'allergies': ['allergies'],
+    'family_history': ['family history', 'fh', 'fhx'],
+    'social_history': ['social history', 'sh', 'shx'],
+    'review_of_systems': ['review of systems', 'ros'],
+    'physical_exam': ['physical examination', 'physical exam', 'exam', 'pe'],
+    'results': ['results', 'labs', 'laboratory data'],
+    'assessment_and_plan': ['assessment and plan', 'assessment/plan', 'impression and plan', 'a/p', 'a&p'],
+    'assessment': ['assessment', 'impression'],
+    'plan': ['plan'],
+}
+
+
+class SectionSegmenter:
+    """
+    headers: dict of section name -> list of header terms (default: `DEFAULT_SECTION_HEADERS`)
+    require_colon: only treat a term as a header when followed by a colon (otherwise, a term alone
+        on its line is also a header)
+    default_section: name for text preceding the first header; if None, that text is not in any section
+    """
+
+    def __init__(self, headers=None, *, require_colon=False, default_section=None):
+        self.headers = DEFAULT_SECTION_HEADERS if headers is None else headers
+        self.default_section = default_section
+        self._lookup = {}
+        for name, terms in self.headers.items():
+            for term in terms:
+                self._lookup.setdefault(_normalize(term), name)
+        alternatives = '|'.join(
+            r'\s+'.join(re.escape(word) for word in term.split())
+            for term in sorted(self._lookup, key=len, reverse=True)
+        )
+        ending = r':' if require_colon else r'(?::|[ \t]*$)'
+        self._header_rx = re.compile(rf'^[ \t]*(?P<header>{alternatives})[ \t]*{ending}', re.I | re.M)
+
+    def segment(self, text):
+        """Return [(start, end, section_name), ...]; each section begins at its header."""
+        memo = note_memo(text)
+        key = ('sections', self)
+        if key not in memo:
+            memo[key] = self._segment(text)
+        return memo[key]
+
+    def _segment(self, text):
+        headers = [
+            (m.start('header'), self._lookup[_normalize(m.group('header'))])
+            for m in self._header_rx.finditer(text)
+        ]
+        sections = []
+        if self.default_section is not None:
+            end = headers[0][0] if headers else len(text)
+            if end > 0:
+                sections.append((0, end, self.default_section))
+        for i, (start, name) in enumerate(headers):
+            end = headers[i + 1][0] if i + 1 < len(headers) else len(text)
+            sections.append((start, end, name))
+        return sections
+
+    def regions(self, text, names):
+        """Return [(start, end), ...] of sections whose name is in `names`."""
+        return [(start, end) for start, end, name in self.segment(text) if name in names]
+
+    def mask(self, text, names):
+        """Replace text outside of the named sections with spaces (retaining newlines and offsets)."""
+        pieces = []
+        prev = 0
+        for start, end in self.regions(text, names):
+            pieces.append(_BLANK_RX.sub(' ', text[prev:start]))
+            pieces.append(text[start:end])
+            prev = end
+        pieces.append(_BLANK_RX.sub(' ', text[prev:]))
+        return ''.join(pieces)
+
+
+_BLANK_RX = re.compile(r'[^\n]')
+_default_segmenter = None
+
+
+def get_default_segmenter():
+    global _default_segmenter
+    if _default_segmenter is None:
+        _default_segmenter = SectionSegmenter()
+    return _default_segmenter
+
+
+def in_sections(*names, segmenter=None):
+    """Return a `REGEXES` preprocessor restricting the search to the named sections."""
+    names = frozenset(names)
+
+    def preprocessor(text):
+        return (segmenter or get_default_segmenter()).regions(text, names)
+
+    return preprocessor
+
+
+def _normalize(term):
+    return ' '.join(term.lower().split())
@@ -0,0 +1,137 @@
+"""
+Sentence splitting for `corpus2jsonl` and `bio_tag_sentence`.
+
+`sentence_model` is one of:
+* 'rules': a fast rule-based splitter (terminal punctuation, blank lines, and list items) needing no spaCy model
+* 'senter'/'parser': spaCy's `en_core_web_sm` sentence recognizer or dependency parser
+
+Notes are split in batches (`batch_size`) across `n_process` processes.
+"""
+import multiprocessing
+import re
+from dataclasses import dataclass
+
+try:
+    import spacy
+except ImportError:  # pragma: no cover - optional dependency
+    spacy = None
+
+SENTENCE_MODELS = ('senter', 'parser', 'rules')
+
+
+@dataclass(frozen=True)
+class Sentence:
+    text: str
+    start_char: int
+    end_char: int
+    ends_paragraph: bool = False  # followed by a blank line
+
+
+def get_pipeline(sentence_model, spacy_model='en_core_web_sm'):
+    if spacy is None:
+        raise ImportError('get_pipeline requires spacy to be installed.')
+    if sentence_model == 'senter':
+        nlp = spacy.load(spacy_model,
+                         disable=('tok2vec', 'tagger', 'attribute_ruler', 'lemmatizer', 'ner', 'parser'))
+        nlp.enable_pipe('senter')
+    elif sentence_model == 'parser':
+        nlp = spacy.load(spacy_model, disable=('tagger', 'attribute_ruler', 'lemmatizer', 'ner'))
+    else:
+        raise ValueError(f'Unrecognized `sentence_model`: {sentence_model}.')
+    return nlp
+
+
+_BOUNDARY_RX = re.compile(
+    r'(?P<punct>[.!?]+[\'")\]]*)(?=\s)'  # terminal punctuation followed by whitespace
+    r'|\n[ \t]*\n'  # blank line
+    r'|\n(?=[ \t]*(?:[-*•]|\d{1,2}[.)])[ \t])'  # line starting with a list item
+)
+_ABBREVIATION_RX = re.compile(
+    r'(?:\b(?:dr|mr|mrs|ms|st|vs|approx|etc|e\.g|i\.e|no|pt|hx|[a-z]))$',
+    re.I,
+)
+_NEXT_CHAR_RX = re.compile(r'\s*(\S)')
+
+
+def split_sentences(text):
+    """Split text into `Sentence`s with rules; sentences exclude surrounding whitespace."""
+    cuts = [0]
+    for m in _BOUNDARY_RX.finditer(text):
+        if m.group('punct'):
+            if m.group('punct').startswith('.'):
+                if _ABBREVIATION_RX.search(text, max(0, m.start() - 6), m.start()):
+                    continue
+                following = _NEXT_CHAR_RX.match(text, m.end())
+                if following and following.group(1).islower():  # e.g., 'q.d. daily'
+                    continue
+            cuts.append(m.end())
+        else:
+            cuts.append(m.start())
+    cuts.append(len(text))
+    sentences = []
+    for start, end in zip(cuts, cuts[1:]):
+        segment = text[start:end]
+        stripped = segment.strip()
+        if not stripped:
+            continue
+        start += len(segment) - len(segment.lstrip())
+        end = start + len(stripped)
+        if sentences:
+            sentences[-1] = _with_following_whitespace(sentences[-1], text[sentences[-1].end_char:start])
+        sentences.append(Sentence(stripped, start, end))
+    if sentences:
+        sentences[-1] = _with_following_whitespace(sentences[-1], text[sentences[-1].end_char:])
+    return sentences
+
+
+def _with_following_whitespace(sentence, whitespace):
+    if whitespace.count('\n') > 1:
+        return Sentence(sentence.text, sentence.start_char, sentence.end_char, True)
+    return sentence
+
+
+def _spacy_sentences(doc):
+    return [
+        Sentence(
+            str(sent), sent.start_char, sent.end_char,
+            # spaCy keeps the whitespace following a sentence as its final token
+            sent[-1].is_space and sent[-1].text.count('\n') > 1,
+        )
+        for sent in doc.sents
+    ]
+
+
+def iter_sentences(items, sentence_model='senter', *, batch_size=256, n_process=1, spacy_model='en_core_web_sm'):
+    """
+    Split the text of each (text, context) pair in `items` into sentences.
+
+    Yield: (list of `Sentence`, context) in input order
+    """
+    if sentence_model == 'rules':
+        yield from _iter_rule_sentences(items, batch_size=batch_size, n_process=n_process)
+        return
+    nlp = get_pipeline(sentence_model, spacy_model)
+    for doc, context in nlp.pipe(items, as_tuples=True, batch_size=batch_size, n_process=n_process):
+        yield _spacy_sentences(doc), context
+
+
+def _iter_rule_sentences(items, *, batch_size, n_process):
+    if not n_process or n_process <= 1:
+        for text, context in items:
+            yield split_sentences(text), context
+        return
+    with multiprocessing.get_context('spawn').Pool(n_process) as pool:
+        for chunk in _iter_chunks(items, batch_size * n_process):
+            results = pool.map(split_sentences, [text for text, _ in chunk], chunksize=batch_size)
+            yield from zip(results, (context for _, context in chunk))
+
+
+def _iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,112 @@
+"""
+Bounded-memory collection of snippets (e.g., text from notes in which no category was found).
+"""
+import random
+
+
+class SnippetCounter:
+    """
+    Approximate `Counter` of snippets with bounded memory.
+
+    Frequent snippets are tracked with the space-saving algorithm: at most `capacity` snippets are retained, and
+    when a new snippet arrives while full, it replaces the least frequent one (inheriting its count as error).
+    Reported counts are therefore upper bounds, exact for any snippet that was never evicted, and any snippet
+    occurring more than `total / capacity` times is guaranteed to be retained.
+
+    Rare snippets (which space-saving tends to churn) are represented by a uniform reservoir sample of
+    `sample_size` observations.
+
+    Snippets longer than `max_length` characters are truncated before counting (so snippets sharing a prefix are
+    counted together), which bounds memory at roughly `(capacity + sample_size) * max_length` characters.
+    """
+
+    def __init__(self, capacity=10_000, sample_size=None, seed=None, max_length=None):
+        if capacity < 1:
+            raise ValueError(f'Capacity must be positive: {capacity}')
+        self.capacity = capacity
+        self.max_length = max_length
+        self.sample_size = capacity // 10 if sample_size is None else sample_size
+        self.total = 0
+        self._counts = {}  # snippet -> count
+        self._errors = {}  # snippet -> overestimate inherited on insertion
+        self._buckets = {}  # count -> {snippet: None}, insertion-ordered
+        self._min_count = 0
+        self._sample = []
+        self._random = random.Random(seed)
+
+    def update(self, snippets):
+        """Count each snippet (same call as `Counter.update` with an iterable)."""
+        for snippet in snippets:
+            self.add(snippet)
+
+    def add(self, snippet):
+        if self.max_length is not None:
+            snippet = snippet[:self.max_length]
+        self.total += 1
+        self._add_to_sample(snippet)
+        if snippet in self._counts:
+            self._increment(snippet)
+        elif len(self._counts) < self.capacity:
+            self._counts[snippet] = 1
+            self._errors[snippet] = 0
+            self._buckets.setdefault(1, {})[snippet] = None
+            self._min_count = 1
+        else:
+            self._replace_min(snippet)
+
+    def _increment(self, snippet):
+        count = self._counts[snippet]
+        bucket = self._buckets[count]
+        del bucket[snippet]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = count + 1
+        self._counts[snippet] = count + 1
+        self._buckets.setdefault(count + 1, {})[snippet] = None
+
+    def _replace_min(self, snippet):
+        bucket = self._buckets[self._min_count]
+        evicted = next(iter(bucket))  # oldest among the least frequent
+        del self._counts[evicted]
+        del self._errors[evicted]
+        del bucket[evicted]
+        count = self._min_count + 1
+        self._counts[snippet] = count
+        self._errors[snippet] = self._min_count
+        self._buckets.setdefault(count, {})[snippet] = None
+        if not bucket:
+            del self._buckets[self._min_count]
+            self._min_count = count
+
+    def _add_to_sample(self, snippet):
+        if self.sample_size <= 0:
+            return
+        if len(self._sample) < self.sample_size:
+            self._sample.append(snippet)
+        else:
+            index = self._random.randrange(self.total)
+            if index < self.sample_size:
+                self._sample[index] = snippet
+
+    def __getitem__(self, snippet):
+        return self._counts.get(snippet, 0)
+
+    def __contains__(self, snippet):
+        return snippet in self._counts
+
+    def __len__(self):
+        return len(self._counts)
+
+    def error(self, snippet):
+        """Maximum overestimate of a snippet's count."""
+        return self._errors.get(snippet, 0)
+
+    def most_common(self, n=None):
+        """Return: [(snippet, count), ...] ranked by (estimated) count, as for `Counter.most_common`."""
+        ranked = sorted(self._counts.items(), key=lambda x: -x[1])
+        return ranked if n is None else ranked[:n]
+
+    def sample(self):
+        """Uniform sample of observed snippets (with repeats), capturing the long tail."""
+        return list(self._sample)
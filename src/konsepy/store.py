@@ -0,0 +1,182 @@
+"""
+Persistent store of per-note concept results written by `run_all`.
+
+The store records the source hash of each concept (see `ConceptImport.source_hash`), which notes have been
+processed, and the results for each (note, concept). A later run can carry forward results for unchanged
+concepts and previously-seen notes, and regenerate the summary outputs from the combined store.
+"""
+import json
+import shutil
+import sqlite3
+from pathlib import Path
+
+from loguru import logger
+
+from konsepy.results import ExtractionResult, get_result_label
+from konsepy.watermark import Watermark
+
+RUN_STORE_NAME = 'run_store.db'
+
+
+class RunStore:
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._connection = sqlite3.connect(self.path)
+        self._connection.executescript(
+            '''
+            CREATE TABLE IF NOT EXISTS concepts (
+                name TEXT PRIMARY KEY,
+                source_hash TEXT NOT NULL,
+                position INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS notes (
+                studyid TEXT NOT NULL,
+                note_id TEXT NOT NULL,
+                note_date TEXT,
+                note_hash TEXT,
+                position INTEGER NOT NULL,
+                PRIMARY KEY (studyid, note_id)
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY,
+                studyid TEXT NOT NULL,
+                note_id TEXT NOT NULL,
+                concept TEXT NOT NULL,
+                output TEXT NOT NULL,
+                categories TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS results_concept ON results (concept);
+            CREATE INDEX IF NOT EXISTS results_note ON results (studyid, note_id);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            '''
+        )
+
+    @classmethod
+    def from_previous(cls, previous, path):
+        """Seed a new store at `path` from a previous run directory or store file."""
+        previous = Path(previous)
+        if previous.is_dir():
+            previous = previous / RUN_STORE_NAME
+        if not previous.exists():
+            raise FileNotFoundError(f'Unable to find previous run store: {previous}')
+        shutil.copyfile(previous, path)
+        logger.info(f'Seeded run store from {previous}.')
+        return cls(path)
+
+    def concept_hashes(self):
+        return dict(self._connection.execute('SELECT name, source_hash FROM concepts'))
+
+    def update_concepts(self, concepts):
+        """Record current concept hashes, dropping stored results for any concept that changed.
+
+        Return: names of concepts that must be recomputed for every note.
+        """
+        previous = self.concept_hashes()
+        changed = set()
+        for position, concept in enumerate(concepts):
+            if previous.get(concept.name) != concept.source_hash:
+                changed.add(concept.name)
+                self._connection.execute('DELETE FROM results WHERE concept = ?', (concept.name,))
+            self._connection.execute(
+                'INSERT OR REPLACE INTO concepts (name, source_hash, position) VALUES (?, ?, ?)',
+                (concept.name, concept.source_hash, position),
+            )
+        self._connection.commit()
+        return changed
+
+    def known_notes(self):
+        """Return: {(studyid, note_id): note_hash} for every processed note."""
+        return {(studyid, note_id): note_hash for studyid, note_id, note_hash in self._connection.execute(
+            'SELECT studyid, note_id, note_hash FROM notes'
+        )}
+
+    def add_note(self, studyid, note_id, note_date, note_hash=None):
+        """Record a processed note; notes keep the position in which they were first seen."""
+        self._connection.execute(
+            'INSERT INTO notes (studyid, note_id, note_date, note_hash, position)'
+            ' VALUES (?, ?, ?, ?, (SELECT COUNT(*) FROM notes))'
+            ' ON CONFLICT (studyid, note_id) DO UPDATE SET note_date = excluded.note_date,'
+            ' note_hash = excluded.note_hash',
+            (str(studyid), str(note_id), None if note_date is None else str(note_date), note_hash),
+        )
+
+    def drop_note(self, studyid, note_id):
+        """Remove stored results for a note (e.g., when its text has changed)."""
+        self._connection.execute(
+            'DELETE FROM results WHERE studyid = ? AND note_id = ?', (str(studyid), str(note_id))
+        )
+
+    def load_watermark(self, field):
+        """Return a `Watermark` on `field` as of the last run which saved one."""
+        if field == 'hash':
+            return Watermark(field, seen_hashes={
+                note_hash for note_hash, in self._connection.execute('SELECT note_hash FROM notes') if note_hash
+            })
+        row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (f'watermark_{field}',)).fetchone()
+        return Watermark(field, value=json.loads(row[0]) if row else None)
+
+    def save_watermark(self, watermark):
+        if watermark.field == 'hash':
+            return  # seen hashes are recorded with each note
+        self._connection.execute(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+            (f'watermark_{watermark.field}', json.dumps(watermark.value, default=str)),
+        )
+
+    def add_result(self, studyid, note_id, concept_name, output, categories):
+        """Store a single output.jsonl row along with its categories (labels and extracted values)."""
+        self._connection.execute(
+            'INSERT INTO results (studyid, note_id, concept, output, categories) VALUES (?, ?, ?, ?, ?)',
+            (str(studyid), str(note_id), concept_name, output, _dump_categories(categories)),
+        )
+
+    def iter_results(self, concept_names=None):
+        """Yield (studyid, note_id, concept, output, categories) by note, then concept, as in a full run."""
+        for studyid, note_id, concept, output, categories in self._connection.execute(
+                'SELECT r.studyid, r.note_id, r.concept, r.output, r.categories FROM results r'
+                ' JOIN notes n ON n.studyid = r.studyid AND n.note_id = r.note_id'
+                ' JOIN concepts c ON c.name = r.concept'
+                ' ORDER BY n.position, c.position, r.id'
+        ):
+            if concept_names is not None and concept not in concept_names:
+                continue
+            yield studyid, note_id, concept, output, _load_categories(categories)
+
+    def commit(self):
+        self._connection.commit()
+
+    def close(self):
+        self._connection.commit()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _dump_categories(categories):
+    data = []
+    for category in categories:
+        label = str(get_result_label(category))
+        if isinstance(category, ExtractionResult):
+            data.append({'label': label, 'value': category.value, 'group': category.group})
+        else:
+            data.append({'label': label})
+    return json.dumps(data, default=str)
+
+
+def _load_categories(value):
+    """Categories are restored by label name, which is sufficient for `extract_categories`/`output_results`."""
+    categories = []
+    for data in json.loads(value):
+        if 'value' in data:
+            categories.append(ExtractionResult(label=data['label'], value=data['value'], group=data['group']))
+        else:
+            categories.append(data['label'])
+    return categories
@@ -31,11 +31,12 @@ def iterate_csv_file(input_files, *, start_after=0, stop_after=None,
                      id_label=ID_LABEL, noteid_label=NOTEID_LABEL,
                      notedate_label=NOTEDATE_LABEL, notetext_label=NOTETEXT_LABEL,
                      noteorder_label=None, metadata_labels=None,
-                     select_probability=1.0, encoding='latin1'):
+                     select_probability=1.0, encoding='latin1', watermark=None):
     """
     Return count, mrn, note_id, text for each row in csv file
 
     count: auto-incremented for each record
+    watermark: optional `Watermark` on `note_id`/`note_date`; rows it excludes are skipped by the reader
     """
     count = 0
     total_count = 0
@@ -62,7 +63,7 @@ def iterate_csv_file(input_files, *, start_after=0, stop_after=None,
         for mrn, text, note_id, date, md in _deline_lines(
                 func, input_file, encoding, id_label, noteid_label,
                 notedate_label, notetext_label, noteorder_label,
-                metadata_labels):
+                metadata_labels, watermark=watermark):
             if select_probability < 1.0 and random.random() > select_probability:
                 continue
             total_count += 1
@@ -76,15 +77,17 @@ def iterate_csv_file(input_files, *, start_after=0, stop_after=None,
 
 def _deline_lines(func, input_file, encoding, mrn_label, noteid_label,
                   notedate_label, notetext_label, noteorder_label=None,
-                  metadata_labels=None):
+                  metadata_labels=None, watermark=None):
     # variables for delining notes
     curr_id = None
     curr_mrn = None
     curr_date = None
     curr_doc = []
+    if watermark is not None and not watermark.filters_source:
+        watermark = None
     for mrn, text, note_id, date, order, md in func(
             input_file, encoding, mrn_label, noteid_label, notedate_label,
-            notetext_label, noteorder_label, metadata_labels,
+            notetext_label, noteorder_label, metadata_labels, watermark=watermark,
     ):
         if not order:  # skip delining
             yield mrn, text, note_id, date, md
@@ -108,7 +111,7 @@ def _deline_lines(func, input_file, encoding, mrn_label, noteid_label,
 
 def _extract_sas_file(input_file, encoding, id_label, noteid_label,
                       notedate_label, notetext_label, noteorder_label=None,
-                      metadata_labels=None):
+                      metadata_labels=None, watermark=None):
     from sas7bdat import SAS7BDAT
     with SAS7BDAT(input_file, skip_header=False, encoding=encoding) as fh:
         header = []
@@ -116,9 +119,11 @@ def _extract_sas_file(input_file, encoding, id_label, noteid_label,
             if not header:
                 header = row
                 continue
-            mrn = row[header.index(id_label)]
             date = row[header.index(notedate_label)] if notedate_label and notedate_label in header else ''
             noteid = row[header.index(noteid_label)]
+            if watermark and not watermark.include_row(noteid, date):
+                continue
+            mrn = row[header.index(id_label)]
             text = row[header.index(notetext_label)]
             order = row[header.index(noteorder_label)] if noteorder_label and noteorder_label in header else None
             metadata = {}
@@ -129,13 +134,15 @@ def _extract_sas_file(input_file, encoding, id_label, noteid_label,
 
 
 def _extract_csv_file(input_file, encoding, id_label, noteid_label, notedate_label,
-                      notetext_label, noteorder_label=None, metadata_labels=None):
+                      notetext_label, noteorder_label=None, metadata_labels=None, watermark=None):
     with open(input_file, newline='', encoding=encoding) as fh:
         for row in DictReaderInsensitive(fh):
-            text = row[notetext_label]
-            mrn = row[id_label]
             date = row.get(notedate_label, '')
             note_id = row[noteid_label]
+            if watermark and not watermark.include_row(note_id, date):
+                continue
+            text = row[notetext_label]
+            mrn = row[id_label]
             order = row.get(noteorder_label, '')
             metadata = {}
             if metadata_labels:
@@ -145,14 +152,16 @@ def _extract_csv_file(input_file, encoding, id_label, noteid_label, notedate_lab
 
 
 def _extract_jsonl_file(input_file, encoding, id_label, noteid_label, notedate_label,
-                        notetext_label, noteorder_label=None, metadata_labels=None):
+                        notetext_label, noteorder_label=None, metadata_labels=None, watermark=None):
     with open(input_file, encoding=encoding) as fh:
         for line in fh:
             data = json.loads(line.strip())
-            text = data[notetext_label]
-            mrn = data[id_label]
             date = data.get(notedate_label, '')
             note_id = data[noteid_label]
+            if watermark and not watermark.include_row(note_id, date):
+                continue
+            text = data[notetext_label]
+            mrn = data[id_label]
             order = data.get(noteorder_label, '')
             metadata = {}
             if metadata_labels:
@@ -163,7 +172,7 @@ def _extract_jsonl_file(input_file, encoding, id_label, noteid_label, notedate_l
 
 def _extract_sqlite_file(input_file, encoding, id_label, noteid_label, notedate_label,
                          notetext_label, noteorder_label=None, metadata_labels=None,
-                         tablename='notes'):
+                         tablename='notes', watermark=None):
     with sqlite3.connect(input_file) as connection:
         connection.row_factory = sqlite3.Row
 
@@ -177,6 +186,11 @@ def _extract_sqlite_file(input_file, encoding, id_label, noteid_label, notedate_
 
         column_sql = ', '.join(f'"{column}"' for column in columns)
         query = f'SELECT {column_sql} FROM "{tablename}"'
+        if watermark:  # filter at the source so historical notes are never read
+            # compare as `Watermark` does (e.g., numeric ids stored as TEXT) rather than with sqlite's `>`
+            connection.create_function('beyond_watermark', 1, watermark.includes_value, deterministic=True)
+            watermark_column = noteid_label if watermark.field == 'note_id' else notedate_label
+            query += f' WHERE beyond_watermark("{watermark_column}")'
 
         for row in connection.execute(query):
             text = row[notetext_label]
@@ -203,6 +217,12 @@ def output_results(outdir, *, not_found_text=None,
             writer.writerow(['count', 'snippet'])
             for snippet, count in not_found_text.most_common():
                 writer.writerow([count, ' '.join(snippet.split())])
+        if hasattr(not_found_text, 'sample'):  # long tail not retained by a bounded counter
+            with open(outdir / 'snippets_sample.csv', 'w', newline='') as out:
+                writer = csv.writer(out)
+                writer.writerow(['snippet'])
+                for snippet in not_found_text.sample():
+                    writer.writerow([snippet])
 
     with open(outdir / 'category_counts.csv', 'w', newline='') as out:
         writer = csv.writer(out)
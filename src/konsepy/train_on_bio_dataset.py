@@ -1,4 +1,5 @@
 import argparse
+import hashlib
 import inspect
 import json
 from pathlib import Path
@@ -28,43 +29,82 @@ except ImportError:  # pragma: no cover - optional dependency
     np = None
 
 
-def tokenize_adjust_labels(tokenizer, label2id):
+def tokenize_adjust_labels(tokenizer, label2id, *, max_length=512, stride=None, padding=False):
+    """
+    stride: split examples longer than `max_length` tokens into windows overlapping by `stride` tokens
+        (rather than truncating them)
+    padding: False to leave padding to the data collator (dynamic padding), or 'max_length'
+    """
+    kwargs = {'return_overflowing_tokens': True, 'stride': stride} if stride else {}
+
     def _inner_tokenize_adjust_labels(all_samples_per_split):
         """Get values for input_ids, token_type_ids, attention_mask"""
         tokenized_samples = tokenizer(
             all_samples_per_split['tokens'],
             is_split_into_words=True,
-            padding='max_length',
+            padding=padding,
             truncation=True,
-            max_length=512,
+            max_length=max_length,
+            **kwargs,
         )
         # tokenized_samples is not a datasets object so this alone won't work with Trainer API, hence map is used
         # so the new keys [input_ids, labels (after adjustment)]
         # can be added to the datasets dict for each train test validation split
+        # with `stride`, a sample may be split into several windows: `overflow_to_sample_mapping` has its index
+        sample_mapping = tokenized_samples.pop('overflow_to_sample_mapping', None)
         total_adjusted_labels = []
         for k in range(0, len(tokenized_samples['input_ids'])):
-            prev_wid = -1
             word_ids_list = tokenized_samples.word_ids(batch_index=k)
-            existing_label_ids = all_samples_per_split['ner_tags'][k]
-            i = -1
-            adjusted_label_ids = []
-
-            for wid in word_ids_list:
-                if wid is None:
-                    adjusted_label_ids.append(-100)
-                elif wid != prev_wid:
-                    i = i + 1
-                    adjusted_label_ids.append(label2id[existing_label_ids[i]])
-                    prev_wid = wid
-                else:
-                    adjusted_label_ids.append(label2id[existing_label_ids[i]])
-            total_adjusted_labels.append(adjusted_label_ids)
+            existing_label_ids = all_samples_per_split['ner_tags'][k if sample_mapping is None else sample_mapping[k]]
+            total_adjusted_labels.append([
+                -100 if wid is None else label2id[existing_label_ids[wid]]
+                for wid in word_ids_list
+            ])
         tokenized_samples['labels'] = total_adjusted_labels
         return tokenized_samples
 
     return _inner_tokenize_adjust_labels
 
 
+def _tokenized_cache_key(dataset, tokenizer, label2id, **options):
+    """Hash of the dataset fingerprints, tokenizer (name and vocabulary), labels, and tokenization options."""
+    vocab = json.dumps(tokenizer.get_vocab(), sort_keys=True)
+    data = {
+        'fingerprints': {split: dataset[split]._fingerprint for split in sorted(dataset)},
+        'tokenizer': [type(tokenizer).__name__, tokenizer.name_or_path, hashlib.md5(vocab.encode('utf8')).hexdigest()],
+        'label2id': label2id,
+        'options': options,
+    }
+    return hashlib.md5(json.dumps(data, sort_keys=True).encode('utf8')).hexdigest()
+
+
+def tokenize_dataset(dataset, tokenizer, label2id, *, max_length=512, stride=None, padding=False,
+                     cache_dir: Path = None):
+    """
+    Tokenize and align labels for every split of `dataset`.
+
+    cache_dir: if set, the tokenized dataset is saved here keyed on the dataset fingerprints, tokenizer,
+        labels, and options, and re-used by later runs
+    """
+    cache_path = None
+    if cache_dir is not None:
+        key = _tokenized_cache_key(dataset, tokenizer, label2id,
+                                   max_length=max_length, stride=stride, padding=padding)
+        cache_path = cache_dir / key
+        if cache_path.exists():
+            logger.info(f'Loading tokenized dataset from cache: {cache_path}')
+            return DatasetDict.load_from_disk(cache_path)
+    tokenized_dataset = dataset.map(
+        tokenize_adjust_labels(tokenizer, label2id, max_length=max_length, stride=stride, padding=padding),
+        batched=True,
+        remove_columns=dataset['train'].column_names,  # windows change the number of rows
+    )
+    if cache_path is not None:
+        tokenized_dataset.save_to_disk(cache_path)
+        logger.info(f'Cached tokenized dataset: {cache_path}')
+    return tokenized_dataset
+
+
 def compute_metrics(p, id2label):
     if evaluate is None:
         raise ImportError('train_on_bio_dataset requires evaluate to be installed.')
@@ -98,23 +138,40 @@ def compute_metrics(p, id2label):
 
 
 def train_on_bio_dataset(dataset_path: Path, outpath: Path, run_name: str, pretrained_tokenizer: str = None,
-                         pretrained_model: str = 'emilyalsentzer/Bio_ClinicalBERT', **params):
+                         pretrained_model: str = 'emilyalsentzer/Bio_ClinicalBERT', *, max_length=512,
+                         stride=None, pad_to_max_length=False, tokenized_cache: Path = None, use_cache=True,
+                         **params):
+    """
+    max_length: maximum tokens per training example
+    stride: split examples longer than `max_length` into windows overlapping by `stride` tokens (default: truncate)
+    pad_to_max_length: pad every example to `max_length` (default: pad each batch to its longest example, with
+        batches grouped by length)
+    tokenized_cache: directory caching tokenized datasets (default: `<dataset_path>.tokenized`)
+    use_cache: set False to always re-tokenize
+    """
     if AutoTokenizer is None or TrainingArguments is None or Trainer is None:
         raise ImportError('train_on_bio_dataset requires transformers to be installed.')
     if DatasetDict is None:
         raise ImportError('train_on_bio_dataset requires datasets to be installed.')
     dataset = DatasetDict.load_from_disk(dataset_path)
-    tagset = set([x for doc in dataset['train']['ner_tags'] for x in doc])
+    tagset = sorted(set([x for doc in dataset['train']['ner_tags'] for x in doc]))  # stable ids (and cache keys)
     label2id = {x: i for i, x in enumerate(tagset)}
     id2label = {v: k for k, v in label2id.items()}
     tokenizer = AutoTokenizer.from_pretrained(pretrained_tokenizer or pretrained_model)
 
-    tokenized_dataset = dataset.map(tokenize_adjust_labels(tokenizer, label2id), batched=True)
-    data_collator = DataCollatorForTokenClassification(
-        tokenizer,
-        padding='max_length',
-        max_length=512,
+    if use_cache:
+        tokenized_cache = tokenized_cache or dataset_path.parent / f'{dataset_path.name}.tokenized'
+    tokenized_dataset = tokenize_dataset(
+        dataset, tokenizer, label2id,
+        max_length=max_length,
+        stride=stride,
+        padding='max_length' if pad_to_max_length else False,
+        cache_dir=tokenized_cache if use_cache else None,
     )
+    if pad_to_max_length:
+        data_collator = DataCollatorForTokenClassification(tokenizer, padding='max_length', max_length=max_length)
+    else:
+        data_collator = DataCollatorForTokenClassification(tokenizer, padding='longest')
     model = AutoModelForTokenClassification.from_pretrained(
         pretrained_model,
         num_labels=len(label2id),
@@ -131,6 +188,7 @@ def train_on_bio_dataset(dataset_path: Path, outpath: Path, run_name: str, pretr
                          'weight_decay': 0.01,
                          'logging_steps': 1000,
                          'save_strategy': 'no',
+                         'group_by_length': not pad_to_max_length,
                      } | params
     sig_params = set(inspect.signature(TrainingArguments.__init__).parameters)
     resolved_params = dict(default_params)
@@ -186,10 +244,21 @@ def train_on_bio_dataset_args():
     parser.add_argument('--pretrained-tokenizer', dest='pretrained_tokenizer', type=str,
                         help='Path to tokenizer for model, or to huggingface tokenizer;'
                              ' defaults to same as `pretrained_model`')
+    parser.add_argument('--max-length', type=int, default=512,
+                        help='Maximum tokens per training example.')
+    parser.add_argument('--stride', type=int, default=None,
+                        help='Split examples longer than --max-length into windows overlapping by this many tokens'
+                             ' (default: truncate).')
+    parser.add_argument('--pad-to-max-length', action='store_true', default=False,
+                        help='Pad every example to --max-length rather than to the longest in each batch.')
+    parser.add_argument('--tokenized-cache', type=Path, default=None,
+                        help='Directory caching tokenized datasets (default: `<dataset_path>.tokenized`).')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false', default=True,
+                        help='Always re-tokenize the dataset.')
     parser.add_argument('--param', nargs='*',
                         help='Parameters to supply to `TrainingArguments` in form of `num_train_epochs==50`')
     args = vars(parser.parse_args())
-    params = {x.split('==')[0]: x.split('==')[1] for x in args['param']}
+    params = {x.split('==')[0]: x.split('==')[1] for x in args['param'] or []}
     del args['param']
     train_on_bio_dataset(**args, **params)
 
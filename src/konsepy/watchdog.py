@@ -0,0 +1,157 @@
+"""
+Run concepts in a killable worker process so a single pathological note (e.g., catastrophic backtracking on a
+long run of whitespace) cannot stall a whole run.
+
+The worker reports which concept and regex (index into `REGEXES`) it is running through shared memory. If a
+regex exceeds its time budget, or a note exceeds the per-note budget, the worker is killed and restarted, and
+the note is quarantined (skipped and recorded) rather than retried.
+"""
+import multiprocessing
+import time
+import traceback
+
+from konsepy.anchors import AnchorIndex, use_anchor_index
+from konsepy.annotations import use_annotators
+from konsepy.importer import get_all_concepts
+from konsepy.rxsearch import set_search_progress
+from konsepy.rxutils import FrozenMatch, use_regex_backend
+
+
+class NoteTimeout(Exception):
+    """Raised when a note exceeds its time budget; describes where the worker was stuck."""
+
+    def __init__(self, reason, concept, regex_index, elapsed):
+        super().__init__(f'{reason} timeout in concept {concept} (regex {regex_index}) after {elapsed:.1f}s')
+        self.reason = reason
+        self.concept = concept
+        self.regex_index = regex_index
+        self.elapsed = elapsed
+
+
+class Watchdog:
+    """
+    note_timeout: maximum seconds for all concepts on a single note
+    regex_timeout: maximum seconds for a single regex (including its postprocessors) on a single note
+    """
+
+    def __init__(self, package_name, concept_names, *, note_timeout=None, regex_timeout=None,
+                 regex_backend=None, anchor_index=False, annotators=None, poll_interval=None):
+        if note_timeout is None and regex_timeout is None:
+            raise ValueError('Watchdog requires `note_timeout` and/or `regex_timeout`.')
+        self.package_name = package_name
+        self.concept_names = list(concept_names)
+        self.note_timeout = note_timeout
+        self.regex_timeout = regex_timeout
+        self.regex_backend = regex_backend
+        self.anchor_index = anchor_index
+        self.annotators = annotators
+        self.poll_interval = poll_interval or min(t for t in (note_timeout, regex_timeout) if t) / 20
+        self.restarts = 0
+        self._context = multiprocessing.get_context()
+        self._concept_index = self._context.Value('i', -1, lock=False)
+        self._regex_index = self._context.Value('i', -1, lock=False)
+        self._process = None
+        self._connection = None
+
+    def start(self):
+        parent_connection, child_connection = self._context.Pipe()
+        self._process = self._context.Process(
+            target=_worker_main,
+            args=(child_connection, self._concept_index, self._regex_index,
+                  self.package_name, self.concept_names, self.regex_backend, self.anchor_index,
+                  self.annotators),
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+        self._connection = parent_connection
+
+    def run(self, text, metadata, concepts):
+        """
+        Run concepts on a note in the worker.
+
+        Return: [(categories, matches), ...] in the order of `concepts`
+        Raises: NoteTimeout if a budget was exceeded (the worker is restarted)
+        """
+        if self._process is None:
+            self.start()
+        self._concept_index.value = -1
+        self._regex_index.value = -1
+        self._connection.send((text, metadata, [concept.name for concept in concepts]))
+        started = last_change = time.monotonic()
+        position = (-1, -1)
+        while not self._connection.poll(self.poll_interval):
+            now = time.monotonic()
+            current = (self._concept_index.value, self._regex_index.value)
+            if current != position:
+                position, last_change = current, now
+            if self.regex_timeout is not None and now - last_change > self.regex_timeout:
+                self._restart()
+                raise self._timeout('regex', concepts, position, now - last_change)
+            if self.note_timeout is not None and now - started > self.note_timeout:
+                self._restart()
+                raise self._timeout('note', concepts, position, now - started)
+        status, value = self._connection.recv()
+        if status == 'error':
+            raise RuntimeError(f'Error while running concepts in watchdog worker:\n{value}')
+        return [
+            (categories, None if matches is None else [FrozenMatch.from_data(text, m) for m in matches])
+            for categories, matches in value
+        ]
+
+    @staticmethod
+    def _timeout(reason, concepts, position, elapsed):
+        concept_index, regex_index = position
+        concept = concepts[concept_index].name if 0 <= concept_index < len(concepts) else None
+        return NoteTimeout(reason, concept, regex_index if regex_index >= 0 else None, elapsed)
+
+    def _restart(self):
+        self.restarts += 1
+        self.close()
+        self.start()
+
+    def close(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._connection.close()
+            self._process = None
+            self._connection = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _worker_main(connection, concept_index, regex_index, package_name, concept_names, regex_backend,
+                 anchor_index, annotators):
+    with use_regex_backend(regex_backend):
+        concepts = {concept.name: concept for concept in get_all_concepts(package_name, *concept_names)}
+    set_search_progress(regex_index)
+    with use_anchor_index(AnchorIndex.from_concepts(concepts.values()) if anchor_index else None), \
+            use_annotators(annotators):
+        _worker_loop(connection, concept_index, regex_index, concepts)
+
+
+def _worker_loop(connection, concept_index, regex_index, concepts):
+    while True:
+        try:
+            text, metadata, names = connection.recv()
+        except EOFError:
+            return
+        try:
+            results = []
+            for i, name in enumerate(names):
+                concept_index.value = i
+                regex_index.value = -1
+                categories, matches = concepts[name].run_func(text, include_match=True, **metadata)
+                results.append((
+                    categories,
+                    None if matches is None else [FrozenMatch.from_match(m).to_data() for m in matches],
+                ))
+            connection.send(('ok', results))
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
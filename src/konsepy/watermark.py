@@ -0,0 +1,89 @@
+"""
+Watermarks for ingesting only notes that are new since a previous run of a cumulative extract.
+"""
+import hashlib
+
+
+def hash_note(studyid, note_id, text):
+    return hashlib.sha256(f'{studyid}\0{note_id}\0{text}'.encode('utf8', 'surrogatepass')).hexdigest()
+
+
+def watermark_key(value):
+    """Comparison key so numeric ids compare numerically even when read from text (e.g., csv) sources."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 0, value
+    value = str(value).strip()
+    try:
+        return 0, int(value)
+    except ValueError:
+        return 1, value
+
+
+class Watermark:
+    """
+    Position in a cumulative extract; notes at or below the watermark are skipped.
+
+    field:
+        * `note_id`: skip notes whose id is <= the stored maximum
+        * `note_date`: skip notes dated before the stored maximum; notes on that date are read again, since a
+          later extract may add notes on the same day (`run_all` skips those already in its result store)
+        * the readers in `textio` apply `note_id`/`note_date` watermarks at the source (e.g., in the WHERE
+          clause for sqlite), comparing values as `watermark_key` does
+        * `hash`: skip notes whose (studyid, note_id, text) hash has already been seen
+    value: maximum `note_date`/`note_id` processed so far (None to include all notes)
+    seen_hashes: set of note hashes (see `hash_note`) processed so far
+    """
+    FIELDS = ('note_date', 'note_id', 'hash')
+
+    def __init__(self, field, value=None, seen_hashes=None):
+        if field not in self.FIELDS:
+            raise ValueError(f'Unrecognized watermark field: {field} (expected one of: {", ".join(self.FIELDS)}).')
+        self.field = field
+        self.value = value
+        self.seen_hashes = set(seen_hashes or ())
+        self.start_value = value
+        self.skipped = 0
+
+    @property
+    def filters_source(self):
+        """True if readers can filter rows before the note is built."""
+        return self.field != 'hash' and self.start_value is not None
+
+    def include_row(self, note_id, note_date):
+        """Source-level filter: is this row beyond the watermark (as of the start of the run)?"""
+        if not self.filters_source:
+            return True
+        return self.includes_value(note_id if self.field == 'note_id' else note_date)
+
+    def includes_value(self, value):
+        """Is a row's `note_id`/`note_date` beyond the watermark (as of the start of the run)?"""
+        if value is None or value == '':
+            return True  # unable to place the row, so don't drop it
+        if self.field == 'note_date':  # the boundary date may have gained notes since
+            return watermark_key(value) >= watermark_key(self.start_value)
+        return watermark_key(value) > watermark_key(self.start_value)
+
+    def include_note(self, studyid, note_id, text):
+        """Note-level filter for hash watermarks."""
+        if self.field != 'hash':
+            return True
+        if hash_note(studyid, note_id, text) in self.seen_hashes:
+            self.skipped += 1
+            return False
+        return True
+
+    def observe(self, studyid, note_id, note_date, text):
+        """Advance the watermark past a processed note."""
+        if self.field == 'hash':
+            self.seen_hashes.add(hash_note(studyid, note_id, text))
+            return
+        value = note_id if self.field == 'note_id' else note_date
+        if value is None or value == '':
+            return
+        if self.value is None or watermark_key(value) > watermark_key(self.value):
+            self.value = value
+
+    def __str__(self):
+        if self.field == 'hash':
+            return f'Watermark<hash: {len(self.seen_hashes):,} seen notes>'
+        return f'Watermark<{self.field} {">=" if self.field == "note_date" else ">"} {self.value!r}>'
@@ -0,0 +1,75 @@
+import re
+
+import pytest
+
+from konsepy.anchors import AnchorIndex, get_anchor, use_anchor_index
+from konsepy.run_all import run_all
+from konsepy.rxsearch import search_all_regex
+from konsepy.rxutils import rx_compile
+
+
+@pytest.mark.parametrize('pattern, flags, exp_literals, exp_width', [
+    (r'\bsampo\b', 0, [('sampo', False)], 5),
+    (r'no (?:kantele|harp)s?', 0, [('harp', False), ('kantele', False)], 11),
+    (r'Väinämöinen\w*', re.I, None, None),  # non-ascii case-insensitive literals are not used
+    (r'(?:Ilmarinen|smith)\W+forged', re.I, [('forged', True)], None),
+    (r'\d+kg', 0, None, None),  # too short
+])
+def test_get_anchor(pattern, flags, exp_literals, exp_width):
+    anchor = get_anchor(re.compile(pattern, flags))
+    if exp_literals is None:
+        assert anchor is None
+    else:
+        assert list(anchor.literals) == exp_literals
+        assert anchor.max_width == exp_width
+
+
+def test_get_anchor_uses_declared_anchors():
+    anchor = get_anchor(rx_compile(r'(?:score: (?P<val>\d+)|results: (?P<val>\d+))', anchors=['score', 'results']))
+    assert list(anchor.literals) == [('results', False), ('score', False)]
+
+
+def _search_with_and_without_index(regexes, text, **kwargs):
+    search = search_all_regex(regexes)
+    expected = [(r, m.span()) for r, m in search(text, include_match=True, **kwargs)]
+    index = AnchorIndex(regex for regex, *_ in regexes)
+    with use_anchor_index(index):
+        actual = [(r, m.span()) for r, m in search(text, include_match=True, **kwargs)]
+    return expected, actual, index
+
+
+def test_anchor_index_gives_identical_results():
+    regexes = [
+        (re.compile(r'(?<=old )Väinämöinen'), 'HERO'),
+        (re.compile(r'\bsamp[oa]s?\b', re.I), 'SAMPO'),
+        (re.compile(r'\bpike\b'), 'PIKE'),  # absent
+        (re.compile(r'\w+ forged', re.I), 'FORGED'),
+    ]
+    text = 'The old Väinämöinen sang. Ilmarinen FORGED the ſampo; the Sampo was stolen.'
+
+    expected, actual, index = _search_with_and_without_index(regexes, text)
+
+    assert actual == expected
+    assert ('SAMPO', (47, 52)) in actual  # long s matches 's' when ignoring case
+    assert index.skipped == 1
+
+
+def test_anchor_index_respects_search_regions():
+    def second_sentence(text):
+        yield text.index('.') + 1, len(text)
+
+    regexes = [(re.compile(r'kantele'), 'KANTELE', None, second_sentence)]
+    text = 'A kantele of pike bone. Then a kantele of birch.'
+
+    expected, actual, _ = _search_with_and_without_index(regexes, text)
+
+    assert actual == expected == [('KANTELE', (31, 38))]
+
+
+def test_run_all_with_anchor_index_matches_full_run(tmp_path, datadir):
+    kwargs = dict(id_label='chapter', noteid_label='chapter')
+    expected = run_all([datadir / 'corpus.jsonl'], tmp_path / 'full', 'example_nlp', **kwargs)
+    actual = run_all([datadir / 'corpus.jsonl'], tmp_path / 'anchored', 'example_nlp', anchor_index=True, **kwargs)
+
+    for name in ('output.jsonl', 'category_counts.csv', 'notes_category_counts.csv'):
+        assert (actual / name).read_text(encoding='utf8') == (expected / name).read_text(encoding='utf8')
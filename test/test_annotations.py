@@ -0,0 +1,65 @@
+import datetime
+import re
+from enum import Enum
+
+import pytest
+
+from konsepy.annotations import (Annotation, NoteAnnotations, DEFAULT_ANNOTATORS, find_dates, find_numbers,
+                                 find_scores, get_note_annotations, resolve_annotators, use_annotators)
+from konsepy.rxsearch import search_all_regex
+
+TEXT = ('On 2021-03-04 Väinämöinen rowed 12 km, then on March 9, 2021 carried the 40 kg kantele. '
+        'Pain score: 7/10 on 3/10/2021.')
+
+
+class Journey(Enum):
+    RECENT = 1
+    OLD = 2
+
+
+@pytest.mark.parametrize('annotator, expected', [
+    (find_dates, [datetime.date(2021, 3, 4), datetime.date(2021, 3, 9), datetime.date(2021, 3, 10)]),
+    (find_numbers, [(40.0, 'kg')]),
+    (find_scores, [('pain', 7.0, 10.0)]),
+])
+def test_builtin_annotators(annotator, expected):
+    assert [value for *_, value in annotator(TEXT)] == expected
+
+
+def test_nearest_before_after():
+    annotations = NoteAnnotations(TEXT, DEFAULT_ANNOTATORS)
+    start = TEXT.index('kantele')
+    nearest = annotations.nearest('date', start, start + len('kantele'))
+    assert nearest.value == datetime.date(2021, 3, 9)
+    assert annotations.after('date', start).value == datetime.date(2021, 3, 10)
+    assert annotations.before('date', TEXT.index('March')) == annotations.get('date')[0]
+    assert annotations.nearest('date', start, start + 7, max_distance=10) is None
+    assert annotations.within('number', 0, start) == [Annotation('number', start - 6, start - 1, (40.0, 'kg'))]
+
+
+def test_annotators_run_once_per_note():
+    calls = []
+
+    def find_oars(text):
+        calls.append(text)
+        return [(m.start(), m.end(), None) for m in re.finditer('oar', text)]
+
+    annotators = {'oar': find_oars}
+    for _ in range(3):
+        get_note_annotations('oar and oar', annotators).get('oar')
+    assert len(calls) == 1
+
+
+def test_postprocessors_receive_annotations():
+    def recent(m, annotations, **kwargs):
+        date = annotations.nearest('date', m.start(), m.end())
+        return Journey.RECENT if date and date.value >= datetime.date(2021, 3, 5) else Journey.OLD
+
+    search = search_all_regex([(re.compile(r'rowed|carried'), None, recent)])
+    with use_annotators(resolve_annotators(['date'])):
+        assert list(search(TEXT)) == [Journey.OLD, Journey.RECENT]
+
+
+def test_resolve_annotators_rejects_unknown():
+    with pytest.raises(ValueError):
+        resolve_annotators(['sampo'])
@@ -0,0 +1,127 @@
+import json
+
+import konsepy
+from konsepy.cache import ResultCache
+from konsepy.engine import ProcessingEngine
+from konsepy.importer import get_all_concepts
+from konsepy.run_all_matches import run_all_matches
+
+
+def _write_corpus(path, notes):
+    with open(path, 'w', encoding='utf8') as out:
+        for i, text in enumerate(notes, start=1):
+            out.write(json.dumps({'chapter': str(i), 'notetext': text}) + '\n')
+
+
+def _collect(engine):
+    rows = []
+
+    def callback(studyid, note_id, note_date, text, metadata, concept, categories, matches):
+        rows.append((note_id, concept.name, categories, [(m.group(), m.span(), m.groupdict()) for m in matches]))
+
+    engine.run(callback)
+    return rows
+
+
+def test_result_cache_reuses_results_for_duplicate_notes(tmp_path):
+    corpus_file = tmp_path / 'corpus.jsonl'
+    _write_corpus(corpus_file, [
+        'Score: 123. Results: 456.',
+        'Score: 123. Results: 456.',
+        'Results: 789.',
+    ])
+    kwargs = dict(concepts=['dupe_names'], id_label='chapter', noteid_label='chapter', notetext_label='notetext')
+
+    expected = _collect(ProcessingEngine([corpus_file], 'misc_nlp', **kwargs))
+
+    with ResultCache(tmp_path / 'cache.db') as cache:
+        actual = _collect(ProcessingEngine([corpus_file], 'misc_nlp', result_cache=cache, **kwargs))
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    assert actual == expected
+    assert actual[1][3] == [('Score: 123', (0, 10), {'val': '123'}), ('Results: 456', (12, 24), {'val': '456'})]
+
+
+def test_result_cache_persists_across_runs(tmp_path):
+    corpus_file = tmp_path / 'corpus.jsonl'
+    _write_corpus(corpus_file, ['Score: 7.'])
+    kwargs = dict(concepts=['dupe_names'], id_label='chapter', noteid_label='chapter', notetext_label='notetext')
+
+    _collect(ProcessingEngine([corpus_file], 'misc_nlp', result_cache=tmp_path / 'cache.db', **kwargs))
+    with ResultCache(tmp_path / 'cache.db') as cache:
+        rows = _collect(ProcessingEngine([corpus_file], 'misc_nlp', result_cache=cache, **kwargs))
+        assert cache.hits == 1
+
+    assert rows[0][3] == [('Score: 7', (0, 8), {'val': '7'})]
+
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    with ResultCache(tmp_path / 'cache.db', max_entries=2) as cache:
+        cache.put('aino', '1')
+        cache.put('kullervo', '2')
+        assert cache.get('aino') == '1'
+        cache.put('louhi', '3')
+
+        assert cache.get('kullervo') is None
+        assert cache.get('aino') == '1'
+
+
+def test_run_all_matches_with_result_cache(tmp_path, datadir):
+    kwargs = dict(input_files=[str(datadir / 'corpus.jsonl')], package_name='example_nlp',
+                  id_label='chapter', noteid_label='chapter')
+
+    uncached = run_all_matches(outdir=tmp_path / 'uncached', **kwargs)
+    cached = run_all_matches(outdir=tmp_path / 'cached', **kwargs, result_cache=tmp_path / 'cache.db')
+
+    assert (uncached / 'output.jsonl').read_text(encoding='utf8') == (cached / 'output.jsonl').read_text(
+        encoding='utf8')
+
+
+def test_cache_key_depends_on_engine_options(tmp_path):
+    corpus_file = tmp_path / 'corpus.jsonl'
+    _write_corpus(corpus_file, ['Score: 7.'])
+    kwargs = dict(concepts=['dupe_names'], id_label='chapter', noteid_label='chapter', notetext_label='notetext')
+
+    def sampo_annotator(text):
+        return text.count('7')
+
+    class ConfiguredEngine(ProcessingEngine):
+        def result_options(self):
+            return {'annotators': {'sampo': sampo_annotator}}
+
+    with ResultCache(tmp_path / 'cache.db') as cache:
+        _collect(ProcessingEngine([corpus_file], 'misc_nlp', result_cache=cache, **kwargs))
+        _collect(ConfiguredEngine([corpus_file], 'misc_nlp', result_cache=cache, **kwargs))
+        assert (cache.hits, cache.misses) == (0, 2)
+        _collect(ConfiguredEngine([corpus_file], 'misc_nlp', result_cache=cache, **kwargs))
+        assert cache.hits == 1
+
+
+def test_cache_key_depends_on_annotators(tmp_path):
+    corpus_file = tmp_path / 'corpus.jsonl'
+    _write_corpus(corpus_file, ['Score: 7.'])
+    kwargs = dict(concepts=['dupe_names'], id_label='chapter', noteid_label='chapter', notetext_label='notetext')
+
+    with ResultCache(tmp_path / 'cache.db') as cache:
+        _collect(ProcessingEngine([corpus_file], 'misc_nlp', result_cache=cache, annotators=['score'], **kwargs))
+        _collect(ProcessingEngine([corpus_file], 'misc_nlp', result_cache=cache, annotators=['date'], **kwargs))
+        _collect(ProcessingEngine([corpus_file], 'misc_nlp', result_cache=cache, **kwargs))
+        assert (cache.hits, cache.misses) == (0, 3)
+        _collect(ProcessingEngine([corpus_file], 'misc_nlp', result_cache=cache, annotators=['date'], **kwargs))
+        assert cache.hits == 1
+
+
+def test_source_hash_covers_helper_modules():
+    [concept] = get_all_concepts('example_nlp', 'jealousy')
+
+    assert {'konsepy.rxsearch', 'konsepy.context.negation', 'konsepy.context.other_subject'} <= set(
+        concept.dependency_modules)
+
+
+def test_source_hash_depends_on_konsepy_version(monkeypatch):
+    [concept] = get_all_concepts('example_nlp', 'jealousy')
+    source_hash = concept.source_hash
+    monkeypatch.setattr(konsepy, '__version__', 'kantele')
+    [upgraded] = get_all_concepts('example_nlp', 'jealousy')
+
+    assert upgraded.source_hash != source_hash
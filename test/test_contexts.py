@@ -2,7 +2,7 @@ import re
 
 import pytest
 
-from konsepy.context.contexts import check_if_pattern_after, get_contexts
+from konsepy.context.contexts import check_if_pattern_after, check_if_pattern_around, get_contexts
 
 
 @pytest.mark.parametrize('pattern, word_window, exp_pre, exp_post, exp_around', [
@@ -50,6 +50,23 @@ def test_check_if_pattern_before(saiga_antelope, pattern, pattern2, window, bann
             assert res is None
 
 
+@pytest.mark.parametrize('text, banned_characters, exp', [
+    ('The Sampo was forged. Louhi locked it away.', '.', None),
+    ('The Sampo was forged. Louhi locked it away.', '', 'Sampo'),
+    ('Louhi locked it away. The Sampo was forged.', '.', None),
+    ('The Sampo, Louhi locked it away.', '.', 'Sampo'),
+    ('Louhi locked the Sampo away.', '.', 'Sampo'),
+])
+def test_check_if_pattern_around(text, banned_characters, exp):
+    regex = re.compile('Sampo')
+    m = re.search('locked', text)
+    res = check_if_pattern_around(regex, m, text, window=30, banned_characters=banned_characters)
+    if res:
+        assert res.group() == exp
+    else:
+        assert res is exp
+
+
 @pytest.mark.parametrize('pattern, region_text, window, exp_pre, exp_post, exp_around', [
     (
             'Ilmarinen',
@@ -0,0 +1,92 @@
+import csv
+import json
+import re
+
+import pytest
+
+from konsepy.corpus2jsonl import chunk_sentences, corpus2jsonl, sentence_token_lengths
+from konsepy.sentences import Sentence, split_sentences
+
+NOTE = (
+    'Väinämöinen built a boat. He sang the planks together. Three words were missing.\n\n'
+    'He sought them from Vipunen. The giant swallowed him whole.'
+)
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer: fast (offset mappings for whole texts) or slow (batches of sentences only)."""
+
+    def __init__(self, is_fast=True):
+        self.is_fast = is_fast
+        self.calls = 0
+
+    def __call__(self, texts, add_special_tokens=True, return_offsets_mapping=False, **kwargs):
+        self.calls += 1
+        if return_offsets_mapping:
+            return {'offset_mapping': [[m.span() for m in re.finditer(r'\S+', text)] for text in texts]}
+        return {'input_ids': [text.split() for text in texts]}
+
+
+def _sentences(*lengths, paragraph_ends=()):
+    return [Sentence('', 0, 0, i in paragraph_ends) for i, _ in enumerate(lengths)], list(lengths)
+
+
+@pytest.mark.parametrize('is_fast', [True, False])
+def test_sentence_token_lengths(is_fast):
+    tokenizer = FakeTokenizer(is_fast=is_fast)
+    texts = [NOTE, 'Aino fled. ']
+    sentences = [split_sentences(text) for text in texts]
+    assert sentence_token_lengths(tokenizer, texts, sentences) == [[4, 5, 4, 5, 5], [2]]
+    assert tokenizer.calls == 1
+
+
+@pytest.mark.parametrize('lengths, paragraph_ends, max_seq_length, overlap, expected', [
+    ([3, 3, 3, 3], (), 8, 0, [(0, 2), (2, 4)]),
+    ([3, 3, 3, 3], (), 8, 3, [(0, 2), (1, 3), (2, 4)]),
+    ([2, 10, 2], (), 8, 0, [(0, 1), (1, 2), (2, 3)]),  # long sentence forms its own chunk
+    ([2, 10, 2], (), 8, 3, [(0, 1), (1, 2), (2, 3)]),  # ...and is not repeated as overlap
+    ([1, 1, 1], (0,), 8, 0, [(0, 1), (1, 3)]),  # paragraph end
+    ([10, 10, 10], (0,), 100, 50, [(0, 1), (1, 3)]),  # single-sentence chunk is not repeated as overlap
+    ([1, 1, 1, 1], (1,), 100, 50, [(0, 2), (1, 4)]),  # overlap never repeats the whole chunk
+    ([], (), 8, 0, []),
+])
+def test_chunk_sentences(lengths, paragraph_ends, max_seq_length, overlap, expected):
+    sentences, lengths = _sentences(*lengths, paragraph_ends=paragraph_ends)
+    assert chunk_sentences(sentences, lengths, max_seq_length, overlap) == expected
+
+
+@pytest.fixture
+def notes_file(tmp_path):
+    path = tmp_path / 'notes.csv'
+    with open(path, 'w', newline='', encoding='utf8') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['studyid', 'note_id', 'note_date', 'text'])
+        writer.writerow([1, 1, '2020-01-01', NOTE])
+        writer.writerow([2, 2, '2020-01-02', 'Aino fled. She became a fish.'])
+    return path
+
+
+@pytest.mark.parametrize('split, max_seq_length, expected', [
+    ('sent_chunk', 12, [
+        'Väinämöinen built a boat. He sang the planks together.',
+        'Three words were missing.',
+        'He sought them from Vipunen. The giant swallowed him whole.',
+        'Aino fled. She became a fish.',
+    ]),
+    ('sent_window', 24, [
+        'Väinämöinen built a boat. He sang the planks together. Three words were missing.',
+        'Three words were missing.\n\nHe sought them from Vipunen. The giant swallowed him whole.',
+        'Aino fled. She became a fish.',
+    ]),
+])
+def test_corpus2jsonl_sentence_chunks(tmp_path, notes_file, split, max_seq_length, expected):
+    tokenizer = FakeTokenizer()
+    corpus2jsonl([notes_file], tmp_path, split=split, max_seq_length=max_seq_length, tokenizer=tokenizer,
+                 sentence_model='rules', noteid_label='note_id')
+    [outfile] = tmp_path.glob(f'*.{split}.jsonl')
+    with open(outfile, encoding='utf8') as fh:
+        rows = [json.loads(line) for line in fh]
+    assert [row['text'] for row in rows] == expected
+    notes = {'1': NOTE, '2': 'Aino fled. She became a fish.'}
+    assert all(notes[row['note_id']][row['start_index']:row['end_index']] == row['text'] for row in rows)
+    assert tokenizer.calls == 1  # both notes counted in one batch
@@ -2,11 +2,17 @@ import json
 
 import pytest
 
-from konsepy.create_bio_dataset import create_bio_dataset
+from konsepy import create_bio_dataset as mod
+from konsepy.create_bio_dataset import (
+    _iter_bio_examples,
+    _shard_ranges,
+    assign_split,
+    create_bio_dataset,
+    tag_bio_tokens,
+)
 
 
-@pytest.mark.skipif(pytest.importorskip('datasets', reason='datasets not installed') is None,
-                    reason='datasets not installed')
+@pytest.mark.skipif(mod.Dataset is None, reason='datasets not installed')
 def test_create_bio_dataset_handles_empty_results(tmp_path):
     input_file = tmp_path / 'aino.jsonl'
     outpath = tmp_path / 'dataset'
@@ -28,4 +34,107 @@ def test_create_bio_dataset_handles_empty_results(tmp_path):
         validation_size=0.5,
     )
 
-    assert len(list(outpath.glob('*.dataset'))) == 1
+    ds = mod.DatasetDict.load_from_disk(next(outpath.glob('*.dataset')))
+    assert {name: len(split) for name, split in ds.items()} == {'train': 1, 'test': 0, 'validation': 0}
+
+
+@pytest.mark.skipif(mod.Dataset is None, reason='datasets not installed')
+def test_create_bio_dataset_writes_rows_to_their_splits(tmp_path):
+    input_file = tmp_path / 'kalevala.jsonl'
+    text = 'Väinämöinen sang of the Sampo.'
+    input_file.write_text(''.join(
+        json.dumps({'note_id': f'rune-{i}', 'text': text, 'results': [{'start': 0, 'end': 11, 'domain': 'hero'}]})
+        + '\n'
+        for i in range(40)
+    ), encoding='utf8')
+    outpath = tmp_path / 'dataset'
+
+    create_bio_dataset(input_file, outpath, test_size=0.3, validation_size=0.2)
+
+    ds = mod.DatasetDict.load_from_disk(next(outpath.glob('*.dataset')))
+    for name, split in ds.items():
+        assert {assign_split(note_id, 0.3, 0.2) for note_id in split['note_ids']} == {name}
+    assert sum(len(split) for split in ds.values()) == 40
+    row = ds['train'][0]
+    assert row['ner_tags'][0] == 'B-hero'
+    assert [text[start:end] for start, end in row['token_offsets']] == row['tokens']
+
+
+def test_tag_bio_tokens_tags_words_and_splits_punctuation():
+    text = 'Ilmatar gave birth to Väinämöinen, the eternal singer.'
+    spans = [{'start': 0, 'end': 7, 'domain': 'hero'}, {'start': 22, 'end': 33, 'domain': 'hero'}]
+    assert tag_bio_tokens(text, spans)[:2] == (
+        ['Ilmatar', 'gave', 'birth', 'to', 'Väinämöinen', ',', 'the', 'eternal', 'singer', '.'],
+        ['B-hero', 'O', 'O', 'O', 'B-hero', 'O', 'O', 'O', 'O', 'O'],
+    )
+
+
+def test_tag_bio_tokens_continues_span_across_words():
+    assert tag_bio_tokens('Aino walked home', [{'start': 0, 'end': 11, 'domain': 'hero'}])[:2] == (
+        ['Aino', 'walked', 'home'],
+        ['B-hero', 'I-hero', 'O'],
+    )
+
+
+def test_tag_bio_tokens_splits_digits_and_letter_like_characters():
+    text = 'Louhi hid the Sampo in 1½ hills'
+    assert tag_bio_tokens(text, [{'start': 14, 'end': 19, 'domain': 'artifact'}])[:2] == (
+        ['Louhi', 'hid', 'the', 'Sampo', 'in', '1', '½', 'hills'],
+        ['O', 'O', 'O', 'B-artifact', 'O', 'O', 'O', 'O'],
+    )
+
+
+def test_tag_bio_tokens_records_character_offsets():
+    text = 'Louhi hid the Sampo in 1½ hills, Väinämöinen sang.'
+    tokens, _, token_offsets = tag_bio_tokens(text, [{'start': 14, 'end': 19, 'domain': 'artifact'}])
+    assert len(token_offsets) == len(tokens)
+    assert all(text[start:end] == token for token, (start, end) in zip(tokens, token_offsets))
+    assert token_offsets[3] == (14, 19)
+
+
+def test_shard_ranges_align_to_lines(tmp_path):
+    path = tmp_path / 'kalevala.jsonl'
+    lines = [json.dumps({'note_id': str(i), 'text': 'Sampo ' * i, 'results': []}) + '\n' for i in range(10)]
+    path.write_text(''.join(lines), encoding='utf8')
+    data = path.read_bytes()
+    ranges = _shard_ranges(path, 4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(prev_end == start for (_, prev_end), (start, _) in zip(ranges, ranges[1:]))
+    assert all(data[start - 1:start] == b'\n' for start, _ in ranges[1:])
+    assert sum(data[start:end].count(b'\n') for start, end in ranges) == 10
+
+
+def test_assign_split_is_deterministic_and_proportional():
+    keys = [f'sampo-{i}' for i in range(10_000)]
+    splits = [assign_split(key, test_size=0.2, validation_size=0.1) for key in keys]
+    assert splits == [assign_split(key, test_size=0.2, validation_size=0.1) for key in keys]
+    assert 0.18 < splits.count('test') / len(keys) < 0.22
+    assert 0.08 < splits.count('validation') / len(keys) < 0.12
+    assert set(assign_split(key, test_size=0, validation_size=0) for key in keys) == {'train'}
+
+
+def test_iter_bio_examples_keeps_note_rows_in_one_split(tmp_path):
+    path = tmp_path / 'kalevala.jsonl'
+    path.write_text(''.join(
+        json.dumps({'note_id': f'rune-{i // 3}', 'studyid': f'singer-{i // 6}', 'text': 'Sampo', 'results': []})
+        + '\n'
+        for i in range(300)
+    ), encoding='utf8')
+    shards = [(str(path), 0, start, end) for start, end in _shard_ranges(path, 4)]
+    for field in ('note_id', 'studyid'):
+        rows = list(_iter_bio_examples(shards, split_field=field, test_size=0.3, validation_size=0.2))
+        assert len(rows) == 300
+        assert all(row['token_offsets'] == [(0, 5)] for row in rows)
+        splits = {}
+        total = 0
+        for name in ('train', 'test', 'validation'):
+            rows = list(_iter_bio_examples(shards, split=name, split_field=field, test_size=0.3,
+                                           validation_size=0.2))
+            assert rows
+            total += len(rows)
+            for row in rows:
+                i = int(row['note_ids'].split('-')[1])
+                key = row['note_ids'] if field == 'note_id' else f'singer-{i // 2}'
+                assert splits.setdefault(key, name) == name
+        assert total == 300
+        assert len(splits) == (100 if field == 'note_id' else 50)
@@ -0,0 +1,40 @@
+import pytest
+
+import konsepy.export_model as export_mod
+from konsepy.export_model import find_onnx_model
+
+
+def test_find_onnx_model_accepts_onnx_file(tmp_path):
+    path = tmp_path / 'sampo.onnx'
+    assert find_onnx_model(path) == path
+
+
+def test_find_onnx_model_finds_model_in_export_directory(tmp_path):
+    (tmp_path / 'model.onnx').write_bytes(b'')
+    assert find_onnx_model(tmp_path) == tmp_path / 'model.onnx'
+
+
+def test_find_onnx_model_ignores_transformers_model(tmp_path):
+    (tmp_path / 'config.json').write_text('{}', encoding='utf8')
+    assert find_onnx_model(tmp_path) is None
+
+
+def test_export_model_requires_torch(monkeypatch, tmp_path):
+    monkeypatch.setattr(export_mod, 'torch', None)
+    with pytest.raises(ImportError, match='requires torch'):
+        export_mod.export_model(tmp_path / 'model', tmp_path / 'out')
+
+
+def test_export_model_requires_onnxruntime_to_quantize(monkeypatch, tmp_path):
+    monkeypatch.setattr(export_mod, 'torch', object())
+    monkeypatch.setattr(export_mod, 'AutoTokenizer', object())
+    monkeypatch.setattr(export_mod, 'AutoModelForTokenClassification', object())
+    monkeypatch.setattr(export_mod, 'quantize_dynamic', None)
+    with pytest.raises(ImportError, match='requires onnxruntime'):
+        export_mod.export_model(tmp_path / 'model', tmp_path / 'out', quantize=True)
+
+
+def test_onnx_model_requires_onnxruntime(monkeypatch, tmp_path):
+    monkeypatch.setattr(export_mod, 'onnxruntime', None)
+    with pytest.raises(ImportError, match='requires onnxruntime'):
+        export_mod.OnnxModel(tmp_path / 'model.onnx')
@@ -76,6 +76,37 @@ def test_extract_categories_counts_label_and_collects_extractions():
     assert all(row['category'] == str(ScoreCategory.SCORE) for row in extraction_rows)
 
 
+def test_extract_categories_counts_each_match():
+    import enum
+    import re
+
+    from konsepy.rxsearch import search_all_regex
+
+    class HeroCategory(enum.Enum):
+        HERO = 1
+
+    search = search_all_regex([(re.compile(r'Väinämöinen|Ilmarinen'), HeroCategory.HERO)])
+    cat_counter_notes = Counter()
+    noteid_to_cat = defaultdict(Counter)
+    mrn_to_cat = defaultdict(Counter)
+
+    extract_categories(
+        'mrn-1',
+        'note-1',
+        'Väinämöinen and Ilmarinen forged; Väinämöinen sang.',
+        search,
+        cat_counter_mrns=defaultdict(set),
+        cat_counter_notes=cat_counter_notes,
+        mrn_to_cat=mrn_to_cat,
+        noteid_to_cat=noteid_to_cat,
+        unique_mrns=set(),
+    )
+
+    assert cat_counter_notes[HeroCategory.HERO] == 3
+    assert mrn_to_cat['mrn-1'][HeroCategory.HERO] == 3
+    assert noteid_to_cat[('mrn-1', 'note-1')][HeroCategory.HERO] == 3
+
+
 def test_output_results_writes_extraction_files(tmp_path):
     import enum
 
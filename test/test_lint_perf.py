@@ -0,0 +1,59 @@
+import csv
+import re
+
+import pytest
+
+from konsepy.lint_perf import lint_pattern, lint_perf, adversarial_inputs
+from konsepy.rxutils import Rx
+
+
+@pytest.mark.parametrize('pattern, flags, exp_findings', [
+    (rf'\bsampo{Rx.o5}\bforged', 0, [('nested-quantifier', 7, 22)]),  # (?:\w+\W*){0,5}
+    (r'(?:(?:kantele|harp)s?\s*)+', 0, [('nested-quantifier', 0, 26)]),
+    (r'(a+)+$', 0, [('nested-quantifier', 0, 5)]),
+    (r'.*pike', 0, [('leading-dot-star', 0, 2)]),
+    (r'^.*pike', 0, []),
+    (r'(?:old )?Väinämöinen\w*', 0, []),
+    (r'(?:[a-z]{2}\s)?kantele', 0, []),  # inner repeat, but outer only optional
+    (r'''(?: Louhi \s+ )+  # mistress of Pohjola''', re.X, [('nested-quantifier', 0, 16)]),
+])
+def test_lint_pattern(pattern, flags, exp_findings):
+    findings = lint_pattern(re.compile(pattern, flags))
+    assert [(f.kind, f.start, f.end) for f in findings] == exp_findings
+
+
+def test_finding_location():
+    pattern = rf'\bsampo{Rx.o5}'
+    [finding] = lint_pattern(re.compile(pattern))
+    assert finding.location(pattern).split('\n')[1] == '       ' + '^' * 15
+
+
+def test_adversarial_inputs_reach_nested_quantifier():
+    regex = re.compile(rf'\bsampo{Rx.o5}\bforged')
+    inputs = list(adversarial_inputs(regex, lint_pattern(regex)))
+    assert ('sampo', 'a ') in {(prefix, pump) for _, prefix, pump, _ in inputs}
+
+
+def test_lint_perf_reports_timeout(tmp_path, monkeypatch):
+    package = tmp_path / 'pohjola_nlp'
+    (package / 'concepts').mkdir(parents=True)
+    (package / '__init__.py').write_text('')
+    (package / 'concepts' / '__init__.py').write_text('')
+    (package / 'concepts' / 'sampo.py').write_text(
+        'import enum\n'
+        'import re\n'
+        'from konsepy.rxsearch import search_all_regex\n\n'
+        'class Sampo(enum.Enum):\n'
+        '    NO = 0\n'
+        '    YES = 1\n\n'
+        'REGEXES = [(re.compile(r"\\bsampo\\b"), Sampo.YES), (re.compile(r"(a+)+$"), Sampo.NO)]\n'
+        'RUN_REGEXES_FUNC = search_all_regex(REGEXES)\n'
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    reports = lint_perf('pohjola_nlp', max_length=256, timeout=0.2, outfile=tmp_path / 'lint.csv')
+
+    assert [(r.concept, r.regex_index, r.timed_out) for r in reports] == [('sampo', 1, True), ('sampo', 0, False)]
+    with open(tmp_path / 'lint.csv', newline='') as fh:
+        rows = list(csv.DictReader(fh))
+    assert rows[0]['findings'] == 'nested-quantifier@0-5'
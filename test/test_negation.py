@@ -2,7 +2,12 @@ import re
 
 import pytest
 
-from konsepy.context.negation import has_prenegation, has_postnegation, has_negation, is_not_negated
+from konsepy.context.contexts import get_contexts
+from konsepy.context.cues import get_note_cues
+from konsepy.context.negation import (
+    check_if_negated, has_prenegation, has_postnegation, has_negation, is_not_negated,
+)
+from konsepy.rxsearch import SKIP
 
 _preneg = [
     # (pattern, text, banned, exp_pre, exp_any)
@@ -85,3 +90,44 @@ def test_any_negation(pattern, text, banned_characters):
     m = re.search(pattern, text, re.I)
     res = has_negation(text, direction=0, banned_characters=banned_characters)
     assert res is not None
+
+
+@pytest.mark.parametrize('pattern, text, banned_characters, exp', allneg)
+def test_check_if_negated(pattern, text, banned_characters, exp):
+    m = re.search(pattern, text, re.I)
+    res = check_if_negated(**get_contexts(m, text, window=30), banned_characters=banned_characters)
+    assert res is (SKIP if exp else None)
+
+
+def test_check_if_negated_searches_context_as_before():
+    text = 'Lemminkäinen went forth for revenge.'
+    m = re.search('revenge', text)
+    contexts = get_contexts(m, text, window=len('or '))  # precontext: 'or ' (from 'for')
+
+    assert has_prenegation(contexts['precontext'])
+    assert check_if_negated(**contexts) is SKIP
+
+
+def test_note_cues_are_shared_across_matches():
+    text = 'Aino: no sorrow. Kullervo: no mercy.'
+    cues = get_note_cues(text)
+    pattern = re.compile(r'\bno\b')
+
+    assert get_note_cues(text) is cues
+    assert cues.find_before(pattern, 0, text.index('mercy')) is None  # first cue, then '.'
+    cue = cues.find_before(pattern, text.index('K'), text.index('mercy'))
+    assert text.index('K') + cue.start() == text.index('no m')
+    assert cues.search(pattern, text.index('K'), text.index('mercy')) is cue
+    assert cues.has_banned('.', 0, text.index('Kullervo'))
+    assert not cues.has_banned('.', text.index('Kullervo'), len(text) - 1)
+    assert cues.has_banned(['. '], 0, text.index('Kullervo'))
+
+
+def test_note_cues_do_not_reset_note_memo():
+    from konsepy.notecache import note_memo
+
+    note = 'Aino: no sorrow.'
+    note_memo(note)['sampo'] = 'forged'
+    has_negation('no sorrow', direction=-1, m=re.search('sorrow', 'no sorrow'))
+
+    assert note_memo(note) == {'sampo': 'forged'}
@@ -0,0 +1,65 @@
+import csv
+import re
+from enum import Enum
+
+import pytest
+
+from konsepy.get_text_snippets import get_text_snippets_regexes
+from konsepy.normalize import NormalizedRegex, NormalizedText, get_normalized_text
+from konsepy.rxsearch import search_all_regex
+
+TEXT = '  Old  Väinämöinen\n\tSANG   the Sampo\nout of Pohjola.  '
+
+
+class Song(Enum):
+    SAMPO = 1
+
+
+def test_normalized_text():
+    normalized = NormalizedText(TEXT)
+    assert normalized.text == ' '.join(TEXT.split())
+    start = normalized.text.index('Väinämöinen')
+    assert normalized.span(start, start + len('Väinämöinen sang')) == (7, 24)
+    assert normalized.slice(TEXT.index('SANG'), TEXT.index('Pohjola')) == 'SANG the Sampo out of '
+
+
+def test_casefold_retains_length():
+    normalized = NormalizedText('Straße  ÄHTÄRI', casefold=True)
+    assert normalized.text == 'straße ähtäri'
+
+
+def test_finditer_reports_original_offsets():
+    [m] = get_normalized_text(TEXT, casefold=True).finditer(re.compile(r'sang the sampo out'))
+    assert m.span() == (TEXT.index('SANG'), TEXT.index(' of'))
+    assert m.group() == 'SANG   the Sampo\nout'
+
+
+@pytest.mark.parametrize('pos, endpos, exp_count', [
+    (0, None, 1),
+    (TEXT.index('the'), None, 0),
+    (0, TEXT.index('Sampo') + 3, 0),
+])
+def test_finditer_pos_endpos(pos, endpos, exp_count):
+    matches = list(get_normalized_text(TEXT).finditer(re.compile(r'SANG the Sampo'), pos, endpos))
+    assert len(matches) == exp_count
+
+
+def test_normalized_regex_in_regexes():
+    search = search_all_regex([(NormalizedRegex(re.compile(r'the sampo out'), casefold=True), Song.SAMPO)])
+    [(category, m)] = search(TEXT, include_match=True)
+    assert category == Song.SAMPO
+    assert TEXT[m.start():m.end()] == 'the Sampo\nout'
+
+
+def test_get_text_snippets_regexes(tmp_path):
+    infile = tmp_path / 'notes.csv'
+    with open(infile, 'w', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['studyid', 'note_id', 'note_date', 'text'])
+        writer.writerow([1, 1, '2020-01-01', TEXT])
+    outfile = get_text_snippets_regexes([infile], tmp_path / 'out', ['SAMPO==sang the sampo'], window_size=10,
+                                         encoding='utf8')
+    with open(outfile, newline='') as fh:
+        [row] = list(csv.DictReader(fh))
+    assert (row['precontext'], row['term'], row['postcontext']) == ('inämöinen ', 'SANG the Sampo', ' out of Po')
+    assert TEXT[int(row['start']):int(row['end'])] == 'SANG   the Sampo'
@@ -1,11 +1,16 @@
 import json
+import multiprocessing
 
 import pytest
 
 from konsepy.predict_bio_dataset import (
     _iter_spans_from_labels_and_offsets,
+    _length_sorted_batches,
     _load_id2label,
+    _merge_windows,
+    _ordered_map,
     _strip_bio_prefix,
+    check_stride,
 )
 
 from konsepy import predict_bio_dataset as mod
@@ -172,6 +177,64 @@ def test_load_id2label_converts_json_keys_to_ints(tmp_path):
     }
 
 
+def test_length_sorted_batches_group_similar_lengths():
+    lengths = [50, 3, 40, 4, 45, 5, 1]
+
+    batches = _length_sorted_batches(lengths, 3)
+
+    assert batches == [[6, 1, 3], [5, 2, 4], [0]]
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+
+
+def test_ordered_map_preserves_input_order_across_workers():
+    pools = [['Väinämöinen'] * n for n in (5, 1, 4, 2, 3)]
+    with multiprocessing.get_context('spawn').Pool(2) as executor:
+        results = list(_ordered_map(executor, len, iter(pools), max_pending=2))
+    assert [result for _, result in results] == [5, 1, 4, 2, 3]
+    assert [pool for pool, _ in results] == pools
+
+
+def test_merge_windows_prefers_most_central_window():
+    # 'Väinämöinen sang in Kalevala' split into two windows overlapping by two tokens
+    first = (['O', 'B-hero', 'O', 'O', 'B-place', 'O'], [(0, 0), (0, 11), (12, 16), (17, 19), (20, 28), (0, 0)])
+    second = (['O', 'O', 'O', 'B-place', 'I-place', 'O'], [(0, 0), (12, 16), (17, 19), (20, 28), (28, 29), (0, 0)])
+
+    labels, offsets = _merge_windows([first, second])
+
+    assert offsets == [(0, 11), (12, 16), (17, 19), (20, 28), (28, 29)]
+    assert labels == ['B-hero', 'O', 'O', 'B-place', 'I-place']
+    assert list(_iter_spans_from_labels_and_offsets(labels, offsets)) == [
+        {'domain': 'hero', 'start': 0, 'end': 11},
+        {'domain': 'place', 'start': 20, 'end': 29},
+    ]
+
+
+def test_merge_windows_uses_central_label_on_disagreement():
+    first = (['O', 'O', 'O', 'B-hero'], [(0, 4), (5, 9), (10, 14), (15, 19)])  # (10, 14) is central here
+    second = (['B-hero', 'O', 'O', 'O'], [(10, 14), (15, 19), (20, 24), (25, 29)])  # at an edge here
+
+    labels, offsets = _merge_windows([first, second])
+
+    assert dict(zip(offsets, labels))[(10, 14)] == 'O'
+    assert dict(zip(offsets, labels))[(15, 19)] == 'O'
+
+
+class FakeTokenizer:
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+
+def test_check_stride_leaves_room_for_special_tokens():
+    check_stride(None, 16, FakeTokenizer())
+    check_stride(13, 16, FakeTokenizer())
+    with pytest.raises(ValueError, match='below 14'):
+        check_stride(14, 16, FakeTokenizer())
+    with pytest.raises(ValueError):
+        check_stride(16, 16)
+    with pytest.raises(ValueError):
+        check_stride(-1, 16)
+
+
 class FakeModel:
     def to(self, device):
         return self
@@ -206,19 +269,24 @@ def test_predict_bio_dataset_writes_predictions_jsonl(tmp_path, monkeypatch):
     monkeypatch.setattr(mod.AutoTokenizer, 'from_pretrained', lambda *_args, **_kwargs: object())
     monkeypatch.setattr(mod.AutoModelForTokenClassification, 'from_pretrained', lambda *_args, **_kwargs: FakeModel())
 
-    def fake_iter_predicted_spans(*_args, **_kwargs):
-        yield {
-            'domain': 'hero',
-            'start': 0,
-            'end': 11,
-        }
-        yield {
-            'domain': 'place',
-            'start': 20,
-            'end': 28,
-        }
+    def fake_predict_spans_batch(texts, *_args, **_kwargs):
+        return [
+            [
+                {
+                    'domain': 'hero',
+                    'start': 0,
+                    'end': 11,
+                },
+                {
+                    'domain': 'place',
+                    'start': 20,
+                    'end': 28,
+                },
+            ]
+            for _ in texts
+        ]
 
-    monkeypatch.setattr(mod, '_iter_predicted_spans', fake_iter_predicted_spans)
+    monkeypatch.setattr(mod, '_predict_spans_batch', fake_predict_spans_batch)
 
     output_path = mod.predict_bio_dataset(
         input_files=[input_file],
@@ -259,3 +327,48 @@ def test_predict_bio_dataset_writes_predictions_jsonl(tmp_path, monkeypatch):
             ],
         },
     ]
+
+
+@pytest.mark.skipif(
+    mod.AutoTokenizer is None or mod.AutoModelForTokenClassification is None,
+    reason='transformers not installed',
+)
+@pytest.mark.skipif(mod.torch is None, reason='torch not installed')
+def test_predict_bio_dataset_batches_preserve_input_order(tmp_path, monkeypatch):
+    texts = ['Aino', 'Väinämöinen sang in Kalevala.', 'Louhi', 'Ilmarinen forged the Sampo.', 'Kullervo']
+    input_file = tmp_path / 'notes.jsonl'
+    input_file.write_text(
+        ''.join(
+            json.dumps({'studyid': '1', 'note_id': str(i), 'note_date': '2026-05-15', 'text': text}) + '\n'
+            for i, text in enumerate(texts)
+        ),
+        encoding='utf8',
+    )
+    model_path = tmp_path / 'model'
+    model_path.mkdir()
+    id2label_path = tmp_path / 'id2label.json'
+    id2label_path.write_text(json.dumps({'0': 'O', '1': 'B-hero'}), encoding='utf8')
+
+    monkeypatch.setattr(mod.AutoTokenizer, 'from_pretrained', lambda *_args, **_kwargs: object())
+    monkeypatch.setattr(mod.AutoModelForTokenClassification, 'from_pretrained', lambda *_args, **_kwargs: FakeModel())
+    batches = []
+
+    def fake_predict_spans_batch(batch_texts, *_args, **_kwargs):
+        batches.append(list(batch_texts))
+        return [[{'domain': 'hero', 'start': 0, 'end': len(text.split()[0])}] for text in batch_texts]
+
+    monkeypatch.setattr(mod, '_predict_spans_batch', fake_predict_spans_batch)
+
+    output_path = mod.predict_bio_dataset(
+        input_files=[input_file],
+        outdir=tmp_path / 'out',
+        model_path=model_path,
+        id2label_path=id2label_path,
+        device='cpu',
+        batch_size=2,
+    )
+
+    rows = [json.loads(line) for line in output_path.read_text(encoding='utf8').splitlines()]
+    assert [row['note_id'] for row in rows] == ['0', '1', '2', '3', '4']
+    assert [row['results'][0]['capture'] for row in rows] == [text.split()[0] for text in texts]
+    assert batches[0] == ['Aino', 'Louhi']
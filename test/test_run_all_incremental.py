@@ -0,0 +1,98 @@
+import json
+import sqlite3
+
+from konsepy.importer import ConceptImport
+from konsepy.run_all import run_all
+from konsepy.store import RunStore
+
+
+def _write_corpus(path, notes):
+    with open(path, 'w', encoding='utf8') as out:
+        for note_id, text in notes:
+            out.write(json.dumps({'chapter': note_id, 'text': text}) + '\n')
+
+
+def _run(corpus_file, outdir, **kwargs):
+    return run_all([corpus_file], outdir, 'example_nlp', id_label='chapter', noteid_label='chapter', **kwargs)
+
+
+def _count_runs(monkeypatch):
+    calls = []
+    run_func = ConceptImport.run_func
+
+    def counting_run_func(self, text, *args, **kwargs):
+        calls.append(self.name)
+        return run_func(self, text, *args, **kwargs)
+
+    monkeypatch.setattr(ConceptImport, 'run_func', counting_run_func)
+    return calls
+
+
+def _read_outputs(run_dir):
+    return {
+        name: (run_dir / name).read_text(encoding='utf8')
+        for name in ('output.jsonl', 'category_counts.csv', 'mrn_category_counts.csv', 'notes_category_counts.csv')
+    }
+
+
+def test_incremental_run_matches_full_run(tmp_path, datadir):
+    first = _run(datadir / 'corpus.jsonl', tmp_path / 'first')
+    second = _run(datadir / 'corpus.jsonl', tmp_path / 'second', incremental=first)
+
+    assert _read_outputs(second) == _read_outputs(first)
+
+
+def test_incremental_run_only_processes_new_notes(tmp_path, monkeypatch):
+    corpus_file = tmp_path / 'corpus.jsonl'
+    _write_corpus(corpus_file, [('1', 'Joukahainen was jealous of the old singer.')])
+    first = _run(corpus_file, tmp_path / 'first')
+
+    _write_corpus(corpus_file, [
+        ('1', 'Joukahainen was jealous of the old singer.'),
+        ('2', 'Aino felt no envy.'),
+    ])
+    calls = _count_runs(monkeypatch)
+    second = _run(corpus_file, tmp_path / 'second', incremental=first)
+
+    assert calls == ['jealousy', 'justice', 'revenge']  # only the new note
+    rows = [json.loads(line) for line in (second / 'output.jsonl').read_text(encoding='utf8').splitlines()]
+    assert [(row['note_id'], row['categories']) for row in rows] == [
+        ('1', ['Jealousy.YES']),
+        ('2', ['Jealousy.NO']),
+    ]
+
+
+def test_incremental_run_recomputes_changed_concepts(tmp_path, monkeypatch):
+    corpus_file = tmp_path / 'corpus.jsonl'
+    _write_corpus(corpus_file, [
+        ('1', 'Joukahainen was jealous of the old singer.'),
+        ('2', 'Kullervo swore revenge.'),
+    ])
+    first = _run(corpus_file, tmp_path / 'first')
+    with sqlite3.connect(first / 'run_store.db') as connection:
+        connection.execute("UPDATE concepts SET source_hash = 'stale' WHERE name = 'jealousy'")
+
+    calls = _count_runs(monkeypatch)
+    second = _run(corpus_file, tmp_path / 'second', incremental=first)
+
+    assert calls == ['jealousy', 'jealousy']
+    assert _read_outputs(second) == _read_outputs(first)  # same order as a full run
+
+
+def test_run_all_records_each_note_once(tmp_path, monkeypatch):
+    corpus_file = tmp_path / 'corpus.jsonl'
+    _write_corpus(corpus_file, [
+        ('1', 'Joukahainen was jealous of the old singer.'),
+        ('2', 'Kullervo swore revenge.'),
+    ])
+    notes = []
+    add_note = RunStore.add_note
+
+    def counting_add_note(self, studyid, note_id, *args, **kwargs):
+        notes.append(note_id)
+        return add_note(self, studyid, note_id, *args, **kwargs)
+
+    monkeypatch.setattr(RunStore, 'add_note', counting_add_note)
+    _run(corpus_file, tmp_path / 'first')
+
+    assert notes == ['1', '2']
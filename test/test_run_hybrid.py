@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from konsepy import run_hybrid as mod
+from konsepy.run_hybrid import _context_windows, run_hybrid
+
+
+def test_context_windows_extend_to_whitespace_and_merge():
+    text = 'Joukahainen was jealous of Väinämöinen and envious of his songs.'
+    start = text.index('jealous')
+    envious = text.index('envious')
+    windows = _context_windows(text, [(start, start + 7), (envious, envious + 7)], 5)
+    assert windows == [(text.index(' was'), text.index(' songs'))]
+
+
+def test_context_windows_whole_note_without_context():
+    assert _context_windows('Sampo', [(0, 5)], None) == [(0, 5)]
+
+
+def test_run_hybrid_only_predicts_gated_windows(tmp_path, monkeypatch):
+    input_file = tmp_path / 'notes.jsonl'
+    notes = [
+        'Long ago Joukahainen was jealous of the old singer Väinämöinen, who sang him into the swamp.',
+        'Lemminkäinen sailed north to Pohjola.',
+        'Louhi swore revenge for the stolen Sampo.',
+    ]
+    input_file.write_text(
+        ''.join(json.dumps({'chapter': str(i), 'text': text}) + '\n' for i, text in enumerate(notes, start=1)),
+        encoding='utf8',
+    )
+    monkeypatch.setattr(mod, 'load_bio_model', lambda *_args, **_kwargs: (None, None, {}, 'cpu'))
+    seen = []
+
+    def fake_predict_spans(texts, *_args, **_kwargs):
+        seen.extend(texts)
+        return [[{'domain': 'hero', 'start': 0, 'end': text.index(' ')}] for text in texts]
+
+    monkeypatch.setattr(mod, 'predict_spans', fake_predict_spans)
+
+    result_dir = run_hybrid(
+        input_files=[input_file],
+        outdir=tmp_path / 'out',
+        package_name='example_nlp',
+        model_path=tmp_path / 'model',
+        id_label='chapter',
+        noteid_label='chapter',
+        encoding='utf8',
+        gate_concepts=['jealousy'],
+        context=10,
+    )
+
+    rows = [json.loads(line) for line in (result_dir / 'output.jsonl').read_text(encoding='utf8').splitlines()]
+    assert seen == ['Joukahainen was jealous of the old']
+    assert [row['note_id'] for row in rows] == ['1', '3']
+    assert rows[0]['model_results'] == [
+        {'domain': 'hero', 'capture': 'Joukahainen', 'start': 9, 'end': 20},
+    ]
+    assert rows[0]['regex_results'][0]['concept'] == 'jealousy'
+    assert rows[1]['model_results'] is None
+    assert rows[1]['regex_results'][0]['concept'] == 'revenge'
+
+
+def test_run_hybrid_writes_regex_only_notes_in_bounded_pools(tmp_path, monkeypatch):
+    input_file = tmp_path / 'notes.jsonl'
+    notes = [
+        'Joukahainen was jealous of Väinämöinen.',
+        'Louhi swore revenge for the stolen Sampo.',
+        'Aino was jealous of no one.',
+    ]
+    input_file.write_text(
+        ''.join(json.dumps({'chapter': str(i), 'text': text}) + '\n' for i, text in enumerate(notes, start=1)),
+        encoding='utf8',
+    )
+    monkeypatch.setattr(mod, 'load_bio_model', lambda *_args, **_kwargs: (None, None, {}, 'cpu'))
+    pool_sizes = []
+    write = mod._predict_and_write
+
+    def recording_write(pool, *args):
+        pool_sizes.append(len(pool))
+        write(pool, *args)
+
+    monkeypatch.setattr(mod, '_predict_and_write', recording_write)
+
+    result_dir = run_hybrid(
+        input_files=[input_file],
+        outdir=tmp_path / 'out',
+        package_name='example_nlp',
+        model_path=tmp_path / 'model',
+        id_label='chapter',
+        noteid_label='chapter',
+        encoding='utf8',
+        gate_concepts=['justice'],  # never fires, so no note is sent to the model
+        pool_size=2,
+    )
+
+    rows = [json.loads(line) for line in (result_dir / 'output.jsonl').read_text(encoding='utf8').splitlines()]
+    assert [row['note_id'] for row in rows] == ['1', '2', '3']
+    assert pool_sizes == [2, 1]
+
+
+def test_run_hybrid_rejects_stride_not_below_max_length(tmp_path, monkeypatch):
+    monkeypatch.setattr(mod, 'load_bio_model', lambda *_args, **_kwargs: pytest.fail('model should not be loaded'))
+
+    with pytest.raises(ValueError, match='stride'):
+        run_hybrid(
+            input_files=[], outdir=tmp_path / 'out', package_name='example_nlp', model_path=tmp_path / 'model',
+            max_length=128, stride=128,
+        )
+    assert not (tmp_path / 'out').exists()
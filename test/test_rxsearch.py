@@ -299,6 +299,30 @@ def test_preprocessor_returning_none_yields_no_regions():
     assert list(search('Väinämöinen')) == []
 
 
+def test_preprocessor_runs_once_per_note_across_regexes_and_concepts():
+    calls = []
+
+    def second_sentence(text):
+        calls.append(text)
+        yield text.index('.') + 1, len(text)
+
+    hero_search = search_all_regex([
+        (re.compile(r'Väinämöinen'), Category.HERO, None, second_sentence),
+        (re.compile(r'Ilmarinen'), Category.HERO, None, second_sentence),
+    ])
+    place_search = search_all_regex([
+        (re.compile(r'Louhi'), Category.PLACE, None, second_sentence),
+    ])
+    text = 'Louhi first. Väinämöinen, Ilmarinen, and Louhi second.'
+
+    assert list(hero_search(text)) == [Category.HERO, Category.HERO]
+    assert list(place_search(text)) == [Category.PLACE]
+    assert calls == [text]
+
+    list(hero_search('Another note. Väinämöinen.'))
+    assert len(calls) == 2
+
+
 def test_ignore_indices_searches_full_text_despite_preprocessor():
     def no_regions(text):
         return None
@@ -349,6 +373,65 @@ def test_sentinel_stops_after_non_unknown_string_result():
     assert list(search('Väinämöinen Louhi')) == ['HERO']
 
 
+def test_presence_yields_distinct_categories():
+    regexes = [
+        (re.compile(r'Väinämöinen'), Category.HERO),
+        (re.compile(r'Ilmarinen'), Category.HERO),
+        (re.compile(r'Pohjola'), Category.PLACE),
+    ]
+
+    search = search_all_regex(regexes)
+    text = 'Väinämöinen and Ilmarinen sailed to Pohjola; Väinämöinen sang.'
+
+    assert list(search(text)) == [Category.HERO, Category.HERO, Category.HERO, Category.PLACE]
+    assert list(search(text, presence=True)) == [Category.HERO, Category.PLACE]
+
+
+def test_presence_stops_scanning_once_category_found():
+    class CountingPattern:
+        def __init__(self, pattern):
+            self.regex = re.compile(pattern)
+            self.matches = 0
+
+        def finditer(self, *args, **kwargs):
+            for m in self.regex.finditer(*args, **kwargs):
+                self.matches += 1
+                yield m
+
+    first = CountingPattern(r'sampo')
+    second = CountingPattern(r'Sampo')
+    search = search_all_regex([(first, 'SAMPO'), (second, 'SAMPO')])
+
+    assert list(search('sampo sampo sampo Sampo', presence=True)) == ['SAMPO']
+    assert (first.matches, second.matches) == (1, 0)
+
+
+def test_presence_applies_postprocessors_until_result_found():
+    def negate(*, precontext, **_):
+        if 'no' in precontext.split():
+            return Category.NEGATED_HERO
+
+    regexes = [
+        (re.compile(r'Kullervo'), Category.HERO, negate),
+    ]
+
+    search = search_all_regex(regexes)
+
+    assert list(search('Kullervo, no Kullervo, Kullervo', presence=True)) == [
+        Category.HERO, Category.NEGATED_HERO,
+    ]
+
+
+def test_presence_keeps_distinct_extracted_values():
+    regexes = [
+        (re.compile(r'(?P<target>\d+) oxen'), Category.NUMBER),
+    ]
+
+    search = extract_all_regex_target(regexes)
+
+    assert [str(r) for r in search('100 oxen, 100 oxen, 1000 oxen', presence=True)] == ['100', '1000']
+
+
 def test_extract_group_defaults_to_target_group():
     regexes = [
         (re.compile(r'hero:\s*(?P<target>\w+)'), Category.HERO, extract_group()),
@@ -1,5 +1,9 @@
 import re
-from konsepy.rxutils import rx_compile, KonsepyRegex
+
+import pytest
+
+import konsepy.rxutils as rxutils_mod
+from konsepy.rxutils import rx_compile, KonsepyRegex, _get_re2_prefix
 
 
 def test_regex_wrapper_direct_no_dupes():
@@ -152,3 +156,71 @@ def test_konsepy_regex_str_without_dupe_names_is_clear():
     assert text.startswith('KonsepyRegex(')
     assert r"pattern='(?P<word>\\w+)'" in text
     assert "groups=['word']" in text
+
+
+def test_rx_compile_rejects_unknown_backend():
+    with pytest.raises(ValueError, match='Unrecognized regex backend'):
+        rx_compile(r'sampo', backend='pcre')
+
+
+def test_rx_compile_regex_backend_requires_regex(monkeypatch):
+    monkeypatch.setattr(rxutils_mod, 'regex', None)
+    with pytest.raises(ImportError, match='requires regex'):
+        rx_compile(r'sampo', backend='regex')
+
+
+def test_rx_compile_regex_backend_supports_dupe_names_natively():
+    pytest.importorskip('regex')
+    rx = rx_compile(r'(?:score: (?P<val>\d+)|results: (?P<val>\d+))', backend='regex')
+    m = rx.search('results: 456')
+    assert not isinstance(rx, KonsepyRegex)
+    assert m.group('val') == '456'
+    assert m.span('val') == (9, 12)
+
+
+@pytest.mark.parametrize('pattern, flags, exp', [
+    (r'Väinämöinen (?:sang|played)', 0, ''),
+    (r'kantele', re.I, '(?i)'),
+    (r'(?P<val>\d+) oxen|(?P<val>\d+) pike', re.A, ''),
+    (r'\bsampo\b', 0, None),  # unicode word boundaries
+    (r'\bsampo\b', re.A, ''),
+    (r'(?<=old )Väinämöinen', 0, None),  # lookbehind
+    (r'(Louhi) and \1', 0, None),  # backreference
+    (r'Pohjola$', 0, None),  # `$` before final newline
+    (r'Pohjola$', re.M, '(?m)'),
+])
+def test_get_re2_prefix(pattern, flags, exp):
+    assert _get_re2_prefix(pattern, flags) == exp
+
+
+def test_rx_compile_re2_falls_back_to_re(monkeypatch):
+    monkeypatch.setattr(rxutils_mod, 're2', object())  # would fail if used
+    rx = rx_compile(r'(?<=old )Väinämöinen', backend='re2')
+    assert rx.search('The old Väinämöinen').group() == 'Väinämöinen'
+
+
+def test_rx_compile_regex_backend_maps_flags_by_name(monkeypatch):
+    class FakeRegex:
+        ASCII, DEBUG, IGNORECASE, LOCALE, MULTILINE, DOTALL, UNICODE, VERBOSE = (
+            0x80, 0x200, 0x2, 0x4, 0x8, 0x10, 0x20, 0x40,
+        )
+        V1 = 0x100  # same value as re.ASCII
+
+        @staticmethod
+        def compile(pattern, flags):
+            return pattern, flags
+
+    monkeypatch.setattr(rxutils_mod, 'regex', FakeRegex)
+    assert rx_compile(r'sampo', re.ASCII | re.I, backend='regex') == ('sampo', FakeRegex.ASCII | FakeRegex.IGNORECASE)
+
+
+def test_use_regex_backend_is_scoped():
+    default = rxutils_mod._default_backend
+    with rxutils_mod.use_regex_backend('re2'):
+        assert rxutils_mod._default_backend == 're2'
+        with rxutils_mod.use_regex_backend(None):
+            assert rxutils_mod._default_backend == 're2'
+    assert rxutils_mod._default_backend == default
+    with pytest.raises(ValueError, match='Unrecognized regex backend'):
+        with rxutils_mod.use_regex_backend('pcre'):
+            pass
@@ -0,0 +1,94 @@
+import csv
+import json
+import re
+from enum import Enum
+
+import pytest
+
+from konsepy.corpus2jsonl import corpus2jsonl
+from konsepy.engine import ProcessingEngine
+from konsepy.rxsearch import search_all_regex
+from konsepy.sections import SectionSegmenter, in_sections
+
+NOTE = (
+    'Visit with Väinämöinen.\n'
+    'Chief Complaint: lost his kantele\n'
+    'History of present illness:\n'
+    'Kantele of pike bone sank in the lake.\n'
+    'ALLERGIES\n'
+    'birch bark\n'
+    'Assessment and Plan: forge a new kantele; plan to ask Ilmarinen.\n'
+)
+
+
+class Kantele(Enum):
+    YES = 1
+
+
+def test_segment_finds_header_lines():
+    segmenter = SectionSegmenter(default_section='preamble')
+    sections = segmenter.segment(NOTE)
+    assert [name for *_, name in sections] == [
+        'preamble', 'chief_complaint', 'history_of_present_illness', 'allergies', 'assessment_and_plan',
+    ]
+    start, end, _ = sections[3]
+    assert NOTE[start:end] == 'ALLERGIES\nbirch bark\n'
+    assert sections[-1][1] == len(NOTE)
+
+
+def test_segment_custom_headers_require_colon():
+    segmenter = SectionSegmenter({'song': ['song of sampo']}, require_colon=True)
+    text = 'Song of Sampo\nnot a header\nsong  of sampo: a header'
+    assert segmenter.segment(text) == [(text.index('song  of'), len(text), 'song')]
+
+
+def test_in_sections_preprocessor():
+    search = search_all_regex([
+        (re.compile(r'kantele', re.I), Kantele.YES, None, in_sections('assessment_and_plan')),
+    ])
+    assert [m.start() for _, m in search(NOTE, include_match=True)] == [NOTE.rindex('kantele')]
+
+
+def test_mask_retains_offsets():
+    masked = SectionSegmenter().mask(NOTE, {'allergies'})
+    assert len(masked) == len(NOTE)
+    assert masked.count('\n') == NOTE.count('\n')
+    assert masked.split() == ['ALLERGIES', 'birch', 'bark']
+
+
+@pytest.fixture
+def notes_file(tmp_path):
+    path = tmp_path / 'notes.csv'
+    with open(path, 'w', newline='', encoding='utf8') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['studyid', 'note_id', 'note_date', 'text'])
+        writer.writerow([1, 1, '2020-01-01', NOTE])
+    return path
+
+
+def test_corpus2jsonl_section_split(tmp_path, notes_file):
+    corpus2jsonl([notes_file], tmp_path, split='section', noteid_label='note_id')
+    [outfile] = tmp_path.glob('*.section.jsonl')
+    with open(outfile, encoding='utf8') as fh:
+        rows = [json.loads(line) for line in fh]
+    assert [row['section'] for row in rows][:2] == ['preamble', 'chief_complaint']
+    assert all(NOTE[row['start_index']:row['end_index']] == row['text'] for row in rows)
+
+
+@pytest.mark.parametrize('sections, exp_categories', [
+    (None, ['YES']),
+    (['plan'], []),
+])
+def test_engine_sections_filter(tmp_path, sections, exp_categories):
+    note = 'Louhi swore revenge.\nPlan:\nforge the sampo.\n'
+    path = tmp_path / 'notes.csv'
+    with open(path, 'w', newline='', encoding='utf8') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['studyid', 'note_id', 'note_date', 'text'])
+        writer.writerow([1, 1, '2020-01-01', note])
+    results = []
+    engine = ProcessingEngine([path], 'example_nlp', encoding='utf8', concepts=['revenge'], sections=sections)
+    engine.run(lambda *args: results.append(args))
+    [(_, _, _, text, _, _, categories, _)] = results
+    assert text == note
+    assert [category.name for category in categories] == exp_categories
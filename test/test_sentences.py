@@ -0,0 +1,80 @@
+import csv
+import json
+
+import pytest
+
+from konsepy.bio_tag_sentence import format_for_spacy, get_bio_tags_sentence
+from konsepy.corpus2jsonl import corpus2jsonl
+from konsepy.sentences import iter_sentences, split_sentences
+
+NOTE = (
+    'Louhi hid the Sampo in Pohjola. Dr. Ilmarinen forged it!\n\n'
+    'Plan:\n'
+    '- sail to Pohjola with Väinämöinen\n'
+    '- take the Sampo, e.g. by singing q.d. until all sleep\n'
+    '2) Louhi swore revenge. The end'
+)
+
+
+def test_split_sentences():
+    sentences = split_sentences(NOTE)
+    assert [sent.text for sent in sentences] == [
+        'Louhi hid the Sampo in Pohjola.',
+        'Dr. Ilmarinen forged it!',
+        'Plan:',
+        '- sail to Pohjola with Väinämöinen',
+        '- take the Sampo, e.g. by singing q.d. until all sleep',
+        '2) Louhi swore revenge.',
+        'The end',
+    ]
+    assert all(NOTE[sent.start_char:sent.end_char] == sent.text for sent in sentences)
+    assert [sent.ends_paragraph for sent in sentences] == [False, True, False, False, False, False, False]
+
+
+@pytest.mark.parametrize('text', ['', ' \n\n '])
+def test_split_sentences_empty(text):
+    assert split_sentences(text) == []
+
+
+def test_iter_sentences_rules_with_processes_preserves_order():
+    items = [(f'Aino walked {i} miles. She sang.', i) for i in range(50)]
+    expected = list(iter_sentences(items, 'rules'))
+    assert list(iter_sentences(items, 'rules', batch_size=4, n_process=2)) == expected
+    assert [context for _, context in expected] == list(range(50))
+
+
+@pytest.fixture
+def notes_file(tmp_path):
+    path = tmp_path / 'notes.csv'
+    with open(path, 'w', newline='', encoding='utf8') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['studyid', 'note_id', 'note_date', 'text'])
+        writer.writerow([1, 1, '2020-01-01', NOTE])
+        writer.writerow([2, 2, '2020-01-02', 'Kullervo sought revenge. Untamo fled.'])
+    return path
+
+
+def test_corpus2jsonl_rule_sentences(tmp_path, notes_file):
+    corpus2jsonl([notes_file], tmp_path, split='sentence', sentence_model='rules', limit_noteids={'1'})
+    [outfile] = tmp_path.glob('*.sentence.jsonl')
+    with open(outfile, encoding='utf8') as fh:
+        rows = [json.loads(line) for line in fh]
+    assert {row['note_id'] for row in rows} == {'1'}
+    assert [row['sentence_id'] for row in rows] == list(range(7))
+    assert all(NOTE[row['start_index']:row['end_index']] == row['text'] for row in rows)
+
+
+def test_format_for_spacy_filters_before_splitting():
+    rows = [(i, 'singer', str(i), '2020-01-01', f'rune {i}', {}) for i in range(3)]
+    assert list(format_for_spacy(rows, limit_noteids={'1'})) == [('rune 1', (1, 'singer', '1', '2020-01-01', {}))]
+
+
+def test_get_bio_tags_sentence_rules(tmp_path, notes_file):
+    get_bio_tags_sentence([notes_file], tmp_path, package_name='example_nlp', sentence_model='rules',
+                          encoding='utf8')
+    with open(tmp_path / 'bio_tag_data.sentence.jsonl', encoding='utf8') as fh:
+        rows = [json.loads(line) for line in fh]
+    [revenge_row, kullervo_row] = [row for row in rows if row['results']]
+    assert revenge_row['text'] == '2) Louhi swore revenge.'
+    assert kullervo_row['note_id'] == '2' and kullervo_row['sentence_id'] == 0
+    assert [(r['domain'], r['capture']) for r in kullervo_row['results']] == [('revenge', 'revenge')]
@@ -0,0 +1,62 @@
+import json
+import re
+
+from konsepy.regex import run_regex_on_files
+from konsepy.rxsearch import search_all_regex
+from konsepy.snippets import SnippetCounter
+
+
+def test_snippet_counter_exact_within_capacity():
+    counter = SnippetCounter(capacity=3)
+    counter.update(['sampo', 'kantele', 'sampo', 'sampo', 'kantele', 'pike'])
+
+    assert counter.most_common() == [('sampo', 3), ('kantele', 2), ('pike', 1)]
+    assert counter.error('sampo') == 0
+
+
+def test_snippet_counter_retains_heavy_hitters():
+    counter = SnippetCounter(capacity=2, sample_size=4, seed=1)
+    for i in range(100):
+        counter.add('Väinämöinen')
+        counter.add(f'rare {i}')
+
+    assert len(counter) == 2
+    snippet, count = counter.most_common(1)[0]
+    assert snippet == 'Väinämöinen'
+    assert count - counter.error(snippet) <= 100 <= count
+    assert len(counter.sample()) == 4
+
+
+def test_snippet_counter_truncates_long_snippets():
+    counter = SnippetCounter(capacity=2, sample_size=2, max_length=5)
+    counter.update(['Väinämöinen sings', 'Väinämöinen sinks', 'Aino'])
+
+    assert counter.most_common() == [('Väinä', 2), ('Aino', 1)]
+    assert all(len(snippet) <= 5 for snippet in counter.sample())
+
+
+def test_run_regex_on_files_collects_not_found_snippets(tmp_path):
+    input_file = tmp_path / 'corpus.jsonl'
+    with open(input_file, 'w', encoding='utf8') as out:
+        for i, text in enumerate(['Louhi  stole the sun.', 'Louhi stole the sun.', 'Ilmarinen forged the Sampo.']):
+            out.write(json.dumps({'chapter': str(i), 'text': text}) + '\n')
+    regex_func = search_all_regex([(re.compile(r'Sampo'), 'SAMPO')])
+
+    *_, not_found_text, _, _, _ = run_regex_on_files(
+        [input_file], regex_func, id_label='chapter', noteid_label='chapter', max_snippets=10,
+    )
+
+    assert not_found_text.most_common() == [('Louhi stole the sun.', 2)]
+
+
+def test_run_regex_on_files_truncates_not_found_snippets(tmp_path):
+    input_file = tmp_path / 'corpus.jsonl'
+    with open(input_file, 'w', encoding='utf8') as out:
+        out.write(json.dumps({'chapter': '1', 'text': 'Louhi stole the sun and the moon.'}) + '\n')
+    regex_func = search_all_regex([(re.compile(r'Sampo'), 'SAMPO')])
+
+    *_, not_found_text, _, _, _ = run_regex_on_files(
+        [input_file], regex_func, id_label='chapter', noteid_label='chapter', max_snippet_length=15,
+    )
+
+    assert not_found_text.most_common() == [('Louhi stole the', 1)]
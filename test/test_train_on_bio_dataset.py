@@ -0,0 +1,75 @@
+from konsepy.train_on_bio_dataset import _tokenized_cache_key, tokenize_adjust_labels
+
+
+class FakeEncoding(dict):
+
+    def __init__(self, word_ids, **kwargs):
+        super().__init__(input_ids=[[0] * len(ids) for ids in word_ids], **kwargs)
+        self._word_ids = word_ids
+
+    def word_ids(self, batch_index):
+        return self._word_ids[batch_index]
+
+
+class FakeTokenizer:
+    """Splits 'Väinämöinen' into two pieces; with `stride`, yields two windows per sample."""
+    name_or_path = 'kantele'
+
+    def __init__(self, vocab=None):
+        self.calls = []
+        self.vocab = vocab or {'sampo': 0}
+
+    def get_vocab(self):
+        return self.vocab
+
+    def __call__(self, samples, **kwargs):
+        self.calls.append(kwargs)
+        word_ids = []
+        for tokens in samples:
+            ids = [None]
+            for i, token in enumerate(tokens):
+                ids += [i, i] if token == 'Väinämöinen' else [i]
+            word_ids.append(ids + [None])
+        if not kwargs.get('stride'):
+            return FakeEncoding(word_ids)
+        windows = [ids for sample in word_ids for ids in (sample[:3], sample[2:])]
+        mapping = [i for i in range(len(word_ids)) for _ in range(2)]
+        return FakeEncoding(windows, overflow_to_sample_mapping=mapping)
+
+
+SAMPLES = {
+    'tokens': [['Väinämöinen', 'sang'], ['Louhi', 'hid', 'Sampo']],
+    'ner_tags': [['B-hero', 'O'], ['B-villain', 'O', 'B-artifact']],
+}
+LABEL2ID = {'B-artifact': 0, 'B-hero': 1, 'B-villain': 2, 'O': 3}
+
+
+def test_tokenize_adjust_labels_labels_every_subword():
+    tokenizer = FakeTokenizer()
+    encoded = tokenize_adjust_labels(tokenizer, LABEL2ID)(SAMPLES)
+    assert encoded['labels'] == [[-100, 1, 1, 3, -100], [-100, 2, 3, 0, -100]]
+    assert tokenizer.calls[0]['padding'] is False
+
+
+def test_tokenize_adjust_labels_windows_use_sample_labels():
+    encoded = tokenize_adjust_labels(FakeTokenizer(), LABEL2ID, stride=1)(SAMPLES)
+    assert 'overflow_to_sample_mapping' not in encoded
+    assert encoded['labels'] == [[-100, 1, 1], [1, 3, -100], [-100, 2, 3], [3, 0, -100]]
+
+
+class FakeSplit:
+
+    def __init__(self, fingerprint):
+        self._fingerprint = fingerprint
+
+
+def test_tokenized_cache_key_changes_with_tokenizer_and_options():
+    dataset = {'train': FakeSplit('kalevala'), 'test': FakeSplit('pohjola')}
+    key = _tokenized_cache_key(dataset, FakeTokenizer(), LABEL2ID, max_length=512, stride=None)
+    assert key == _tokenized_cache_key(dataset, FakeTokenizer(), LABEL2ID, max_length=512, stride=None)
+    assert key != _tokenized_cache_key(dataset, FakeTokenizer(), LABEL2ID, max_length=512, stride=64)
+    assert key != _tokenized_cache_key(dataset, FakeTokenizer({'sampo': 1}), LABEL2ID, max_length=512, stride=None)
+    assert key != _tokenized_cache_key(
+        {'train': FakeSplit('tuonela'), 'test': FakeSplit('pohjola')},
+        FakeTokenizer(), LABEL2ID, max_length=512, stride=None,
+    )
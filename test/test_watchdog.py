@@ -0,0 +1,83 @@
+import csv
+import json
+import textwrap
+
+import pytest
+
+from konsepy.run_all import run_all
+from konsepy.watchdog import NoteTimeout, Watchdog
+
+CONCEPT = '''
+import enum
+import re
+
+from konsepy.rxsearch import search_all_regex
+
+
+class Sampo(enum.Enum):
+    NO = 0
+    YES = 1
+
+
+REGEXES = [
+    (re.compile(r'sampo'), Sampo.YES),
+    (re.compile(r'(a+)+$'), Sampo.NO),  # catastrophic backtracking on long runs of 'a' not at the end
+]
+
+RUN_REGEXES_FUNC = search_all_regex(REGEXES)
+'''
+
+
+@pytest.fixture
+def pohjola_package(tmp_path, monkeypatch):
+    package = tmp_path / 'pkg' / 'pohjola_nlp'
+    (package / 'concepts').mkdir(parents=True)
+    (package / '__init__.py').write_text('')
+    (package / 'concepts' / '__init__.py').write_text('')
+    (package / 'concepts' / 'sampo.py').write_text(textwrap.dedent(CONCEPT))
+    monkeypatch.syspath_prepend(str(tmp_path / 'pkg'))
+    return 'pohjola_nlp'
+
+
+@pytest.fixture
+def pohjola_notes(tmp_path):
+    path = tmp_path / 'notes.csv'
+    with open(path, 'w', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['studyid', 'note_id', 'note_date', 'text'])
+        writer.writerow([1, 1, '2020-01-01', 'Ilmarinen forged the sampo'])
+        writer.writerow([1, 2, '2020-01-02', 'a' * 40 + 'b'])
+        writer.writerow([2, 3, '2020-01-03', 'Louhi hid the sampo in the hill'])
+    return path
+
+
+def test_watchdog_raises_with_stalled_regex(pohjola_package):
+    from konsepy.importer import get_all_concepts
+    concepts = list(get_all_concepts(pohjola_package))
+    with Watchdog(pohjola_package, [c.name for c in concepts], regex_timeout=0.5) as watchdog:
+        [(categories, matches)] = watchdog.run('the sampo', {}, concepts)
+        assert [c.name for c in categories] == ['YES']
+        assert matches[0].group() == 'sampo'
+        with pytest.raises(NoteTimeout) as exc_info:
+            watchdog.run('a' * 40 + 'b', {}, concepts)
+        assert exc_info.value.reason == 'regex'
+        assert exc_info.value.regex_index == 1
+        # worker has been restarted and continues with the next note
+        [(categories, _)] = watchdog.run('no sampo here', {}, concepts)
+        assert [c.name for c in categories] == ['YES']
+        assert watchdog.restarts == 1
+
+
+def test_run_all_quarantines_stalled_note(tmp_path, pohjola_package, pohjola_notes):
+    outdir = run_all([pohjola_notes], tmp_path / 'out', pohjola_package, regex_timeout=0.5)
+
+    with open(outdir / 'output.jsonl') as fh:
+        note_ids = [json.loads(line)['note_id'] for line in fh]
+    assert note_ids == ['1', '3']
+    with open(outdir / 'quarantine.jsonl') as fh:
+        [record] = [json.loads(line) for line in fh]
+    assert record['note_id'] == '2'
+    assert record['concept'] == 'sampo'
+    assert record['regex_index'] == 1
+    assert record['reason'] == 'regex'
+    assert record['text_length'] == 41
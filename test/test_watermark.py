@@ -0,0 +1,116 @@
+import json
+import sqlite3
+
+from konsepy.importer import ConceptImport
+from konsepy.run_all import run_all
+from konsepy.textio import iterate_csv_file
+from konsepy.watermark import Watermark
+
+
+def _write_corpus(path, notes):
+    with open(path, 'w', encoding='utf8') as out:
+        for note_id, text in notes:
+            out.write(json.dumps({'chapter': note_id, 'text': text}) + '\n')
+
+
+def _note_ids(input_file, watermark, **kwargs):
+    return [note_id for _, _, note_id, *_ in iterate_csv_file(
+        [input_file], id_label='chapter', noteid_label='chapter', notedate_label='date', watermark=watermark,
+        **kwargs
+    )]
+
+
+def test_sqlite_watermark_filters_in_query(tmp_path):
+    input_file = tmp_path / 'notes.db'
+    with sqlite3.connect(input_file) as connection:
+        connection.execute('CREATE TABLE notes (chapter INTEGER, date TEXT, text TEXT)')
+        connection.executemany('INSERT INTO notes VALUES (?, ?, ?)', [
+            (1, '1835-02-28', 'Väinämöinen sings.'),
+            (2, '1835-02-28', 'Joukahainen sinks into the swamp.'),
+            (3, '1849-01-01', 'Aino goes to the sea.'),
+        ])
+
+    assert _note_ids(input_file, Watermark('note_id', value=2)) == [3]
+    assert _note_ids(input_file, Watermark('note_date', value='1840-01-01')) == [3]
+    assert _note_ids(input_file, Watermark('note_date', value='1849-01-01')) == [3]  # boundary date is re-read
+    assert _note_ids(input_file, Watermark('note_id')) == [1, 2, 3]
+
+
+def test_sqlite_watermark_compares_text_ids_numerically(tmp_path):
+    input_file = tmp_path / 'notes.db'
+    with sqlite3.connect(input_file) as connection:
+        connection.execute('CREATE TABLE notes (chapter TEXT, date TEXT, text TEXT)')
+        connection.executemany('INSERT INTO notes VALUES (?, ?, ?)', [
+            ('9', '', 'Louhi'),
+            ('99', '', 'Pohjola'),
+            ('100', '', 'Sampo'),
+            ('150', '', 'Kantele'),
+        ])
+
+    assert _note_ids(input_file, Watermark('note_id', value='99')) == ['100', '150']
+
+
+def test_csv_watermark_compares_numeric_ids(tmp_path):
+    input_file = tmp_path / 'notes.csv'
+    input_file.write_text('chapter,date,text\n9,,Louhi\n10,,Pohjola\n', encoding='utf8')
+
+    assert _note_ids(input_file, Watermark('note_id', value='9')) == ['10']
+
+
+def test_run_all_with_watermark_only_processes_new_notes(tmp_path):
+    corpus_file = tmp_path / 'corpus.jsonl'
+    result_store = tmp_path / 'results.db'
+    kwargs = dict(id_label='chapter', noteid_label='chapter', result_store=result_store, watermark='note_id')
+    _write_corpus(corpus_file, [('1', 'Joukahainen was jealous of the old singer.')])
+    run_all([corpus_file], tmp_path / 'out', 'example_nlp', **kwargs)
+
+    _write_corpus(corpus_file, [
+        ('1', 'Joukahainen was jealous of the old singer.'),
+        ('2', 'Aino felt no envy.'),
+    ])
+    second = run_all([corpus_file], tmp_path / 'out2', 'example_nlp', **kwargs)
+
+    log = next(second.glob('*.log')).read_text(encoding='utf8')
+    assert "Updated watermark: Watermark<note_id > '2'>" in log
+    rows = [json.loads(line) for line in (second / 'output.jsonl').read_text(encoding='utf8').splitlines()]
+    assert [(row['note_id'], row['categories']) for row in rows] == [
+        ('1', ['Jealousy.YES']),
+        ('2', ['Jealousy.NO']),
+    ]
+
+
+def test_run_all_with_date_watermark_includes_notes_added_on_boundary_date(tmp_path, monkeypatch):
+    corpus_file = tmp_path / 'corpus.jsonl'
+    result_store = tmp_path / 'results.db'
+    kwargs = dict(id_label='chapter', noteid_label='chapter', notedate_label='date', result_store=result_store,
+                  watermark='note_date')
+    notes = [
+        {'chapter': '1', 'date': '1835-02-28', 'text': 'Joukahainen was jealous of the old singer.'},
+    ]
+
+    def write_corpus():
+        with open(corpus_file, 'w', encoding='utf8') as out:
+            for note in notes:
+                out.write(json.dumps(note) + '\n')
+
+    write_corpus()
+    run_all([corpus_file], tmp_path / 'out', 'example_nlp', **kwargs)
+
+    notes.append({'chapter': '2', 'date': '1835-02-28', 'text': 'Aino felt no envy.'})
+    write_corpus()
+    calls = []
+    run_func = ConceptImport.run_func
+
+    def counting_run_func(self, text, *args, **kw):
+        calls.append(text)
+        return run_func(self, text, *args, **kw)
+
+    monkeypatch.setattr(ConceptImport, 'run_func', counting_run_func)
+    second = run_all([corpus_file], tmp_path / 'out2', 'example_nlp', **kwargs)
+
+    assert set(calls) == {'Aino felt no envy.'}  # the earlier note on the same date is not re-run
+    rows = [json.loads(line) for line in (second / 'output.jsonl').read_text(encoding='utf8').splitlines()]
+    assert [(row['note_id'], row['categories']) for row in rows] == [
+        ('1', ['Jealousy.YES']),
+        ('2', ['Jealousy.NO']),
+    ]